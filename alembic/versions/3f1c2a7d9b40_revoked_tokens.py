@@ -0,0 +1,84 @@
+"""revoked tokens
+
+Revision ID: 3f1c2a7d9b40
+Revises: 9cf840d7dee7
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a7d9b40'
+down_revision: Union[str, Sequence[str], None] = '9cf840d7dee7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Ротированные refresh-токены (повторное предъявление = кража)
+    op.create_table(
+        "revoked_tokens",
+        sa.Column("jti", sa.String(length=32), primary_key=True),
+        sa.Column("family_id", sa.String(length=32), nullable=False),
+        sa.Column(
+            "user_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("expires_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column(
+            "revoked_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index("ix_revoked_tokens_family_id", "revoked_tokens", ["family_id"])
+    op.create_index("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+
+    # Отозванные семейства токенов
+    op.create_table(
+        "revoked_token_families",
+        sa.Column("family_id", sa.String(length=32), primary_key=True),
+        sa.Column(
+            "user_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("reason", sa.String(length=16), nullable=False),
+        sa.Column("expires_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column(
+            "revoked_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_revoked_token_families_expires_at",
+        "revoked_token_families",
+        ["expires_at"],
+    )
+    op.create_index(
+        "ix_revoked_token_families_revoked_at",
+        "revoked_token_families",
+        ["revoked_at"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_revoked_token_families_revoked_at", table_name="revoked_token_families")
+    op.drop_index("ix_revoked_token_families_expires_at", table_name="revoked_token_families")
+    op.drop_table("revoked_token_families")
+
+    op.drop_index("ix_revoked_tokens_expires_at", table_name="revoked_tokens")
+    op.drop_index("ix_revoked_tokens_family_id", table_name="revoked_tokens")
+    op.drop_table("revoked_tokens")
@@ -0,0 +1,57 @@
+"""calculations archive
+
+Revision ID: c4d8e2a61f57
+Revises: 7b2e4c91d0a3
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8e2a61f57'
+down_revision: Union[str, Sequence[str], None] = '7b2e4c91d0a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "calculations_archive",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("goal_id", sa.SmallInteger(), nullable=False),
+        sa.Column("calorie_target", sa.Float(), nullable=True),
+        # input_data/results, сжатые zlib (формат — в app.core.archive)
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column(
+            "archived_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_calculations_archive_user_id_created_at",
+        "calculations_archive",
+        ["user_id", "created_at"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_calculations_archive_user_id_created_at",
+        table_name="calculations_archive",
+    )
+    op.drop_table("calculations_archive")
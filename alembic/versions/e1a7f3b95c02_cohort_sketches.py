@@ -0,0 +1,41 @@
+"""cohort sketches
+
+Revision ID: e1a7f3b95c02
+Revises: c4d8e2a61f57
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1a7f3b95c02'
+down_revision: Union[str, Sequence[str], None] = 'c4d8e2a61f57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "cohort_sketches",
+        sa.Column("metric", sa.String(length=16), primary_key=True),
+        sa.Column("gender", sa.String(length=16), primary_key=True),
+        sa.Column("age_band", sa.String(length=16), primary_key=True),
+        sa.Column("n", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("sketch", JSONB, nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("cohort_sketches")
@@ -0,0 +1,71 @@
+"""calculation updated_at and tombstones
+
+Revision ID: f2b6d4a8c913
+Revises: e1a7f3b95c02
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6d4a8c913'
+down_revision: Union[str, Sequence[str], None] = 'e1a7f3b95c02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "calculations",
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=True),
+    )
+    op.execute("UPDATE calculations SET updated_at = created_at")
+    op.alter_column(
+        "calculations",
+        "updated_at",
+        nullable=False,
+        server_default=sa.text("now()"),
+    )
+    op.create_index(
+        "ix_calculations_user_id_updated_at",
+        "calculations",
+        ["user_id", "updated_at"],
+    )
+
+    op.create_table(
+        "calculation_tombstones",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "user_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "deleted_at",
+            sa.TIMESTAMP(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "ix_calculation_tombstones_user_id_deleted_at",
+        "calculation_tombstones",
+        ["user_id", "deleted_at"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(
+        "ix_calculation_tombstones_user_id_deleted_at",
+        table_name="calculation_tombstones",
+    )
+    op.drop_table("calculation_tombstones")
+    op.drop_index("ix_calculations_user_id_updated_at", table_name="calculations")
+    op.drop_column("calculations", "updated_at")
@@ -1,19 +1,166 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+from uuid import UUID
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, bindparam
 
-from app.core.database import get_db
+from app.core.cache import cache
+from app.core.circuit_breaker import is_database_outage
+from app.core.database import get_read_db
+from app.core.config import settings
 from app.core.security import verify_access_token
+from app.core.token_revocation import revocation_registry
+from app.core.tracing import span, traced
 from app.models.user import User
+from app.models.user_profile import UserProfile
+from app.models.activity_level import ActivityLevel
 
 security = HTTPBearer(auto_error=False)
 
 
+@dataclass
+class CurrentIdentity:
+    """Пользователь запроса вместе с профилем, загруженный один раз."""
+    id: UUID
+    email: str
+    created_at: datetime
+    profile: Optional[dict] = None
+    # Загружена из устаревшей копии: БД недоступна
+    stale: bool = False
+
+    def to_cache(self) -> bytes:
+        return json.dumps(
+            {
+                "id": self.id,
+                "email": self.email,
+                "created_at": self.created_at.isoformat(),
+                "profile": self.profile,
+            },
+            default=str,
+        ).encode("utf-8")
+
+    @classmethod
+    def from_cache(cls, raw: bytes) -> "CurrentIdentity":
+        data = json.loads(raw)
+        profile = data["profile"]
+        if profile is not None:
+            profile["user_id"] = UUID(profile["user_id"])
+            if profile["birth_date"] is not None:
+                profile["birth_date"] = date.fromisoformat(profile["birth_date"])
+        return cls(
+            id=UUID(data["id"]),
+            email=data["email"],
+            created_at=datetime.fromisoformat(data["created_at"]),
+            profile=profile,
+        )
+
+
+def identity_cache_key(user_id) -> str:
+    return f"identity:{user_id}"
+
+
+def stale_identity_key(user_id) -> str:
+    return f"stale:identity:{user_id}"
+
+
+# Устаревшая копия нужна только при отказе БД, и писать ее на каждую
+# загрузку пользователя (с redis — лишний сетевой вызов) незачем: воркер
+# помнит, когда и какую копию записал, и повторяет запись, только если
+# данные изменились или прошло STALE_IDENTITY_REFRESH_SECONDS
+_STALE_IDENTITY_TRACKED = 10_000
+_stale_identity_written: "OrderedDict[UUID, tuple[float, int]]" = OrderedDict()
+
+
+async def _store_stale_identity(user_id: UUID, cached_user: bytes) -> None:
+    now = time.monotonic()
+    written = _stale_identity_written.get(user_id)
+    if (
+        written is not None
+        and written[1] == hash(cached_user)
+        and now - written[0] < settings.STALE_IDENTITY_REFRESH_SECONDS
+    ):
+        return
+    await cache.set(stale_identity_key(user_id), cached_user, settings.STALE_RESPONSE_TTL_SECONDS)
+    _stale_identity_written[user_id] = (now, hash(cached_user))
+    _stale_identity_written.move_to_end(user_id)
+    while len(_stale_identity_written) > _STALE_IDENTITY_TRACKED:
+        _stale_identity_written.popitem(last=False)
+
+
+async def invalidate_identity(user_id) -> None:
+    """Сбросить закэшированного пользователя после изменения профиля."""
+    await cache.delete(identity_cache_key(user_id))
+
+
+# Пользователь, профиль и код уровня активности одним запросом.
+# Запрос собран один раз: SQLAlchemy запоминает его ключ кэша компиляции,
+# и на каждый вызов остается только подставить user_id
+_IDENTITY_QUERY = (
+    select(
+        User.id,
+        User.email,
+        User.created_at,
+        UserProfile.user_id.label("profile_user_id"),
+        UserProfile.name,
+        UserProfile.gender,
+        UserProfile.birth_date,
+        UserProfile.height_cm,
+        UserProfile.weight_kg,
+        UserProfile.activity_level_id,
+        ActivityLevel.code.label("activity_level_code"),
+    )
+    .select_from(User)
+    .outerjoin(UserProfile, UserProfile.user_id == User.id)
+    .outerjoin(ActivityLevel, ActivityLevel.id == UserProfile.activity_level_id)
+    .where(User.id == bindparam("user_id"))
+)
+
+
+async def load_identity(db: AsyncSession, user_id) -> Optional[CurrentIdentity]:
+    result = await db.execute(_IDENTITY_QUERY, {"user_id": user_id})
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    profile = None
+    if row.profile_user_id is not None:
+        profile = {
+            "user_id": row.profile_user_id,
+            "name": row.name,
+            "gender": row.gender,
+            "birth_date": row.birth_date,
+            "height_cm": row.height_cm,
+            "weight_kg": row.weight_kg,
+            "activity_level_id": row.activity_level_id,
+            "activity_level_code": row.activity_level_code,
+        }
+
+    return CurrentIdentity(
+        id=row.id,
+        email=row.email,
+        created_at=row.created_at,
+        profile=profile,
+    )
+
+
+@traced("dependency get_current_user")
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_db),
-) -> User:
+    db: AsyncSession = Depends(get_read_db),
+) -> CurrentIdentity:
+    """
+    Текущий пользователь запроса.
+
+    FastAPI кэширует зависимость в пределах запроса, поэтому все
+    обработчики и зависимости получают один и тот же объект.
+    """
     if credentials is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -21,7 +168,8 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    payload = verify_access_token(credentials.credentials)
+    with span("jwt.decode"):
+        payload = verify_access_token(credentials.credentials)
 
     user_id: str = payload.get("sub")
     if user_id is None:
@@ -30,10 +178,39 @@ async def get_current_user(
             detail="Invalid token payload",
         )
 
-    result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    # Проверка по set в памяти, без запроса к БД
+    if (
+        settings.CHECK_ACCESS_TOKEN_REVOCATION
+        and revocation_registry.is_family_revoked(payload.get("fam"))
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revoked",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    # Сначала общий кэш: при попадании сессия БД не берет соединение
+    identity_ttl = settings.identity_cache_ttl_seconds
+    if identity_ttl > 0:
+        with span("identity.cache"):
+            cached = await cache.get(identity_cache_key(user_id))
+        if cached is not None:
+            return CurrentIdentity.from_cache(cached)
+
+    with span("identity.load"):
+        try:
+            user = await load_identity(db, user_id)
+        except Exception as e:
+            # БД недоступна: пользователь из последней удачной загрузки
+            stale = await cache.get(stale_identity_key(user_id)) if is_database_outage(e) else None
+            if stale is None:
+                raise
+            # Сессия общая с обработчиком: без rollback она останется
+            # в прерванной транзакции
+            await db.rollback()
+            identity = CurrentIdentity.from_cache(stale)
+            identity.stale = True
+            return identity
 
     if user is None:
         raise HTTPException(
@@ -41,10 +218,17 @@ async def get_current_user(
             detail="User not found",
         )
 
+    cached_user = user.to_cache()
+    if identity_ttl > 0:
+        await cache.set(identity_cache_key(user_id), cached_user, identity_ttl)
+    if settings.STALE_RESPONSE_TTL_SECONDS > 0:
+        await _store_stale_identity(user.id, cached_user)
+
     return user
 
 
+@traced("dependency get_current_active_user")
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: CurrentIdentity = Depends(get_current_user),
+) -> CurrentIdentity:
     return current_user
\ No newline at end of file
@@ -1,8 +1,11 @@
 from fastapi import APIRouter
-from app.api.v1 import auth, users, calculations
+from app.api.v1 import auth, users, calculations, calculation_sync, calculation_events
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
-api_router.include_router(calculations.router, prefix="/calculations", tags=["calculations"])
\ No newline at end of file
+# Раньше calculations: иначе /sync и /events совпадут с /{calculation_id}
+api_router.include_router(calculation_sync.router, prefix="/calculations", tags=["calculations"])
+api_router.include_router(calculation_events.router, prefix="/calculations", tags=["calculations"])
+api_router.include_router(calculations.router, prefix="/calculations", tags=["calculations"])
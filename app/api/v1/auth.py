@@ -1,9 +1,15 @@
+import uuid
 from datetime import timedelta
+from types import SimpleNamespace
+from typing import Optional
+from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, literal, String, Date
+from sqlalchemy.dialects.postgresql import insert
 from jose import JWTError
+from app.core.tracing import TracedRoute
 from app.core.database import get_db
 from app.core.config import settings
 from app.core.security import (
@@ -11,72 +17,139 @@ from app.core.security import (
     create_access_token,
     create_refresh_token,
     verify_refresh_token,
-    get_password_hash
+    get_password_hash,
+    new_token_id,
+)
+from app.core.rate_limit import rate_limit
+from app.core.token_revocation import (
+    revocation_registry,
+    consume_refresh_token,
+    revoke_family,
 )
 from app.schemas.user import UserRegister, UserResponse, UserWithProfileResponse
 from app.schemas.token import Token, TokenRefresh
 from app.models.user import User
 from app.models.user_profile import UserProfile
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+
+
+def _issue_tokens(user_id: str, email: Optional[str], family_id: str) -> dict:
+    """Пара токенов одного семейства (семейство = одна сессия входа)."""
+    access_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    claims = {"sub": user_id, "email": email, "fam": family_id}
+
+    return {
+        "access_token": create_access_token(claims, access_expires),
+        "refresh_token": create_refresh_token(claims, refresh_expires),
+        "token_type": "bearer",
+        "expires_in": int(access_expires.total_seconds()),
+    }
+
 
-@router.post("/register", response_model=UserWithProfileResponse)
+@router.post(
+    "/register",
+    response_model=UserWithProfileResponse,
+    dependencies=[Depends(rate_limit("register"))],
+)
 async def register(
     user_data: UserRegister,
     db: AsyncSession = Depends(get_db)
 ):
     """Регистрация нового пользователя с профилем."""
-    # Проверяем, существует ли пользователь
-
-    result = await db.execute(
-        select(User).where(User.email == user_data.email)
+    # Пользователь и профиль создаются одним запросом: ON CONFLICT по email
+    # заменяет предварительную проверку и исключает гонку между ними
+    new_user = (
+        insert(User)
+        .values(
+            id=uuid.uuid4(),
+            email=user_data.email,
+            password_hash=get_password_hash(user_data.password),
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User.id, User.email, User.created_at)
     )
-    existing_user = result.scalar_one_or_none()
-    
-    if existing_user:
+    profile_columns = (
+        UserProfile.user_id,
+        UserProfile.name,
+        UserProfile.gender,
+        UserProfile.birth_date,
+        UserProfile.height_cm,
+        UserProfile.weight_kg,
+        UserProfile.activity_level_id,
+    )
+
+    if settings.DB_EMBEDDED:
+        # SQLite не умеет DML в CTE: два запроса в одной транзакции
+        user_row = (await db.execute(new_user)).one_or_none()
+        row = None
+        if user_row is not None:
+            profile_row = (await db.execute(
+                insert(UserProfile)
+                .values(
+                    user_id=user_row.id,
+                    name=user_data.name,
+                    gender=user_data.gender,
+                    birth_date=user_data.birth_date,
+                )
+                .returning(*profile_columns)
+            )).one()
+            row = SimpleNamespace(**user_row._asdict(), **profile_row._asdict())
+    else:
+        new_user = new_user.cte("new_user")
+        new_profile = (
+            insert(UserProfile)
+            .from_select(
+                ["user_id", "name", "gender", "birth_date"],
+                select(
+                    new_user.c.id,
+                    literal(user_data.name, String),
+                    literal(user_data.gender, String),
+                    literal(user_data.birth_date, Date),
+                ),
+            )
+            .returning(*profile_columns)
+            .cte("new_profile")
+        )
+
+        result = await db.execute(
+            select(new_user, new_profile).select_from(
+                new_user.join(new_profile, new_profile.c.user_id == new_user.c.id)
+            )
+        )
+        row = result.one_or_none()
+
+    if row is None:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
-    # Создаем пользователя
-    user = User(
-        email=user_data.email,
-        password_hash=get_password_hash(user_data.password)
-    )
-    
-    db.add(user)
-    await db.flush()  # Используем flush вместо commit, чтобы получить ID
-    
-    # Создаем профиль пользователя
-    profile = UserProfile(
-        user_id=user.id,
-        name=user_data.name,
-        gender=user_data.gender,
-        birth_date=user_data.birth_date,
-        height_cm=None,
-        weight_kg=None,
-        activity_level_id=None
-    )
-    
-    db.add(profile)
+
     await db.commit()
-    await db.refresh(user)
-    
-    # Получаем профиль для ответа
-    result = await db.execute(
-        select(UserProfile).where(UserProfile.user_id == user.id)
-    )
-    profile = result.scalar_one_or_none()
     
     return {
-        "id": user.id,
-        "email": user.email,
-        "created_at": user.created_at,
-        "profile": profile
+        "id": row.id,
+        "email": row.email,
+        "created_at": row.created_at,
+        "profile": {
+            "user_id": row.user_id,
+            "name": row.name,
+            "gender": row.gender,
+            "birth_date": row.birth_date,
+            "height_cm": row.height_cm,
+            "weight_kg": row.weight_kg,
+            "activity_level_id": row.activity_level_id,
+            "activity_level_code": None,
+        }
     }
 
-@router.post("/login", response_model=Token)
+@router.post(
+    "/login",
+    response_model=Token,
+    dependencies=[Depends(rate_limit("login"))],
+)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db),
@@ -93,58 +166,54 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    refresh_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-
-    return {
-        "access_token": create_access_token(
-            {"sub": str(user.id), "email": user.email},
-            access_expires,
-        ),
-        "refresh_token": create_refresh_token(
-            {"sub": str(user.id)},
-            refresh_expires,
-        ),
-        "token_type": "bearer",
-        "expires_in": int(access_expires.total_seconds()),
-    }
+    return _issue_tokens(str(user.id), user.email, new_token_id())
 
-@router.post("/refresh", response_model=Token)
+@router.post(
+    "/refresh",
+    response_model=Token,
+    dependencies=[Depends(rate_limit("refresh"))],
+)
 async def refresh_token(
     token_data: TokenRefresh,
     db: AsyncSession = Depends(get_db),
 ):
+    """Ротация refresh-токена: старый токен становится недействительным."""
     payload = verify_refresh_token(token_data.refresh_token)
 
     user_id = payload.get("sub")
-    if user_id is None:
+    family_id = payload.get("fam")
+    if user_id is None or family_id is None or payload.get("jti") is None:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
-    result = await db.execute(
-        select(User).where(User.id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    await revocation_registry.sync(db)
+    if revocation_registry.is_family_revoked(family_id):
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
 
-    if user is None:
-        raise HTTPException(status_code=401, detail="User not found")
+    if not await consume_refresh_token(db, payload):
+        # Токен уже предъявлялся — отзываем всё семейство
+        await db.commit()
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
 
-    access_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    refresh_expires = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    await db.commit()
 
-    return {
-        "access_token": create_access_token(
-            {"sub": str(user.id), "email": user.email},
-            access_expires,
-        ),
-        "refresh_token": create_refresh_token(
-            {"sub": str(user.id)},
-            refresh_expires,
-        ),
-        "token_type": "bearer",
-        "expires_in": int(access_expires.total_seconds()),
-    }
+    return _issue_tokens(user_id, payload.get("email"), family_id)
 
 @router.post("/logout")
-async def logout():
-    """Выход из системы (на клиенте удаляется токен)."""
-    return {"message": "Successfully logged out"}
\ No newline at end of file
+async def logout(
+    token_data: Optional[TokenRefresh] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Выход из системы: отзывает семейство переданного refresh-токена."""
+    if token_data is not None:
+        payload = verify_refresh_token(token_data.refresh_token)
+        family_id = payload.get("fam")
+        if family_id is not None and payload.get("sub") is not None:
+            await revoke_family(
+                db,
+                family_id=family_id,
+                user_id=UUID(payload["sub"]),
+                reason="logout",
+            )
+            await db.commit()
+
+    return {"message": "Successfully logged out"}
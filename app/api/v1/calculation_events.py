@@ -0,0 +1,75 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+
+from app.core.tracing import TracedRoute
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.core.events import TooManyConnections, event_broker, format_sse
+from app.api.deps import CurrentIdentity, get_current_user
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get(
+    "/events",
+    summary="Поток событий о расчетах (SSE)",
+    description="Server-Sent Events: calculation.created, calculation.deleted, resync"
+)
+async def stream_calculation_events(
+    *,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
+):
+    """
+    Подписаться на изменения расчетов пользователя
+
+    События приходят со всех устройств и воркеров (через LISTEN/NOTIFY).
+    data — JSON со списком ids. Событие resync означает, что часть событий
+    могла быть пропущена и нужно вызвать /calculations/sync. Каждые
+    SSE_HEARTBEAT_SECONDS отправляется комментарий-пинг.
+    """
+    if not settings.SSE_ENABLED or settings.DB_EMBEDDED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Поток событий отключен"
+        )
+
+    try:
+        queue = event_broker.subscribe(current_user.id)
+    except TooManyConnections as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(settings.SSE_RETRY_MILLISECONDS // 1000)}
+        )
+
+    # Открытый поток не должен держать соединение из пула
+    await db.close()
+
+    async def events():
+        try:
+            yield f"retry: {settings.SSE_RETRY_MILLISECONDS}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_broker.unsubscribe(current_user.id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Если поток так и не начался, подписку снимет фоновая задача
+        background=BackgroundTask(event_broker.unsubscribe, current_user.id, queue),
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # nginx: не буферизовать поток
+        }
+    )
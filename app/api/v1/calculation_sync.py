@@ -0,0 +1,162 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import LargeBinary, cast, func, literal, null, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.tracing import TracedRoute
+from app.core.archive import unpack_payload
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.sync_token import SyncToken, encode_sync_token, decode_sync_token
+from app.api.deps import CurrentIdentity, get_current_user
+from app.models.calculation import Calculation
+from app.models.calculation_archive import CalculationArchive
+from app.models.calculation_tombstone import CalculationTombstone
+from app.models.types import GUID, JSONDocument, UTCDateTime
+from app.schemas.calculation import CalculationResponse, CalculationSyncResponse
+
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
+
+
+@router.get(
+    "/sync",
+    response_model=CalculationSyncResponse,
+    summary="Дельта-синхронизация расчетов",
+    description="Расчеты, созданные или измененные после токена, и ID удаленных"
+)
+async def sync_calculations(
+    *,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
+    since: Optional[str] = Query(None, max_length=512, description="next_token из предыдущего ответа"),
+    limit: int = Query(500, gt=0, le=1000, description="Максимум расчетов на страницу")
+):
+    """
+    Дельта-синхронизация для офлайн-клиентов
+
+    Без since отдается вся история (включая архив) постранично. Дальше
+    клиент передает next_token и получает только изменения и удаления
+    с прошлого раза. Изменения могут приходить повторно (окно перекрытия
+    SYNC_OVERLAP_SECONDS) — клиент применяет их как upsert по id.
+
+    Если токен старше SYNC_TOMBSTONE_RETENTION_DAYS, отметки об удалении
+    уже очищены: возвращается 410, и клиент начинает полную синхронизацию.
+    Читается только primary: часы реплики и ее отставание сломали бы
+    водяной знак.
+    """
+    token = SyncToken()
+    if since:
+        try:
+            token = decode_sync_token(since)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный токен синхронизации"
+            )
+
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if token.watermark is not None and token.watermark < datetime.now(timezone.utc) - retention:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Токен синхронизации устарел, нужна полная синхронизация"
+        )
+
+    try:
+        started_at = token.started_at or await db.scalar(select(func.now(type_=UTCDateTime())))
+        full_sync = token.watermark is None
+
+        hot = select(
+            Calculation.id,
+            Calculation.goal_id,
+            Calculation.input_data,
+            Calculation.results,
+            Calculation.created_at,
+            Calculation.updated_at,
+            cast(null(), LargeBinary).label("payload"),
+        ).where(Calculation.user_id == current_user.id)
+        if not full_sync:
+            lower = token.watermark - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+            hot = hot.where(Calculation.updated_at > lower)
+            rows = hot.subquery()
+        else:
+            # Архивные расчеты не меняются и нужны только при полной синхронизации
+            archived = select(
+                CalculationArchive.id,
+                CalculationArchive.goal_id,
+                cast(null(), JSONDocument),
+                cast(null(), JSONDocument),
+                CalculationArchive.created_at,
+                CalculationArchive.created_at,
+                CalculationArchive.payload,
+            ).where(CalculationArchive.user_id == current_user.id)
+            rows = union_all(hot, archived).subquery()
+
+        query = select(rows)
+        if token.cursor is not None:
+            # Курсор связывается с типами колонок: в SQLite время и id
+            # хранятся строками и сравниваются в том же формате
+            cursor_at, cursor_id = token.cursor
+            query = query.where(
+                tuple_(rows.c.updated_at, rows.c.id)
+                > tuple_(literal(cursor_at, UTCDateTime()), literal(cursor_id, GUID()))
+            )
+        query = query.order_by(rows.c.updated_at, rows.c.id).limit(limit + 1)
+        page = (await db.execute(query)).all()
+
+        has_more = len(page) > limit
+        page = page[:limit]
+
+        changes = []
+        for row in page:
+            input_data, results = row.input_data, row.results
+            if row.payload is not None:
+                payload = unpack_payload(row.payload)
+                input_data, results = payload["input_data"], payload["results"]
+            changes.append(CalculationResponse(
+                id=row.id,
+                user_id=current_user.id,
+                goal_id=row.goal_id,
+                input_data=input_data,
+                results=results,
+                created_at=row.created_at,
+            ))
+
+        # Удаления отдаются один раз, на первой странице прохода
+        deleted = []
+        if not full_sync and token.cursor is None:
+            result = await db.execute(
+                select(CalculationTombstone.id).where(
+                    (CalculationTombstone.user_id == current_user.id) &
+                    (CalculationTombstone.deleted_at > lower)
+                )
+            )
+            deleted = result.scalars().all()
+
+        if has_more:
+            next_token = SyncToken(
+                watermark=token.watermark,
+                started_at=started_at,
+                cursor=(page[-1].updated_at, page[-1].id),
+            )
+        else:
+            next_token = SyncToken(watermark=started_at)
+
+        return CalculationSyncResponse(
+            changes=changes,
+            deleted=deleted,
+            next_token=encode_sync_token(next_token),
+            has_more=has_more
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Ошибка при синхронизации расчетов")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при синхронизации расчетов: {str(e)}"
+        )
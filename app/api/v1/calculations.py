@@ -1,37 +1,247 @@
-from datetime import datetime, timedelta
-from typing import List, Optional
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, ValidationError
+from pydantic_core import to_json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc
+from sqlalchemy import select, insert, delete, func, desc, cast, bindparam, Integer, Text, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.sql import Select
 
-from app.core.database import get_db
-from app.api.deps import get_current_user
+from app.core.tracing import TracedRoute, traced
+from app.core.circuit_breaker import is_database_outage
+from app.core.archive import (
+    archived_calculation,
+    as_utc,
+    get_archived,
+    reaches_archive,
+    unpack_payload,
+)
+from app.core.calculation_calendar import calendar_period, calendar_query
+from app.core.calculation_stats import load_stats_counters
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.core.events import publish_event
+from app.core.rate_limit import rate_limit
+from app.core.response_cache import STALE_WARNING, response_cache
+from app.core.sketches import age_band, cohort_sketches
+from app.core.idempotency import (
+    StoredResponse,
+    request_fingerprint,
+    load_response,
+    save_response,
+    remember_response,
+)
+from app.api.deps import CurrentIdentity, get_current_user
 from app.models.calculation import Calculation
-from app.models.user import User
+from app.models.calculation_archive import CalculationArchive
+from app.models.calculation_tombstone import CalculationTombstone
 from app.schemas.calculation import (
     CalculationCreate,
     CalculationResponse,
     CalculationHistoryResponse,
     CalculationStatsResponse,
-    CalculationStats
+    CalculationStats,
+    CalculationBulkDelete,
+    CalculationBulkDeleteResponse,
+    CalendarBucketEnum,
+    CalendarBucket,
+    CalculationCalendarResponse,
+    CohortBenchmark,
+    CohortBenchmarkResponse,
+    GenderEnum,
 )
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
+
+
+async def _cached_response(user_id: UUID, name: str, version: int) -> Optional[Response]:
+    if not settings.response_cache_enabled:
+        return None
+    body = await response_cache.get(user_id, name, version)
+    if body is None:
+        return None
+    return Response(content=body, media_type="application/json")
+
+
+async def _store_response(
+    user_id: UUID,
+    name: str,
+    model: BaseModel,
+    version: int,
+    valid_until: Optional[float] = None,
+) -> Response:
+    """Сериализовать ответ один раз и положить байты в кэш."""
+    body = model.model_dump_json().encode("utf-8")
+    if settings.response_cache_enabled:
+        await response_cache.put(user_id, name, body, version, valid_until)
+    await response_cache.put_stale(user_id, name, body)
+    return Response(content=body, media_type="application/json")
+
+
+async def _stale_response(user_id: UUID, name: str, error: Exception) -> Optional[Response]:
+    """Последний удачный ответ, если запрос не удался из-за недоступности БД."""
+    if not is_database_outage(error):
+        return None
+    stale = await response_cache.get_stale(user_id, name)
+    if stale is None:
+        return None
+    body, age = stale
+    logger.warning("БД недоступна, отдан устаревший ответ", extra={"response": name, "age_seconds": round(age)})
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Warning": STALE_WARNING, "Age": str(int(age))},
+    )
+
+
+# ===== ГОРЯЧИЕ ЗАПРОСЫ =====
+# Запросы, выполняемые почти на каждый вызов API, собраны один раз на уровне
+# модуля с bindparam вместо литералов. SQLAlchemy запоминает ключ кэша
+# компиляции у готовой конструкции, поэтому на вызов не тратится ни сборка
+# select(), ни его обход для ключа, а одинаковый текст SQL позволяет asyncpg
+# переиспользовать подготовленный оператор соединения.
+
+_LATEST_HOT = (
+    select(Calculation)
+    .where(Calculation.user_id == bindparam("user_id"))
+    .order_by(desc(Calculation.created_at))
+    .limit(1)
+)
+_LATEST_ARCHIVED = (
+    select(CalculationArchive)
+    .where(CalculationArchive.user_id == bindparam("user_id"))
+    .order_by(desc(CalculationArchive.created_at))
+    .limit(1)
+)
+_CALCULATION_BY_ID = select(Calculation).where(
+    (Calculation.id == bindparam("calculation_id")) &
+    (Calculation.user_id == bindparam("user_id"))
+)
+
+
+async def _latest_calculation(db: AsyncSession, user_id: UUID):
+    """Последний расчет; если горячих нет — последний из архива."""
+    params = {"user_id": user_id}
+    calculation = await db.scalar(_LATEST_HOT, params)
+    if calculation is not None:
+        return calculation
+
+    archived = await db.scalar(_LATEST_ARCHIVED, params)
+    return archived_calculation(archived) if archived is not None else None
+
+
+async def _delete_with_tombstones(db: AsyncSession, model, *conditions) -> List[UUID]:
+    """
+    Удалить расчеты и записать для них отметки об удалении одним запросом
+    (DELETE ... RETURNING внутри CTE + INSERT), чтобы синхронизация клиентов
+    увидела удаление.
+    """
+    if settings.DB_EMBEDDED:
+        # SQLite не умеет DML в CTE: те же два шага в одной транзакции
+        result = await db.execute(
+            delete(model).where(*conditions).returning(model.id, model.user_id),
+            execution_options={"synchronize_session": False}
+        )
+        rows = [{"id": row.id, "user_id": row.user_id} for row in result.all()]
+        if rows:
+            await db.execute(insert(CalculationTombstone), rows)
+        return [row["id"] for row in rows]
+
+    deleted = delete(model).where(*conditions).returning(model.id, model.user_id).cte("deleted")
+    stmt = insert(CalculationTombstone).from_select(
+        ["id", "user_id"],
+        select(deleted.c.id, deleted.c.user_id)
+    ).returning(CalculationTombstone.id)
+    result = await db.execute(stmt)
+    return list(result.scalars().all())
+
+
+def _replay_response(stored: StoredResponse, fingerprint: str) -> JSONResponse:
+    """Повторить сохранённый ответ для того же Idempotency-Key."""
+    if stored.request_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key уже использован с другим телом запроса"
+        )
+    return JSONResponse(
+        status_code=stored.status_code,
+        content=stored.body,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+# ===== ТЕЛО НОВОГО РАСЧЕТА =====
+
+def _inline_refs(schema: dict) -> dict:
+    """Подставить $defs на место ссылок: схема встраивается в OpenAPI как есть."""
+    defs = schema.pop("$defs", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(defs[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+
+CALCULATION_BODY_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": _inline_refs(CalculationCreate.model_json_schema())}
+        },
+    }
+}
+
+
+@traced("dependency calculation_payload")
+async def calculation_payload(request: Request) -> CalculationCreate:
+    """
+    Разбор и проверка тела за один проход pydantic-core (model_validate_json),
+    без промежуточного json.loads в словари. Ошибки — те же 422, что и у FastAPI.
+    """
+    body = await request.body()
+    if len(body) > settings.CALCULATION_MAX_BODY_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Тело запроса больше {settings.CALCULATION_MAX_BODY_BYTES} байт"
+        )
+    try:
+        return CalculationCreate.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
 
 
 @router.post(
     "/",
     response_model=CalculationResponse,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit("create_calculation"))],
+    openapi_extra=CALCULATION_BODY_OPENAPI,
     summary="Создать новый расчет",
     description="Создание нового расчета для текущего пользователя. Сохраняет входные данные и результаты расчета."
 )
 async def create_calculation(
     *,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-    calculation_in: CalculationCreate
+    current_user: CurrentIdentity = Depends(get_current_user),
+    calculation_in: CalculationCreate = Depends(calculation_payload),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255)
 ):
     """
     Создать новый расчет для текущего пользователя
@@ -56,66 +266,240 @@ async def create_calculation(
         "formula_used": "mifflin_st_jeor"
       }
     }
+
+    Повтор запроса с тем же заголовком Idempotency-Key в пределах
+    IDEMPOTENCY_TTL_HOURS возвращает сохранённый ответ без новой записи.
     """
     try:
-        # Валидация входных данных
-        input_data = calculation_in.input_data
-        
-        # Проверяем обязательные поля во входных данных
-        required_fields = ['weight', 'height', 'age', 'gender', 'activity_level']
-        for field in required_fields:
-            if field not in input_data:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Отсутствует обязательное поле в input_data: {field}"
-                )
-        
-        # Проверяем результаты
-        results = calculation_in.results
-        required_results = ['bmr', 'tdee', 'calorie_target']
-        for field in required_results:
-            if field not in results:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Отсутствует обязательное поле в results: {field}"
-                )
+        fingerprint = request_fingerprint(calculation_in.model_dump(mode="json"))
+        if idempotency_key:
+            stored = await load_response(db, current_user.id, idempotency_key)
+            if stored is not None:
+                return _replay_response(stored, fingerprint)
+
+        # Тело уже проверено схемой CalculationCreate; в БД — обычный JSON
+        input_data = calculation_in.input_data.model_dump(mode="json")
+        results = calculation_in.results.model_dump(mode="json")
         
-        # Проверяем goal_id
-        if calculation_in.goal_id not in [1, 2, 3]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Некорректный goal_id. Допустимые значения: 1 (похудеть), 2 (поддерживать), 3 (набрать)"
+        # Тот же расчет, отправленный повторно за короткое окно, не дублируем
+        if settings.CALCULATION_DEDUP_SECONDS > 0:
+            window_start = datetime.now(timezone.utc) - timedelta(seconds=settings.CALCULATION_DEDUP_SECONDS)
+            duplicate = await db.scalar(
+                select(Calculation).where(
+                    (Calculation.user_id == current_user.id) &
+                    (Calculation.created_at >= window_start) &
+                    (Calculation.goal_id == calculation_in.goal_id) &
+                    (Calculation.input_data == input_data) &
+                    (Calculation.results == results)
+                ).order_by(desc(Calculation.created_at)).limit(1)
             )
-        
+            if duplicate is not None:
+                return duplicate
+
         # Создаем новый расчет
         calculation = Calculation(
             user_id=current_user.id,
-            goal_id=calculation_in.goal_id.value if hasattr(calculation_in.goal_id, 'value') else calculation_in.goal_id,
-            input_data=calculation_in.input_data,
-            results=calculation_in.results,
-            created_at=datetime.utcnow()
+            goal_id=calculation_in.goal_id.value,
+            input_data=input_data,
+            results=results,
+            # С зоной, как при чтении из БД: POST и GET отдают одинаковый created_at
+            created_at=datetime.now(timezone.utc)
         )
         
         db.add(calculation)
+        await db.flush()
+
+        if idempotency_key:
+            stored = StoredResponse(
+                request_hash=fingerprint,
+                status_code=status.HTTP_201_CREATED,
+                body=CalculationResponse.model_validate(calculation).model_dump(mode="json"),
+                stored_at=time.time(),
+            )
+            if not await save_response(db, current_user.id, idempotency_key, stored):
+                # Параллельный повтор успел первым — отдаем его ответ.
+                # ON CONFLICT дождался его коммита, так что строка уже видна
+                winner = await load_response(db, current_user.id, idempotency_key)
+                if winner is not None:
+                    await db.rollback()
+                    return _replay_response(winner, fingerprint)
+                # Сохраненного ответа нет — обычное создание без записи ключа
+                idempotency_key = None
+
+        await publish_event(db, current_user.id, "calculation.created", [calculation.id])
         await db.commit()
-        await db.refresh(calculation)
-        
-        # Логируем успешное создание
-        print(f"Создан новый расчет для пользователя {current_user.id}: {calculation.id}")
-        
-        return calculation
-        
+
     except HTTPException:
         await db.rollback()
         raise
     except Exception as e:
         await db.rollback()
-        print(f"Ошибка при создании расчета: {str(e)}")
+        logger.exception("Ошибка при создании расчета")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при создании расчета: {str(e)}"
         )
 
+    # Расчет уже закоммичен: дальше ничто не должно превращать ответ в 500
+    if idempotency_key:
+        remember_response(current_user.id, idempotency_key, stored)
+    cohort_sketches.observe(calculation.input_data, calculation.results)
+    await response_cache.bump(current_user.id)
+
+    # Логируем успешное создание
+    logger.info(
+        "Создан новый расчет",
+        extra={"user_id": str(current_user.id), "calculation_id": str(calculation.id)},
+    )
+
+    return calculation
+
+# Поля, доступные в fields=; calorie_target берется из results на стороне БД
+CALCULATION_FIELDS = (
+    "id", "user_id", "goal_id", "created_at", "input_data", "results", "calorie_target",
+)
+SUMMARY_FIELDS = ("id", "goal_id", "created_at", "calorie_target")
+
+
+def _requested_fields(fields: Optional[str], summary: bool) -> Optional[Tuple[str, ...]]:
+    """Разобрать fields=/summary; None — полный ответ."""
+    if summary:
+        return SUMMARY_FIELDS
+    if fields is None:
+        return None
+
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in CALCULATION_FIELDS]
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Некорректный fields. Допустимые поля: {', '.join(CALCULATION_FIELDS)}"
+        )
+    return requested
+
+
+def _hot_columns(fields: Tuple[str, ...]) -> list:
+    columns = []
+    for name in fields:
+        if name == "calorie_target":
+            columns.append(Calculation.results['calorie_target'].as_float().label(name))
+        else:
+            columns.append(getattr(Calculation, name))
+    return columns
+
+
+def _archive_columns(fields: Tuple[str, ...]) -> list:
+    # input_data и results лежат в одном сжатом блобе
+    columns = [
+        getattr(CalculationArchive, name)
+        for name in fields
+        if name not in ("input_data", "results")
+    ]
+    if "input_data" in fields or "results" in fields:
+        columns.append(CalculationArchive.payload)
+    return columns
+
+
+def _archive_row(row, fields: Tuple[str, ...]) -> dict:
+    item = {name: row[name] for name in fields if name not in ("input_data", "results")}
+    if "input_data" in fields or "results" in fields:
+        payload = unpack_payload(row["payload"])
+        for name in ("input_data", "results"):
+            if name in fields:
+                item[name] = payload[name]
+    return item
+
+
+# Поля полного ответа (CalculationResponse)
+RESPONSE_FIELDS = ("id", "user_id", "goal_id", "input_data", "results", "created_at")
+
+
+class _HistoryStatements(NamedTuple):
+    count: Select
+    page: Select
+    archive_count: Select
+    archive_page: Select
+    json_page: Select
+
+
+def _json_value(name: str):
+    """Значение поля для json_build_object в том же виде, что отдает Pydantic."""
+    if name == "created_at":
+        return func.to_char(
+            func.timezone("UTC", Calculation.created_at),
+            'YYYY-MM-DD"T"HH24:MI:SS.US"Z"'
+        )
+    if name == "calorie_target":
+        return Calculation.results['calorie_target'].as_float()
+    return getattr(Calculation, name)
+
+
+def _json_page(hot_filter, fields: Tuple[str, ...], offset, limit) -> Select:
+    """
+    Страница истории одним JSON-массивом, собранным в Postgres.
+
+    json_build_object, а не jsonb: порядок ключей сохраняется, и строке
+    не нужно лишнее преобразование в бинарный формат.
+    """
+    document = func.json_build_object(
+        *(part for name in fields for part in (literal(name), _json_value(name)))
+    )
+    page = (
+        select(document.label("document"), Calculation.created_at)
+        .where(hot_filter)
+        .order_by(desc(Calculation.created_at))
+        .offset(offset).limit(limit)
+        .subquery()
+    )
+    # Приводим к text: иначе драйвер разберет JSON в объекты Python
+    return select(cast(
+        func.json_agg(aggregate_order_by(page.c.document, desc(page.c.created_at))),
+        Text,
+    ))
+
+
+@lru_cache(maxsize=64)
+def _history_statements(fields: Optional[Tuple[str, ...]], since: bool) -> _HistoryStatements:
+    """
+    Запросы страницы истории для набора полей и наличия фильтра по дате.
+
+    Вариантов немного (fields ограничен CALCULATION_FIELDS), поэтому
+    каждый собирается один раз, а значения передаются через bindparam.
+    """
+    hot_filter = Calculation.user_id == bindparam("user_id")
+    archive_filter = CalculationArchive.user_id == bindparam("user_id")
+    if since:
+        hot_filter &= Calculation.created_at >= bindparam("cutoff")
+        archive_filter &= CalculationArchive.created_at >= bindparam("archive_cutoff")
+
+    offset = bindparam("offset", type_=Integer)
+    limit = bindparam("limit", type_=Integer)
+
+    hot = select(Calculation) if fields is None else select(*_hot_columns(fields))
+    archive = (
+        select(CalculationArchive) if fields is None
+        else select(*_archive_columns(fields))
+    )
+    return _HistoryStatements(
+        count=select(func.count()).select_from(Calculation).where(hot_filter),
+        page=hot.where(hot_filter)
+        .order_by(desc(Calculation.created_at))
+        .offset(offset).limit(limit),
+        archive_count=select(func.count()).select_from(CalculationArchive).where(archive_filter),
+        archive_page=archive.where(archive_filter)
+        .order_by(desc(CalculationArchive.created_at))
+        .offset(offset).limit(limit),
+        json_page=_json_page(hot_filter, fields or RESPONSE_FIELDS, offset, limit),
+    )
+
+
+def _history_document(page: Optional[str], total: int, partial: bool) -> bytes:
+    """Тело ответа истории вокруг готового JSON-массива из БД."""
+    # Та же форма, что у CalculationHistoryResponse и частичного ответа
+    period = "" if partial else ',"period":null'
+    return f'{{"calculations":{page or "[]"},"total":{total}{period}}}'.encode("utf-8")
+
+
 @router.get(
     "/",
     response_model=CalculationHistoryResponse,
@@ -124,11 +508,17 @@ async def create_calculation(
 )
 async def get_calculations(
     *,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
     days: Optional[int] = Query(None, gt=0, le=365, description="Фильтр по последним N дням"),
     limit: int = Query(100, gt=0, le=1000, description="Лимит записей (макс. 1000)"),
-    offset: int = Query(0, ge=0, description="Смещение для пагинации")
+    offset: int = Query(0, ge=0, description="Смещение для пагинации"),
+    fields: Optional[str] = Query(
+        None,
+        max_length=200,
+        description="Только указанные поля через запятую: " + ", ".join(CALCULATION_FIELDS)
+    ),
+    summary: bool = Query(False, description="Компактный режим: id, goal_id, created_at, calorie_target")
 ):
     """
     Получить историю расчетов пользователя
@@ -139,39 +529,226 @@ async def get_calculations(
     - **days**: фильтрация по последним N дням (опционально)
     - **limit**: количество записей (по умолчанию 100, максимум 1000)
     - **offset**: смещение для пагинации
+    - **fields** / **summary**: из БД читаются только нужные колонки,
+      JSONB input_data/results не загружаются, если не запрошены
+
+    Если период выходит за горячее окно, недостающие записи дочитываются
+    из архива: архивные расчеты всегда старше горячих.
     """
+    requested = _requested_fields(fields, summary)
+
     try:
-        # Базовый запрос для текущего пользователя
-        query = select(Calculation).where(Calculation.user_id == current_user.id)
+        statements = _history_statements(requested, days is not None)
+        params = {"user_id": current_user.id}
         
         # Применяем фильтр по времени, если указан
+        cutoff_date = None
         if days is not None:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
-            query = query.where(Calculation.created_at >= cutoff_date)
+            params["cutoff"] = cutoff_date
+            params["archive_cutoff"] = as_utc(cutoff_date)
         
         # Считаем общее количество для пагинации
-        count_query = select(func.count()).select_from(query.subquery())
-        total = await db.scalar(count_query)
+        hot_total = await db.scalar(statements.count, params)
+        archive_total = 0
+        if reaches_archive(cutoff_date):
+            archive_total = await db.scalar(statements.archive_count, params)
+        total = hot_total + archive_total
+        
+        # Страницу только из горячих строк может целиком собрать Postgres
+        # (архивные блобы он распаковать не может)
+        if (
+            settings.HISTORY_JSON_IN_DB
+            and not settings.DB_EMBEDDED
+            and (not archive_total or offset + limit <= hot_total)
+        ):
+            page = await db.scalar(
+                statements.json_page, {**params, "offset": offset, "limit": limit}
+            )
+            return Response(
+                content=_history_document(page, total, requested is not None),
+                media_type="application/json"
+            )
         
         # Получаем данные с сортировкой (новые сначала) и пагинацией
-        query = query.order_by(desc(Calculation.created_at))
-        query = query.offset(offset).limit(limit)
+        calculations = []
+        if offset < hot_total:
+            result = await db.execute(
+                statements.page, {**params, "offset": offset, "limit": limit}
+            )
+            if requested is None:
+                calculations = list(result.scalars().all())
+            else:
+                calculations = [dict(row) for row in result.mappings().all()]
+        
+        if archive_total and len(calculations) < limit:
+            result = await db.execute(statements.archive_page, {
+                **params,
+                "offset": max(0, offset - hot_total),
+                "limit": limit - len(calculations),
+            })
+            if requested is None:
+                calculations.extend(
+                    archived_calculation(row) for row in result.scalars().all()
+                )
+            else:
+                calculations.extend(
+                    _archive_row(row, requested) for row in result.mappings().all()
+                )
         
-        result = await db.execute(query)
-        calculations = result.scalars().all()
+        if requested is not None:
+            # Частичные строки не проходят через CalculationResponse, но
+            # сериализуются тем же pydantic-core: created_at с "Z", как
+            # в полном ответе и в HISTORY_JSON_IN_DB
+            return Response(
+                content=to_json({"calculations": calculations, "total": total}),
+                media_type="application/json"
+            )
         
         return {
             "calculations": calculations,
             "total": total
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
+        logger.exception("Ошибка при получении истории расчетов")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при получении истории расчетов: {str(e)}"
         )
 
 
+@router.get(
+    "/calendar",
+    response_model=CalculationCalendarResponse,
+    summary="Календарь расчетов",
+    description="Количество расчетов и средние целевые калории по дням, неделям или месяцам"
+)
+async def get_calculations_calendar(
+    *,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
+    bucket: CalendarBucketEnum = Query(CalendarBucketEnum.DAY, description="Интервал: day, week, month"),
+    tz: str = Query("UTC", max_length=64, description="Часовой пояс пользователя (IANA), например Europe/Moscow"),
+    date_from: Optional[date] = Query(None, description="Первый день периода (локальная дата)"),
+    date_to: Optional[date] = Query(None, description="Последний день периода (локальная дата, по умолчанию сегодня)")
+):
+    """
+    Получить календарь расчетов
+
+    Агрегация идет в БД: date_trunc в часовом поясе пользователя,
+    пустые интервалы заполняются через generate_series. Ответ кэшируется
+    по версии данных пользователя: прошедшие интервалы меняются только
+    при записи, которая и так сбрасывает кэш.
+    """
+    if settings.DB_EMBEDDED:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Календарь расчетов доступен только с Postgres"
+        )
+
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестный часовой пояс: {tz}"
+        )
+
+    try:
+        first_bucket, last_bucket = calendar_period(bucket, zone, date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    try:
+        # Период входит в ключ, поэтому с наступлением нового дня ключ меняется сам
+        name = f"calendar:{bucket.value}:{tz}:{first_bucket}:{last_bucket}"
+        version = await response_cache.version(current_user.id)
+        cached = await _cached_response(current_user.id, name, version)
+        if cached is not None:
+            return cached
+
+        result = await db.execute(*calendar_query(
+            current_user.id, bucket, tz, first_bucket, last_bucket
+        ))
+
+        response = CalculationCalendarResponse(
+            bucket=bucket,
+            tz=tz,
+            buckets=[
+                CalendarBucket(
+                    start=row.start,
+                    count=row.count,
+                    avg_calorie_target=(
+                        round(row.avg_calorie_target, 1)
+                        if row.avg_calorie_target is not None else None
+                    )
+                )
+                for row in result
+            ]
+        )
+        return await _store_response(current_user.id, name, response, version)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Ошибка при получении календаря расчетов")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при получении календаря расчетов: {str(e)}"
+        )
+
+
+@router.get(
+    "/benchmarks/percentile",
+    response_model=CohortBenchmarkResponse,
+    summary="Перцентиль TDEE/BMR в своей когорте",
+    description="Положение TDEE и BMR среди людей того же пола и возрастной группы"
+)
+async def get_cohort_percentile(
+    *,
+    current_user: CurrentIdentity = Depends(get_current_user),
+    gender: GenderEnum = Query(..., description="Пол"),
+    age: int = Query(..., gt=0, le=120, description="Возраст"),
+    tdee: Optional[float] = Query(None, gt=0, le=20000, description="TDEE, ккал"),
+    bmr: Optional[float] = Query(None, gt=0, le=20000, description="BMR, ккал")
+):
+    """
+    Получить перцентиль TDEE и/или BMR в когорте
+
+    Ответ строится по квантильным скетчам в памяти, без обращения к БД.
+    Для когорт меньше BENCHMARK_MIN_COHORT_SIZE перцентиль не отдается.
+    """
+    values = {"tdee": tdee, "bmr": bmr}
+    if all(value is None for value in values.values()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Нужно указать tdee и/или bmr"
+        )
+
+    band = age_band(age)
+    benchmarks = []
+    for metric, value in values.items():
+        if value is None:
+            continue
+        sketch = cohort_sketches.get(metric, gender.value, band)
+        size = sketch.n if sketch is not None else 0
+        benchmark = CohortBenchmark(metric=metric, value=value, cohort_size=size)
+        if size >= settings.BENCHMARK_MIN_COHORT_SIZE:
+            benchmark.percentile = round(sketch.rank(value) * 100, 1)
+            benchmark.p25 = sketch.quantile(0.25)
+            benchmark.median = sketch.quantile(0.5)
+            benchmark.p75 = sketch.quantile(0.75)
+        benchmarks.append(benchmark)
+
+    return CohortBenchmarkResponse(gender=gender, age_band=band, benchmarks=benchmarks)
+
+
 @router.get(
     "/{calculation_id}",
     response_model=CalculationResponse,
@@ -180,8 +757,8 @@ async def get_calculations(
 )
 async def get_calculation(
     *,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
     calculation_id: UUID
 ):
     """
@@ -192,14 +769,16 @@ async def get_calculation(
     """
     try:
         # Ищем расчет с проверкой владельца
-        query = select(Calculation).where(
-            (Calculation.id == calculation_id) &
-            (Calculation.user_id == current_user.id)  # Проверяем, что расчет принадлежит пользователю
-        )
-        
-        result = await db.execute(query)
+        result = await db.execute(_CALCULATION_BY_ID, {
+            "calculation_id": calculation_id,
+            "user_id": current_user.id,  # Проверяем, что расчет принадлежит пользователю
+        })
         calculation = result.scalar_one_or_none()
         
+        if not calculation:
+            # Старые расчеты лежат в архиве
+            calculation = await get_archived(db, current_user.id, calculation_id)
+        
         if not calculation:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -211,6 +790,7 @@ async def get_calculation(
     except HTTPException:
         raise
     except Exception as e:
+        logger.exception("Ошибка при получении расчета")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при получении расчета: {str(e)}"
@@ -226,7 +806,7 @@ async def get_calculation(
 async def delete_calculation(
     *,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: CurrentIdentity = Depends(get_current_user),
     calculation_id: UUID
 ):
     """
@@ -236,36 +816,104 @@ async def delete_calculation(
     Требуется авторизация.
     """
     try:
-        # Ищем расчет с проверкой владельца
-        query = select(Calculation).where(
-            (Calculation.id == calculation_id) &
-            (Calculation.user_id == current_user.id)  # Проверяем, что расчет принадлежит пользователю
+        # Один DELETE с проверкой владельца, без предварительного SELECT
+        deleted_ids = await _delete_with_tombstones(
+            db,
+            Calculation,
+            Calculation.id == calculation_id,
+            Calculation.user_id == current_user.id  # Проверяем, что расчет принадлежит пользователю
         )
         
-        result = await db.execute(query)
-        calculation = result.scalar_one_or_none()
+        if not deleted_ids:
+            deleted_ids = await _delete_with_tombstones(
+                db,
+                CalculationArchive,
+                CalculationArchive.id == calculation_id,
+                CalculationArchive.user_id == current_user.id
+            )
         
-        if not calculation:
+        if not deleted_ids:
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Расчет не найден или у вас нет прав на его удаление"
             )
         
-        # Удаляем расчет
-        await db.delete(calculation)
+        await publish_event(db, current_user.id, "calculation.deleted", deleted_ids)
         await db.commit()
-        
-        return None
-        
+
     except HTTPException:
         raise
     except Exception as e:
         await db.rollback()
+        logger.exception("Ошибка при удалении расчета")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при удалении расчета: {str(e)}"
         )
 
+    # Удаление уже закоммичено — сбой кэша не превращает его в ошибку
+    await response_cache.bump(current_user.id)
+    return None
+
+
+@router.post(
+    "/bulk-delete",
+    response_model=CalculationBulkDeleteResponse,
+    summary="Удалить несколько расчетов",
+    description="Удаление расчетов пользователя по списку ID и/или диапазону дат создания"
+)
+async def bulk_delete_calculations(
+    *,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
+    delete_in: CalculationBulkDelete
+):
+    """
+    Удалить несколько расчетов одним запросом
+    
+    Условия объединяются через AND: если указаны и ids, и диапазон,
+    удаляются только расчеты из списка, попадающие в диапазон.
+    Чужие расчеты не затрагиваются.
+    """
+    try:
+        deleted_ids = []
+        # Одни и те же условия для горячей таблицы и архива
+        for model in (Calculation, CalculationArchive):
+            conditions = [model.user_id == current_user.id]
+            if delete_in.ids:
+                conditions.append(model.id.in_(delete_in.ids))
+            if delete_in.created_from is not None:
+                conditions.append(model.created_at >= as_utc(delete_in.created_from))
+            if delete_in.created_to is not None:
+                conditions.append(model.created_at < as_utc(delete_in.created_to))
+
+            deleted_ids.extend(await _delete_with_tombstones(db, model, *conditions))
+
+        if deleted_ids:
+            await publish_event(db, current_user.id, "calculation.deleted", deleted_ids)
+        await db.commit()
+
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.exception("Ошибка при удалении расчетов")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при удалении расчетов: {str(e)}"
+        )
+
+    # Удаление уже закоммичено — сбой кэша не превращает его в ошибку
+    if deleted_ids:
+        await response_cache.bump(current_user.id)
+
+    return {
+        "deleted": len(deleted_ids),
+        "ids": deleted_ids
+    }
+
 
 @router.get(
     "/recent/latest",
@@ -275,8 +923,8 @@ async def delete_calculation(
 )
 async def get_latest_calculation(
     *,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
 ):
     """
     Получить самый последний расчет пользователя
@@ -285,12 +933,12 @@ async def get_latest_calculation(
     Требуется авторизация.
     """
     try:
-        query = select(Calculation).where(
-            Calculation.user_id == current_user.id
-        ).order_by(desc(Calculation.created_at)).limit(1)
-        
-        result = await db.execute(query)
-        calculation = result.scalar_one_or_none()
+        version = await response_cache.version(current_user.id)
+        cached = await _cached_response(current_user.id, "latest", version)
+        if cached is not None:
+            return cached
+
+        calculation = await _latest_calculation(db, current_user.id)
         
         if not calculation:
             raise HTTPException(
@@ -298,11 +946,17 @@ async def get_latest_calculation(
                 detail="У вас пока нет расчетов"
             )
         
-        return calculation
+        return await _store_response(
+            current_user.id, "latest", CalculationResponse.model_validate(calculation), version
+        )
         
-    except HTTPException:
-        raise
     except Exception as e:
+        stale = await _stale_response(current_user.id, "latest", e)
+        if stale is not None:
+            return stale
+        if isinstance(e, HTTPException):
+            raise
+        logger.exception("Ошибка при получении последнего расчета")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при получении последнего расчета: {str(e)}"
@@ -316,47 +970,26 @@ async def get_latest_calculation(
 )
 async def get_calculations_stats(
     *,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: CurrentIdentity = Depends(get_current_user),
 ):
-    """Получить статистику по расчетам пользователя"""
+    """
+    Получить статистику по расчетам пользователя
+
+    Ответ кэшируется до следующей записи пользователя или до момента,
+    когда самый старый расчет выпадет из окна 7 или 30 дней.
+    """
     try:
-        # Общее количество расчетов
-        total_query = select(func.count()).where(Calculation.user_id == current_user.id)
-        total = await db.scalar(total_query) or 0
-        
-        # Расчеты за последние 7 дней
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        last_7_days_query = select(func.count()).where(
-            (Calculation.user_id == current_user.id) &
-            (Calculation.created_at >= week_ago)
-        )
-        last_7_days = await db.scalar(last_7_days_query) or 0
-        
-        # Расчеты за последние 30 дней
-        month_ago = datetime.utcnow() - timedelta(days=30)
-        last_30_days_query = select(func.count()).where(
-            (Calculation.user_id == current_user.id) &
-            (Calculation.created_at >= month_ago)
-        )
-        last_30_days = await db.scalar(last_30_days_query) or 0
+        version = await response_cache.version(current_user.id)
+        cached = await _cached_response(current_user.id, "stats", version)
+        if cached is not None:
+            return cached
+
+        counters = await load_stats_counters(db, current_user.id)
+        total = counters.total
         
         # Получаем последний расчет
-        latest_query = select(Calculation).where(
-            Calculation.user_id == current_user.id
-        ).order_by(desc(Calculation.created_at)).limit(1)
-        
-        result = await db.execute(latest_query)
-        latest_calculation = result.scalar_one_or_none()
-        
-        # Статистика по калориям (если есть расчеты)
-        avg_calories = None
-        if total > 0:
-            avg_query = select(func.avg(Calculation.results['calorie_target'].as_float())).where(
-                Calculation.user_id == current_user.id
-            )
-            avg_result = await db.scalar(avg_query)
-            avg_calories = round(float(avg_result), 1) if avg_result else None
+        latest_calculation = await _latest_calculation(db, current_user.id)
         
         # Самая частая цель
         most_common_goal = None
@@ -373,18 +1006,25 @@ async def get_calculations_stats(
         
         stats = CalculationStats(
             total_calculations=total,
-            last_7_days=last_7_days,
-            last_30_days=last_30_days,
-            average_calories=avg_calories,
+            last_7_days=counters.last_7_days,
+            last_30_days=counters.last_30_days,
+            average_calories=counters.average_calories,
             most_common_goal=most_common_goal
         )
         
-        return {
-            "stats": stats,
-            "last_calculation": latest_calculation
-        }
+        response = CalculationStatsResponse(
+            stats=stats,
+            last_calculation=latest_calculation
+        )
+        return await _store_response(current_user.id, "stats", response, version, counters.valid_until)
         
     except Exception as e:
+        stale = await _stale_response(current_user.id, "stats", e)
+        if stale is not None:
+            return stale
+        if isinstance(e, HTTPException):
+            raise
+        logger.exception("Ошибка при получении статистики")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при получении статистики: {str(e)}"
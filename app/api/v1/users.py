@@ -1,43 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update
 from typing import Optional
+from app.core.tracing import TracedRoute
 from app.core.database import get_db
-from app.api.deps import get_current_active_user
-from app.schemas.user import UserResponse, UserWithProfileResponse
-from app.models.user import User
+from app.core.reference_data import reference_data
+from app.core.response_cache import STALE_WARNING
+from app.api.deps import CurrentIdentity, get_current_active_user, invalidate_identity
+from app.schemas.user import UserResponse, UserWithProfileResponse, UserProfileUpdate
 from app.models.user_profile import UserProfile
 from app.models.activity_level import ActivityLevel
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+logger = logging.getLogger(__name__)
 
 @router.get("/me", response_model=UserWithProfileResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_active_user),
-    db: AsyncSession = Depends(get_db)
+    response: Response,
+    current_user: CurrentIdentity = Depends(get_current_active_user),
 ):
     """Получение информации о текущем пользователе."""
-    result = await db.execute(
-        select(UserProfile)
-        .options(selectinload(UserProfile.activity_level))
-        .filter(UserProfile.user_id == current_user.id)
-    )
-    profile = result.scalar_one_or_none()
-
-    profile_data = {
-        "user_id": profile.user_id if profile else current_user.id,
-        "name": profile.name if profile else "",
-        "gender": profile.gender if profile else "male",
-        "birth_date": profile.birth_date if profile else None,
-        "height_cm": profile.height_cm if profile else None,
-        "weight_kg": profile.weight_kg if profile else None,
-        "activity_level_id": profile.activity_level_id if profile else None,
-        # "activity_level_code": "sedentary",
-        "activity_level_code": profile.activity_level.code if profile and profile.activity_level else None,
+    if current_user.stale:
+        response.headers["Warning"] = STALE_WARNING
+    # Профиль уже загружен вместе с пользователем в get_current_user
+    profile_data = current_user.profile or {
+        "user_id": current_user.id,
+        "name": "",
+        "gender": "male",
+        "birth_date": None,
+        "height_cm": None,
+        "weight_kg": None,
+        "activity_level_id": None,
+        "activity_level_code": None,
     }
-    
-    print(profile_data)
+
+    # Без содержимого профиля: персональные данные в логи не пишем
+    logger.debug("Отдан профиль пользователя", extra={"user_id": str(current_user.id)})
 
     user_data = {
         "id": current_user.id,
@@ -51,15 +51,13 @@ async def get_current_user_info(
 @router.put("/me/profile", response_model=UserWithProfileResponse)
 async def update_user_profile(
     profile_data: dict,
-    current_user: User = Depends(get_current_active_user),
+    current_user: CurrentIdentity = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ):
-    result = await db.execute(
-        select(UserProfile)
-        .options(selectinload(UserProfile.activity_level))
-        .where(UserProfile.user_id == current_user.id)
+    profile = await db.get(UserProfile, current_user.id)
+    activity_level_code = (
+        current_user.profile["activity_level_code"] if current_user.profile else None
     )
-    profile = result.scalar_one_or_none()
 
     if not profile:
         profile = UserProfile(user_id=current_user.id)
@@ -88,13 +86,10 @@ async def update_user_profile(
             )
 
         profile.activity_level_id = activity.id
+        activity_level_code = activity.code
 
     await db.commit()
-    await db.refresh(profile)
-    
-    # Также обновляем связанный объект activity_level
-    if profile.activity_level_id:
-        await db.refresh(profile, ['activity_level'])
+    await invalidate_identity(current_user.id)
 
     # Возвращаем обновленные данные пользователя
     profile_data_response = {
@@ -105,7 +100,7 @@ async def update_user_profile(
         "height_cm": profile.height_cm,
         "weight_kg": profile.weight_kg,
         "activity_level_id": profile.activity_level_id,
-        "activity_level_code": profile.activity_level.code if profile.activity_level else None,
+        "activity_level_code": activity_level_code,
     }
     
     user_data = {
@@ -116,3 +111,73 @@ async def update_user_profile(
     }
     
     return user_data
+
+
+@router.patch("/me/profile", response_model=UserWithProfileResponse)
+async def patch_user_profile(
+    profile_in: UserProfileUpdate,
+    current_user: CurrentIdentity = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Частичное обновление профиля одним UPDATE ... RETURNING."""
+    changes = profile_in.model_dump(exclude_unset=True)
+
+    # Код уровня активности разрешается по справочнику в памяти
+    if 'activity_level_code' in changes:
+        code = changes.pop('activity_level_code')
+        activity_level_id = None
+        if code is not None:
+            activity = await reference_data.activity_level_by_code(db, code)
+            if activity is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail='Invalid activity code'
+                )
+            activity_level_id = activity.id
+        changes['activity_level_id'] = activity_level_id
+
+    if not changes:
+        if current_user.profile is None:
+            raise HTTPException(status_code=404, detail='Profile not found')
+        return {
+            "id": current_user.id,
+            "email": current_user.email,
+            "created_at": current_user.created_at,
+            "profile": current_user.profile
+        }
+
+    result = await db.execute(
+        update(UserProfile)
+        .where(UserProfile.user_id == current_user.id)
+        .values(**changes)
+        .returning(
+            UserProfile.user_id,
+            UserProfile.name,
+            UserProfile.gender,
+            UserProfile.birth_date,
+            UserProfile.height_cm,
+            UserProfile.weight_kg,
+            UserProfile.activity_level_id,
+        ),
+        execution_options={"synchronize_session": False}
+    )
+    row = result.one_or_none()
+    if row is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail='Profile not found')
+
+    await db.commit()
+    await invalidate_identity(current_user.id)
+
+    activity = await reference_data.activity_level_by_id(db, row.activity_level_id)
+    profile_data_response = {
+        **row._asdict(),
+        "activity_level_code": activity.code if activity else None,
+    }
+
+    return {
+        "id": current_user.id,
+        "email": current_user.email,
+        "created_at": current_user.created_at,
+        "profile": profile_data_response
+    }
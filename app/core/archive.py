@@ -0,0 +1,157 @@
+"""
+Архив старых расчетов.
+
+Расчеты старше ARCHIVE_AFTER_DAYS переносятся фоновой задачей из
+calculations в calculations_archive: goal_id, calorie_target и created_at
+остаются колонками, а input_data/results упаковываются в один блоб
+(JSON, сжатый zlib с общим словарем ключей — у маленьких документов
+почти весь объем составляют повторяющиеся имена полей).
+
+Перенос идет от самых старых расчетов, поэтому любой архивный расчет
+старше любого горячего, и история читается как «горячие, затем архив».
+"""
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import select, delete, bindparam
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.calculation import Calculation
+from app.models.calculation_archive import CalculationArchive
+from app.schemas.calculation import CalculationResponse
+
+# Окна статистики (7/30 дней) всегда должны оставаться в горячей таблице
+MIN_ARCHIVE_AGE_DAYS = 31
+
+PAYLOAD_FORMAT_V1 = 1
+
+# Словарь сжатия формата v1. Менять нельзя: им распаковываются уже
+# записанные блобы. Для нового словаря — новый номер формата.
+_ZDICT_V1 = (
+    b'"goal":"loss""goal":"maintain""goal":"gain"'
+    b'"gender":"female""gender":"male"'
+    b'"activity_level":"sedentary""activity_level":"light"'
+    b'"activity_level":"high""activity_level":"extreme""activity_level":"moderate"'
+    b'"activity_level_id":"age":"height":'
+    b'"formula_used":"mifflin_st_jeor"'
+    b'{"input_data":{"weight":'
+    b'},"results":{"bmr":'
+    b',"tdee":,"calorie_target":,"coefficient":'
+)
+
+
+def pack_payload(input_data: Dict[str, Any], results: Dict[str, Any]) -> bytes:
+    raw = json.dumps(
+        {"input_data": input_data, "results": results},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    ).encode("utf-8")
+    compressor = zlib.compressobj(level=9, zdict=_ZDICT_V1)
+    return bytes([PAYLOAD_FORMAT_V1]) + compressor.compress(raw) + compressor.flush()
+
+
+def unpack_payload(payload: bytes) -> Dict[str, Any]:
+    if payload[0] != PAYLOAD_FORMAT_V1:
+        raise ValueError(f"Неизвестный формат архивного блоба: {payload[0]}")
+    decompressor = zlib.decompressobj(zdict=_ZDICT_V1)
+    raw = decompressor.decompress(payload[1:]) + decompressor.flush()
+    return json.loads(raw)
+
+
+def _calorie_target(results: Dict[str, Any]) -> Optional[float]:
+    try:
+        return float(results["calorie_target"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def hot_window_start() -> datetime:
+    """Граница горячей таблицы: все, что новее, гарантированно не в архиве."""
+    days = max(settings.ARCHIVE_AFTER_DAYS, MIN_ARCHIVE_AGE_DAYS)
+    return datetime.utcnow() - timedelta(days=days)
+
+
+def reaches_archive(since: Optional[datetime]) -> bool:
+    return since is None or since < hot_window_start()
+
+
+def as_utc(value: datetime) -> datetime:
+    """Наивные даты в проекте — UTC; архив хранит timestamptz."""
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def archived_calculation(row: CalculationArchive) -> CalculationResponse:
+    payload = unpack_payload(row.payload)
+    return CalculationResponse(
+        id=row.id,
+        user_id=row.user_id,
+        goal_id=row.goal_id,
+        input_data=payload["input_data"],
+        results=payload["results"],
+        created_at=row.created_at,
+    )
+
+
+_ARCHIVED_BY_ID = select(CalculationArchive).where(
+    (CalculationArchive.id == bindparam("calculation_id")) &
+    (CalculationArchive.user_id == bindparam("user_id"))
+)
+
+
+async def get_archived(db: AsyncSession, user_id: UUID, calculation_id: UUID) -> Optional[CalculationResponse]:
+    row = await db.scalar(
+        _ARCHIVED_BY_ID, {"calculation_id": calculation_id, "user_id": user_id}
+    )
+    return archived_calculation(row) if row is not None else None
+
+
+async def archive_batch(db: AsyncSession, cutoff: datetime, batch_size: int) -> int:
+    """
+    Перенести в архив до batch_size самых старых расчетов старше cutoff.
+
+    Удаление и вставка идут в одной транзакции (коммит делает вызывающий):
+    читатель видит расчет либо в горячей таблице, либо в архиве.
+    """
+    victims = (
+        select(Calculation.id)
+        .where(Calculation.created_at < cutoff)
+        .order_by(Calculation.created_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    result = await db.execute(
+        delete(Calculation)
+        .where(Calculation.id.in_(victims.scalar_subquery()))
+        .returning(
+            Calculation.id,
+            Calculation.user_id,
+            Calculation.goal_id,
+            Calculation.input_data,
+            Calculation.results,
+            Calculation.created_at,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+    rows = result.all()
+    if not rows:
+        return 0
+
+    await db.execute(
+        insert(CalculationArchive).values([
+            {
+                "id": row.id,
+                "user_id": row.user_id,
+                "goal_id": row.goal_id,
+                "calorie_target": _calorie_target(row.results),
+                "payload": pack_payload(row.input_data, row.results),
+                "created_at": as_utc(row.created_at),
+            }
+            for row in rows
+        ]).on_conflict_do_nothing(index_elements=[CalculationArchive.id])
+    )
+    return len(rows)
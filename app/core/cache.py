@@ -0,0 +1,373 @@
+"""
+Кэш с подключаемым бэкендом.
+
+- memory — LRU в памяти процесса (один воркер);
+- redis  — общий кэш по протоколу Redis (RESP), без клиентской библиотеки;
+- tiered — ближний LRU в памяти перед общим Redis; изменения рассылаются
+  через pub/sub, и остальные воркеры сбрасывают свои ближние копии.
+"""
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+INVALIDATION_CHANNEL = "metabalance:cache:invalidate"
+
+InvalidationCallback = Callable[[str], Awaitable[None]]
+
+
+class CacheError(Exception):
+    """Ошибка общего кэша (соединение, ответ сервера)."""
+
+
+class CacheBackend(ABC):
+    """Интерфейс кэша: значения — байты, ключи — строки."""
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """LRU в памяти с ограничением по объему и необязательным TTL."""
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._size = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.get_nowait(key)
+
+    def get_nowait(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self.set_nowait(key, value, ttl)
+
+    def set_nowait(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if len(value) > self._max_bytes:
+            return
+        self.discard(key)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, expires_at)
+        self._size += len(value)
+        while self._size > self._max_bytes:
+            self.discard(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self.discard(key)
+
+    def discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+    async def incr(self, key: str) -> int:
+        value = int(self.get_nowait(key) or 0) + 1
+        self.set_nowait(key, str(value).encode())
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self._max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+# =========================
+# RESP (протокол Redis)
+# =========================
+
+def _encode_command(*args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        elif not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+class _RespConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(cls, url: str, timeout: float) -> "_RespConnection":
+        parsed = urlparse(url)
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parsed.hostname or "localhost", parsed.port or 6379),
+            timeout,
+        )
+        conn = cls(reader, writer)
+        if parsed.password:
+            if parsed.username:
+                await conn.command("AUTH", parsed.username, parsed.password)
+            else:
+                await conn.command("AUTH", parsed.password)
+        db = (parsed.path or "/0").lstrip("/") or "0"
+        if db != "0":
+            await conn.command("SELECT", db)
+        return conn
+
+    async def send(self, *args) -> None:
+        self._writer.write(_encode_command(*args))
+        await self._writer.drain()
+
+    async def command(self, *args):
+        await self.send(*args)
+        return await self.read_reply()
+
+    async def read_reply(self):
+        line = await self._reader.readline()
+        if not line:
+            raise CacheError("Connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise CacheError(payload.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await self.read_reply() for _ in range(length)]
+        raise CacheError(f"Unexpected reply: {line!r}")
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Общий кэш по протоколу Redis.
+
+    Работает с любым сервером, понимающим RESP (Redis, KeyDB, Dragonfly,
+    локальная заглушка в тестах). Ошибки соединения при чтении и записи
+    считаются промахом: кэш не должен ронять запросы.
+    """
+
+    def __init__(self, url: str, pool_size: int = 10, timeout: float = 1.0):
+        self._url = url
+        self._timeout = timeout
+        self._idle: List[_RespConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+        self._subscriber_task: Optional[asyncio.Task] = None
+        self._callbacks: Dict[str, List[InvalidationCallback]] = {}
+        self.errors = 0
+
+    async def _execute(self, *args):
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await _RespConnection.open(self._url, self._timeout)
+            try:
+                reply = await asyncio.wait_for(conn.command(*args), self._timeout)
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.append(conn)
+            return reply
+
+    async def _safe(self, *args):
+        try:
+            return await self._execute(*args)
+        except (OSError, asyncio.TimeoutError, CacheError):
+            self.errors += 1
+            return None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._safe("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        if ttl is not None:
+            await self._safe("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        else:
+            await self._safe("SET", key, value)
+
+    async def delete(self, key: str) -> None:
+        await self._safe("DEL", key)
+
+    async def incr(self, key: str) -> int:
+        # Потерянный инкремент версии означает устаревший кэш — пробрасываем
+        return await self._execute("INCR", key)
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self._safe("PUBLISH", channel, message)
+
+    def subscribe(self, channel: str, callback: InvalidationCallback) -> None:
+        self._callbacks.setdefault(channel, []).append(callback)
+
+    async def start(self) -> None:
+        if self._callbacks and self._subscriber_task is None:
+            self._subscriber_task = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        delay = 0.1
+        while True:
+            conn = None
+            try:
+                conn = await _RespConnection.open(self._url, self._timeout)
+                for channel in self._callbacks:
+                    await conn.send("SUBSCRIBE", channel)
+                delay = 0.1
+                while True:
+                    reply = await conn.read_reply()
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        channel = reply[1].decode()
+                        for callback in self._callbacks.get(channel, []):
+                            await callback(reply[2].decode())
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.TimeoutError, CacheError):
+                self.errors += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    async def close(self) -> None:
+        if self._subscriber_task is not None:
+            self._subscriber_task.cancel()
+            try:
+                await self._subscriber_task
+            except asyncio.CancelledError:
+                pass
+            self._subscriber_task = None
+        while self._idle:
+            self._idle.pop().close()
+
+    def stats(self) -> dict:
+        return {"errors": self.errors, "idle_connections": len(self._idle)}
+
+
+class TieredCache(CacheBackend):
+    """
+    Ближний LRU в памяти перед общим кэшем.
+
+    Каждое изменение ключа публикуется в INVALIDATION_CHANNEL; остальные
+    воркеры удаляют ключ из ближнего уровня и при следующем чтении
+    берут свежее значение из общего кэша.
+    """
+
+    def __init__(self, near: MemoryCacheBackend, far: RedisCacheBackend, near_ttl: float):
+        self._near = near
+        self._far = far
+        self._near_ttl = near_ttl
+        self._origin = uuid.uuid4().hex
+        self.near_hits = 0
+        self.far_hits = 0
+        far.subscribe(INVALIDATION_CHANNEL, self._on_invalidate)
+
+    async def _on_invalidate(self, message: str) -> None:
+        origin, _, key = message.partition(":")
+        if origin != self._origin:
+            self._near.discard(key)
+
+    async def _announce(self, key: str) -> None:
+        await self._far.publish(INVALIDATION_CHANNEL, f"{self._origin}:{key}")
+
+    async def start(self) -> None:
+        await self._far.start()
+
+    async def close(self) -> None:
+        await self._far.close()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = self._near.get_nowait(key)
+        if value is not None:
+            self.near_hits += 1
+            return value
+        value = await self._far.get(key)
+        if value is not None:
+            self.far_hits += 1
+            self._near.set_nowait(key, value, self._near_ttl)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await self._far.set(key, value, ttl)
+        near_ttl = self._near_ttl if ttl is None else min(ttl, self._near_ttl)
+        self._near.set_nowait(key, value, near_ttl)
+        await self._announce(key)
+
+    async def delete(self, key: str) -> None:
+        await self._far.delete(key)
+        self._near.discard(key)
+        await self._announce(key)
+
+    async def incr(self, key: str) -> int:
+        value = await self._far.incr(key)
+        self._near.set_nowait(key, str(value).encode(), self._near_ttl)
+        await self._announce(key)
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "near": self._near.stats(),
+            "far": self._far.stats(),
+            "near_hits": self.near_hits,
+            "far_hits": self.far_hits,
+        }
+
+
+def create_cache() -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.CACHE_REDIS_URL)
+    if settings.CACHE_BACKEND == "tiered":
+        return TieredCache(
+            near=MemoryCacheBackend(settings.CACHE_MAX_BYTES),
+            far=RedisCacheBackend(settings.CACHE_REDIS_URL),
+            near_ttl=settings.CACHE_NEAR_TTL_SECONDS,
+        )
+    return MemoryCacheBackend(settings.CACHE_MAX_BYTES)
+
+
+cache: CacheBackend = create_cache()
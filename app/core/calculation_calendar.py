@@ -0,0 +1,134 @@
+"""
+Календарь расчетов: период и SQL для GET /calculations/calendar.
+
+Агрегация идет в Postgres: date_trunc в часовом поясе пользователя,
+пустые интервалы заполняются через generate_series. Границы интервалов
+считаются здесь теми же правилами, что и date_trunc (неделя — с
+понедельника), чтобы период из запроса совпадал с интервалами в ответе.
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+from sqlalchemy.sql.elements import TextClause
+
+from app.core.archive import reaches_archive
+from app.schemas.calculation import CalendarBucketEnum
+
+MAX_CALENDAR_BUCKETS = 400
+
+# Период по умолчанию: 30 дней, 12 недель, 12 месяцев
+DEFAULT_CALENDAR_BUCKETS = {
+    CalendarBucketEnum.DAY: 30,
+    CalendarBucketEnum.WEEK: 12,
+    CalendarBucketEnum.MONTH: 12,
+}
+
+CALENDAR_QUERY = """
+WITH points AS (
+    SELECT created_at, (results->>'calorie_target')::float AS calorie_target
+    FROM calculations
+    WHERE user_id = :user_id AND created_at >= :range_start AND created_at < :range_end
+    {archive}
+),
+totals AS (
+    SELECT
+        date_trunc(:unit, created_at AT TIME ZONE :tz) AS start,
+        count(*) AS count,
+        avg(calorie_target) AS avg_calorie_target
+    FROM points
+    GROUP BY 1
+)
+SELECT s.start::date AS start, coalesce(t.count, 0) AS count, t.avg_calorie_target
+FROM generate_series(
+    CAST(:first_bucket AS timestamp),
+    CAST(:last_bucket AS timestamp),
+    ('1 ' || :unit)::interval
+) AS s(start)
+LEFT JOIN totals t ON t.start = s.start
+ORDER BY s.start
+"""
+
+CALENDAR_ARCHIVE_POINTS = """
+    UNION ALL
+    SELECT created_at, calorie_target
+    FROM calculations_archive
+    WHERE user_id = :user_id AND created_at >= :range_start AND created_at < :range_end
+"""
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def _bucket_start(day: date, bucket: CalendarBucketEnum) -> date:
+    """То же, что date_trunc в Postgres (неделя начинается с понедельника)."""
+    if bucket == CalendarBucketEnum.WEEK:
+        return day - timedelta(days=day.weekday())
+    if bucket == CalendarBucketEnum.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _shift_buckets(day: date, bucket: CalendarBucketEnum, count: int) -> date:
+    if bucket == CalendarBucketEnum.WEEK:
+        return day + timedelta(weeks=count)
+    if bucket == CalendarBucketEnum.MONTH:
+        return _add_months(day, count)
+    return day + timedelta(days=count)
+
+
+def calendar_period(
+    bucket: CalendarBucketEnum,
+    zone: ZoneInfo,
+    date_from: Optional[date],
+    date_to: Optional[date],
+) -> Tuple[date, date]:
+    """
+    Начала первого и последнего интервала периода. По умолчанию период
+    заканчивается сегодня (в zone); ValueError — пустой или слишком
+    длинный период.
+    """
+    if date_to is None:
+        date_to = datetime.now(zone).date()
+    last_bucket = _bucket_start(date_to, bucket)
+    if date_from is None:
+        first_bucket = _shift_buckets(last_bucket, bucket, 1 - DEFAULT_CALENDAR_BUCKETS[bucket])
+    else:
+        first_bucket = _bucket_start(date_from, bucket)
+
+    if first_bucket > last_bucket:
+        raise ValueError("date_from должен быть не позже date_to")
+    if _shift_buckets(first_bucket, bucket, MAX_CALENDAR_BUCKETS) <= last_bucket:
+        raise ValueError(f"Слишком длинный период: не больше {MAX_CALENDAR_BUCKETS} интервалов")
+    return first_bucket, last_bucket
+
+
+def calendar_query(
+    user_id: UUID,
+    bucket: CalendarBucketEnum,
+    tz: str,
+    first_bucket: date,
+    last_bucket: date,
+) -> Tuple[TextClause, dict]:
+    """Запрос и параметры календаря; архив читается, только если период до него доходит."""
+    zone = ZoneInfo(tz)
+    # Границы периода в UTC (полночь по локальному времени)
+    range_start = datetime.combine(first_bucket, datetime.min.time(), zone).astimezone(timezone.utc)
+    range_end = datetime.combine(
+        _shift_buckets(last_bucket, bucket, 1), datetime.min.time(), zone
+    ).astimezone(timezone.utc)
+
+    archive = CALENDAR_ARCHIVE_POINTS if reaches_archive(range_start.replace(tzinfo=None)) else ""
+    return text(CALENDAR_QUERY.format(archive=archive)), {
+        "user_id": user_id,
+        "unit": bucket.value,
+        "tz": tz,
+        "range_start": range_start,
+        "range_end": range_end,
+        "first_bucket": datetime.combine(first_bucket, datetime.min.time()),
+        "last_bucket": datetime.combine(last_bucket, datetime.min.time()),
+    }
@@ -0,0 +1,89 @@
+"""
+Счетчики для GET /calculations/stats/summary.
+
+Все счетчики считаются одним запросом: агрегат по горячей таблице и по
+архиву (архив старше окон 7/30 дней и добавляет только общее число и
+калории). Запрос собран один раз на уровне модуля с bindparam, как
+горячие запросы в app.api.v1.calculations.
+"""
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import bindparam, func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.calculation import Calculation
+from app.models.calculation_archive import CalculationArchive
+
+
+def _stats_query():
+    in_week = Calculation.created_at >= bindparam("week_ago")
+    in_month = Calculation.created_at >= bindparam("month_ago")
+    calorie_target = Calculation.results['calorie_target'].as_float()
+    hot = select(
+        func.count().label("total"),
+        func.count().filter(in_week).label("last_7_days"),
+        func.count().filter(in_month).label("last_30_days"),
+        func.sum(calorie_target).label("calories_sum"),
+        func.count(calorie_target).label("calories_count"),
+        func.min(Calculation.created_at).filter(in_week).label("oldest_in_week"),
+        func.min(Calculation.created_at).filter(in_month).label("oldest_in_month"),
+    ).where(Calculation.user_id == bindparam("user_id")).subquery()
+    archive = select(
+        func.count().label("total"),
+        func.sum(CalculationArchive.calorie_target).label("calories_sum"),
+        func.count(CalculationArchive.calorie_target).label("calories_count"),
+    ).where(CalculationArchive.user_id == bindparam("user_id")).subquery()
+    # Оба агрегата дают ровно одну строку: явный JOIN ON true вместо
+    # перечисления через запятую (иначе SAWarning о декартовом произведении)
+    return select(hot, archive).select_from(hot.join(archive, true()))
+
+
+_STATS_QUERY = _stats_query()
+
+
+class StatsCounters(NamedTuple):
+    total: int
+    last_7_days: int
+    last_30_days: int
+    average_calories: Optional[float]
+    # Когда счетчики за 7/30 дней изменятся без новых записей (unix time)
+    valid_until: Optional[float]
+
+
+async def load_stats_counters(db: AsyncSession, user_id: UUID) -> StatsCounters:
+    now = datetime.utcnow()
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+
+    (
+        hot_total, last_7_days, last_30_days, calories_sum, calories_count,
+        oldest_in_week, oldest_in_month,
+        archive_total, archive_calories_sum, archive_calories_count,
+    ) = (await db.execute(_STATS_QUERY, {
+        "user_id": user_id,
+        "week_ago": week_ago,
+        "month_ago": month_ago,
+    })).one()
+
+    calories_sum = (calories_sum or 0.0) + (archive_calories_sum or 0.0)
+    calories_count += archive_calories_count
+
+    # Счетчики за 7/30 дней изменятся, когда старейший расчет выйдет из окна
+    expirations = [
+        oldest.timestamp() + window.total_seconds()
+        for oldest, window in (
+            (oldest_in_week, timedelta(days=7)),
+            (oldest_in_month, timedelta(days=30)),
+        )
+        if oldest is not None
+    ]
+
+    return StatsCounters(
+        total=hot_total + archive_total,
+        last_7_days=last_7_days,
+        last_30_days=last_30_days,
+        average_calories=round(calories_sum / calories_count, 1) if calories_count else None,
+        valid_until=min(expirations) if expirations else None,
+    )
@@ -0,0 +1,279 @@
+"""
+Предохранитель (circuit breaker) перед базой данных.
+
+Пока Postgres тормозит или недоступен, каждый запрос ждал бы пул и
+таймауты и в итоге отвечал 500. Предохранитель следит за SQL-операторами
+и новыми соединениями движков запросов (события cursor_execute и
+do_connect) в скользящем окне:
+
+- closed — операторы идут в БД; если за DB_BREAKER_WINDOW_SECONDS было
+  не меньше DB_BREAKER_MIN_CALLS вызовов и доля ошибок соединения или
+  медленных вызовов превысила порог, предохранитель размыкается;
+- open — операторы сразу получают DatabaseUnavailable (503 с
+  Retry-After), не занимая соединения и не дожидаясь таймаутов;
+- half_open — через DB_BREAKER_OPEN_SECONDS пропускается
+  DB_BREAKER_HALF_OPEN_CALLS пробных вызовов: все успешны — closed,
+  хоть один неудачен — снова open.
+
+Ошибками считаются только отказы БД (соединение, таймауты); нарушения
+ограничений и ошибки в SQL показывают, что БД отвечает. Пока БД
+недоступна, часть GET-ответов отдается из устаревших копий
+(см. _stale_response в app.api.v1.calculations и get_current_user).
+
+Операторы и новые соединения внутри with breaker_bypass(): предохранитель
+не проверяет и не учитывает (проверка готовности).
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class DatabaseUnavailable(HTTPException):
+    """БД временно недоступна: предохранитель разомкнут."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="База данных временно недоступна",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def is_database_outage(exc: BaseException) -> bool:
+    """Отказ БД (а не ошибка запроса): можно отдать устаревшую копию."""
+    return isinstance(exc, (
+        DatabaseUnavailable,
+        OperationalError,
+        InterfaceError,
+        PoolTimeoutError,
+        # asyncpg отдает ошибки подключения без обертки DBAPI
+        OSError,
+        asyncio.TimeoutError,
+    ))
+
+
+class CircuitBreaker:
+    """
+    Скользящее окно из посекундных корзин [секунда, вызовы, ошибки,
+    медленные] — учет вызова O(1), без хранения каждого вызова.
+    Все вызовы идут из потока event loop, блокировки не нужны.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        slow_call_rate: float,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self._window = window
+        self._min_calls = min_calls
+        self._failure_rate = failure_rate
+        self._slow_call_seconds = slow_call_seconds
+        self._slow_call_rate = slow_call_rate
+        self._open_seconds = open_seconds
+        self._half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self._buckets: Deque[List[int]] = deque()
+        self._opened_until = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+
+        self.rejected = 0
+        self.opened = 0
+        self.last_opened_reason: Optional[str] = None
+
+    # ===== СОСТОЯНИЕ =====
+
+    def _open(self, reason: str) -> None:
+        self.state = OPEN
+        self._opened_until = time.monotonic() + self._open_seconds
+        self._buckets.clear()
+        self.opened += 1
+        self.last_opened_reason = reason
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._buckets.clear()
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_until - time.monotonic())
+
+    def before_call(self) -> None:
+        """Пропустить вызов или сразу отказать (DatabaseUnavailable)."""
+        if self.state == CLOSED:
+            return
+        if self.state == OPEN:
+            if time.monotonic() < self._opened_until:
+                self.rejected += 1
+                raise DatabaseUnavailable(self.retry_after())
+            self.state = HALF_OPEN
+            self._trials = 0
+            self._trial_successes = 0
+        if self._trials >= self._half_open_calls:
+            self.rejected += 1
+            raise DatabaseUnavailable(1)
+        self._trials += 1
+
+    # ===== УЧЕТ ВЫЗОВОВ =====
+
+    def record(self, duration: float, failed: bool) -> None:
+        slow = duration >= self._slow_call_seconds
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self._open("пробный вызов неудачен" if failed else "пробный вызов медленный")
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self._half_open_calls:
+                self._close()
+            return
+        if self.state == OPEN:
+            # Вызов, начатый до размыкания
+            return
+
+        second = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == second:
+            bucket = self._buckets[-1]
+        else:
+            bucket = [second, 0, 0, 0]
+            self._buckets.append(bucket)
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+
+        horizon = second - self._window
+        while self._buckets and self._buckets[0][0] <= horizon:
+            self._buckets.popleft()
+
+        calls = failures = slow_calls = 0
+        for _, bucket_calls, bucket_failures, bucket_slow in self._buckets:
+            calls += bucket_calls
+            failures += bucket_failures
+            slow_calls += bucket_slow
+        if calls < self._min_calls:
+            return
+        if failures / calls >= self._failure_rate:
+            self._open(f"ошибки БД: {failures} из {calls}")
+        elif slow_calls / calls >= self._slow_call_rate:
+            self._open(f"медленные вызовы: {slow_calls} из {calls}")
+
+    def stats(self) -> dict:
+        calls = sum(bucket[1] for bucket in self._buckets)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "window_failures": sum(bucket[2] for bucket in self._buckets),
+            "window_slow": sum(bucket[3] for bucket in self._buckets),
+            "retry_after": round(self.retry_after(), 1) if self.state == OPEN else None,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "last_opened_reason": self.last_opened_reason,
+        }
+
+
+db_breaker = CircuitBreaker(
+    window=settings.DB_BREAKER_WINDOW_SECONDS,
+    min_calls=settings.DB_BREAKER_MIN_CALLS,
+    failure_rate=settings.DB_BREAKER_FAILURE_RATE,
+    slow_call_seconds=settings.DB_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate=settings.DB_BREAKER_SLOW_CALL_RATE,
+    open_seconds=settings.DB_BREAKER_OPEN_SECONDS,
+    half_open_calls=settings.DB_BREAKER_HALF_OPEN_CALLS,
+)
+
+
+# ===== СОБЫТИЯ ДВИЖКА =====
+
+_bypass: ContextVar[bool] = ContextVar("circuit_breaker_bypass", default=False)
+
+
+@contextmanager
+def breaker_bypass():
+    """
+    Обращения к БД внутри блока идут мимо предохранителя — и операторы,
+    и открытие новых соединений пулом. Контекст доходит до событий
+    движка: SQLAlchemy переносит его в greenlet драйвера.
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _bypass.get():
+        return
+    db_breaker.before_call()
+    context._breaker_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_breaker_started", None)
+    if started is not None:
+        context._breaker_started = None
+        db_breaker.record(time.perf_counter() - started, failed=False)
+
+
+def _handle_error(exception_context):
+    error = exception_context.original_exception
+    if isinstance(error, DatabaseUnavailable):
+        return
+    context = exception_context.execution_context
+    started = getattr(context, "_breaker_started", None) if context is not None else None
+    if context is not None:
+        if started is None:
+            # Оператор, не проходивший через предохранитель
+            return
+        context._breaker_started = None
+    duration = time.perf_counter() - started if started is not None else 0.0
+    failed = exception_context.is_disconnect or is_database_outage(
+        exception_context.sqlalchemy_exception or error
+    )
+    db_breaker.record(duration, failed=failed)
+
+
+def _do_connect(dialect, connection_record, cargs, cparams):
+    # Новое соединение — тоже вызов БД: при разомкнутом предохранителе не
+    # ждем таймаута подключения. Отказы подключения не проходят через
+    # handle_error (asyncpg бросает OSError), поэтому учитываем их здесь
+    if _bypass.get():
+        return dialect.connect(*cargs, **cparams)
+    db_breaker.before_call()
+    started = time.perf_counter()
+    try:
+        connection = dialect.connect(*cargs, **cparams)
+    except Exception:
+        db_breaker.record(time.perf_counter() - started, failed=True)
+        raise
+    db_breaker.record(time.perf_counter() - started, failed=False)
+    return connection
+
+
+def guard_engine(engine: Engine) -> None:
+    """Подключить предохранитель к движку (для async — engine.sync_engine)."""
+    if not settings.DB_BREAKER_ENABLED:
+        return
+    event.listen(engine, "do_connect", _do_connect)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -1,7 +1,7 @@
 import os
 from pydantic_settings import BaseSettings
 from pydantic import computed_field
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -15,6 +15,29 @@ class Settings(BaseSettings):
     DB_USER: Optional[str] = None
     DB_PASSWORD: Optional[str] = None
 
+    # Реплики только для чтения (GET-запросы)
+    DATABASE_REPLICA_URLS: List[str] = []
+    REPLICA_ROUTING: str = "round_robin"  # round_robin | least_connections
+    READ_YOUR_WRITES_SECONDS: int = 5  # сколько читать с primary после записи
+
+    DB_STARTUP_TIMEOUT_SECONDS: float = 60.0  # сколько ждать БД при старте
+
+    # Подготовленные операторы asyncpg
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500  # на соединение
+    # За pgbouncer в режиме transaction имена операторов на серверных
+    # соединениях не принадлежат клиенту: кэш выключается, имена уникальны
+    DB_PGBOUNCER: bool = False
+    # pgbouncer >= 1.21 с max_prepared_statements сам отслеживает операторы
+    PGBOUNCER_PREPARED_STATEMENTS: bool = False
+    # Прямое подключение к Postgres в обход pgbouncer (advisory lock, LISTEN)
+    DATABASE_DIRECT_URL: Optional[str] = None
+
+    # Встроенная БД: SQLite (aiosqlite) в файле вместо Postgres — для
+    # локальных бенчмарков и тестов. Что работает только с Postgres,
+    # перечислено в app.core.embedded
+    DB_EMBEDDED: bool = False
+    DB_EMBEDDED_PATH: str = "metabalance.sqlite3"
+
     DB_DIALECT: str = "postgresql"
     DB_ASYNC_DRIVER: str = "asyncpg"
     DB_SYNC_DRIVER: str = "psycopg2"
@@ -25,6 +48,113 @@ class Settings(BaseSettings):
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30  # Добавляем настройку для refresh token
     ALGORITHM: str = "HS256"
 
+    # Отзыв токенов
+    TOKEN_REVOCATION_SYNC_SECONDS: int = 30  # как часто подтягивать отзывы других воркеров
+    CHECK_ACCESS_TOKEN_REVOCATION: bool = True  # проверять семейство и у access-токенов
+
+    # Rate limiting: "N/S" — N запросов за S секунд
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"  # memory | sqlite (общий для воркеров хоста)
+    RATE_LIMIT_SQLITE_PATH: str = "/tmp/metabalance_ratelimit.sqlite3"
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # брать IP из X-Forwarded-For
+    RATE_LIMITS: Dict[str, str] = {
+        "login": "10/60",
+        "register": "5/60",
+        "refresh": "30/60",
+        "create_calculation": "30/60",
+    }
+
+    # Идемпотентность создания расчетов
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_CACHE_SIZE: int = 10_000
+    CALCULATION_DEDUP_SECONDS: int = 0  # 0 — не схлопывать одинаковые input_data
+
+    # Кэш: memory (в процессе) | redis (общий) | tiered (память + redis с pub/sub)
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # объем кэша в памяти процесса
+    CACHE_NEAR_TTL_SECONDS: float = 30.0  # страховка на случай потерянной инвалидации
+    # Кэш пользователя для get_current_user. Смену профиля и удаление
+    # сбрасывает только воркер, выполнивший запись: с memory остальные
+    # видят старые данные до истечения TTL. Поэтому по умолчанию (None) —
+    # 300 с для redis/tiered и 0 (кэш выключен) для memory
+    IDENTITY_CACHE_TTL_SECONDS: Optional[int] = None
+
+    # Кэш ответов stats/latest (инвалидация по версии данных пользователя).
+    # Версия лежит в кэше: с CACHE_BACKEND=memory запись в одном воркере не
+    # видна другим, и они отдают старые ответы до RESPONSE_CACHE_MAX_TTL_SECONDS.
+    # Поэтому по умолчанию (None) кэш включен только с redis/tiered;
+    # True с memory допустимо лишь при одном воркере
+    RESPONSE_CACHE_ENABLED: Optional[bool] = None
+    RESPONSE_CACHE_MAX_TTL_SECONDS: int = 3600
+
+    # История: JSON страницы собирает сам Postgres (json_agg), минуя ORM и
+    # Pydantic. Только для горячих строк и только с Postgres
+    HISTORY_JSON_IN_DB: bool = False
+
+    # Предел тела POST /calculations/ — корректный расчет занимает ~300 байт
+    CALCULATION_MAX_BODY_BYTES: int = 4096
+
+    # Фоновые задачи
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LOCK_KEY: int = 734_100_037  # advisory lock лидера (один на кластер)
+    SCHEDULER_JITTER: float = 0.1  # разброс интервалов, доля
+    TOKEN_PURGE_INTERVAL_SECONDS: int = 3600
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: int = 3600
+
+    # Архив старых расчетов
+    ARCHIVE_ENABLED: bool = True
+    ARCHIVE_AFTER_DAYS: int = 180  # не меньше 31: окна статистики 7/30 дней считаются по горячей таблице
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
+    ARCHIVE_BATCH_SIZE: int = 1000
+
+    # Перцентили по когортам (скетчи KLL)
+    SKETCH_K: int = 200  # точность: ошибка ранга порядка 1/k
+    SKETCH_SYNC_SECONDS: int = 60
+    BENCHMARK_MIN_COHORT_SIZE: int = 30  # меньше — перцентиль не отдается
+
+    # Дельта-синхронизация клиентов
+    SYNC_TOMBSTONE_RETENTION_DAYS: int = 30  # токены старше — 410, нужна полная синхронизация
+    SYNC_OVERLAP_SECONDS: int = 30  # запас на транзакции, закоммиченные позже своего now()
+    TOMBSTONE_PURGE_INTERVAL_SECONDS: int = 3600
+
+    # Поток событий (SSE) об изменениях расчетов
+    SSE_ENABLED: bool = True
+    SSE_HEARTBEAT_SECONDS: int = 15  # комментарий-пинг, чтобы прокси не рвали простаивающие соединения
+    SSE_RETRY_MILLISECONDS: int = 5000  # пауза перед переподключением клиента
+    SSE_MAX_CONNECTIONS: int = 5000  # на воркер
+    SSE_MAX_CONNECTIONS_PER_USER: int = 5
+    SSE_QUEUE_SIZE: int = 100
+
+    # Логи: JSON-строки из фонового потока, см. app.core.log
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: Optional[str] = None  # по умолчанию stderr
+    LOG_QUEUE_SIZE: int = 10_000  # при переполнении записи отбрасываются, а не ждут
+    LOG_ACCESS: bool = True  # строка на каждый HTTP-запрос (логгер app.access)
+    # Доля записей по префиксу логгера; WARNING и выше пишутся всегда
+    LOG_SAMPLING: Dict[str, float] = {"app.access": 0.1}
+
+    # Предохранитель перед БД, см. app.core.circuit_breaker
+    DB_BREAKER_ENABLED: bool = True
+    DB_BREAKER_WINDOW_SECONDS: int = 10
+    DB_BREAKER_MIN_CALLS: int = 20  # меньше вызовов в окне — не размыкать
+    DB_BREAKER_FAILURE_RATE: float = 0.5  # доля отказов БД
+    DB_BREAKER_SLOW_CALL_SECONDS: float = 2.0
+    DB_BREAKER_SLOW_CALL_RATE: float = 0.8  # доля вызовов дольше SLOW_CALL_SECONDS
+    DB_BREAKER_OPEN_SECONDS: float = 10.0  # сколько отказывать сразу
+    DB_BREAKER_HALF_OPEN_CALLS: int = 3  # пробных вызовов перед замыканием
+    # Сколько хранить последние удачные ответы (latest, stats, профиль)
+    # на случай недоступности БД
+    STALE_RESPONSE_TTL_SECONDS: int = 24 * 3600
+    # Как часто воркер переписывает неизменную копию профиля (меньше TTL выше)
+    STALE_IDENTITY_REFRESH_SECONDS: int = 3600
+
+    # Трассировка запросов, см. app.core.tracing
+    TRACE_SAMPLE_RATE: float = 0.0  # доля запросов; 0 — выключено
+    TRACE_FILE: str = "traces.jsonl"  # OTLP/JSON, строка на пачку трейсов
+    TRACE_QUEUE_SIZE: int = 1000  # трейсов в очереди на запись, лишние отбрасываются
+    TRACE_MAX_SPANS: int = 500  # на трейс; корневой спан записывается всегда
+
     # CORS settings
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
 
@@ -36,6 +166,9 @@ class Settings(BaseSettings):
     @computed_field
     @property
     def async_database_url(self) -> str:
+        if self.DB_EMBEDDED:
+            return f"sqlite+aiosqlite:///{self.DB_EMBEDDED_PATH}"
+
         if self.DATABASE_URL:
             return self.DATABASE_URL.replace(
                 "postgresql://",
@@ -49,9 +182,32 @@ class Settings(BaseSettings):
             f"{self.DB_NAME}"
         )
 
+    @computed_field
+    @property
+    def async_direct_database_url(self) -> Optional[str]:
+        if self.DB_EMBEDDED or not self.DATABASE_DIRECT_URL:
+            return None
+        return self.DATABASE_DIRECT_URL.replace(
+            "postgresql://",
+            "postgresql+asyncpg://",
+        )
+
+    @computed_field
+    @property
+    def async_replica_urls(self) -> List[str]:
+        if self.DB_EMBEDDED:
+            return []
+        return [
+            url.replace("postgresql://", "postgresql+asyncpg://")
+            for url in self.DATABASE_REPLICA_URLS
+        ]
+
     @computed_field
     @property
     def sync_database_url(self) -> str:
+        if self.DB_EMBEDDED:
+            return f"sqlite:///{self.DB_EMBEDDED_PATH}"
+
         if self.DATABASE_URL:
             return self.DATABASE_URL.replace(
                 "postgresql://",
@@ -65,6 +221,20 @@ class Settings(BaseSettings):
             f"{self.DB_NAME}"
         )
 
+    @computed_field
+    @property
+    def response_cache_enabled(self) -> bool:
+        if self.RESPONSE_CACHE_ENABLED is not None:
+            return self.RESPONSE_CACHE_ENABLED
+        return self.CACHE_BACKEND in ("redis", "tiered")
+
+    @computed_field
+    @property
+    def identity_cache_ttl_seconds(self) -> int:
+        if self.IDENTITY_CACHE_TTL_SECONDS is not None:
+            return self.IDENTITY_CACHE_TTL_SECONDS
+        return 300 if self.CACHE_BACKEND in ("redis", "tiered") else 0
+
     class Config:
         env_file = ".env"
         extra = "ignore"
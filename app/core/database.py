@@ -1,14 +1,90 @@
+import itertools
+import time
+from typing import List, Optional
+from uuid import uuid4
+
+from fastapi import Depends, Request
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import create_engine, event
 from app.core.config import settings
+from app.core.circuit_breaker import guard_engine
+from app.core.tracing import instrument_engine
+
+def _async_connect_args(through_pgbouncer: bool) -> dict:
+    """Настройки подготовленных операторов asyncpg для соединения."""
+    if settings.DB_EMBEDDED:
+        return {}
+    if not through_pgbouncer:
+        return {"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE}
+
+    # Серверное соединение pgbouncer достается разным клиентам: одинаковые
+    # имена операторов (__asyncpg_stmt_1__) конфликтовали бы между ними
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": (
+            settings.DB_PREPARED_STATEMENT_CACHE_SIZE
+            if settings.PGBOUNCER_PREPARED_STATEMENTS else 0
+        ),
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
 
 # Асинхронный движок
-async_engine = create_async_engine(settings.async_database_url)
+async_engine = create_async_engine(
+    settings.async_database_url,
+    connect_args=_async_connect_args(settings.DB_PGBOUNCER),
+)
+
+# Движки реплик (только чтение)
+replica_engines = [
+    create_async_engine(url, connect_args=_async_connect_args(settings.DB_PGBOUNCER))
+    for url in settings.async_replica_urls
+]
+
+# Сессионные возможности (advisory lock, LISTEN) не работают через pgbouncer
+# в режиме transaction, для них — отдельный небольшой пул мимо него
+direct_engine = (
+    create_async_engine(
+        settings.async_direct_database_url,
+        pool_size=2,
+        max_overflow=2,
+        connect_args=_async_connect_args(False),
+    )
+    if settings.async_direct_database_url else async_engine
+)
+
+# Cookie/заголовок, закрепляющие клиента за primary после записи
+PRIMARY_PIN_COOKIE = "mb_primary_until"
+PRIMARY_PIN_HEADER = "X-Primary-Until"
 
 # Синхронный движок
 sync_engine = create_engine(settings.sync_database_url)
 
+
+def _configure_sqlite(dbapi_connection, connection_record) -> None:
+    # Без PRAGMA SQLite не проверяет внешние ключи и не делает ON DELETE CASCADE;
+    # WAL позволяет читать во время записи
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+if settings.DB_EMBEDDED:
+    for engine in (async_engine.sync_engine, sync_engine):
+        event.listen(engine, "connect", _configure_sqlite)
+
+# Спаны SQL-операторов для трассировки запросов
+for engine in {async_engine, *replica_engines, direct_engine}:
+    instrument_engine(engine.sync_engine)
+
+# Предохранитель — только на движках запросов API (direct_engine держит
+# advisory lock и LISTEN и сам переподключается)
+for engine in {async_engine, *replica_engines}:
+    guard_engine(engine.sync_engine)
+
 # Асинхронная фабрика сессий
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
@@ -33,6 +109,63 @@ async def get_async_db() -> AsyncSession:
         finally:
             await session.close()
 
+class ReplicaRouter:
+    """Выбор реплики: по кругу или с наименьшим числом занятых соединений."""
+
+    def __init__(self, engines: List[AsyncEngine], strategy: str):
+        self._engines = engines
+        self._strategy = strategy
+        self._cycle = itertools.cycle(engines)
+
+    def choose(self) -> AsyncEngine:
+        if self._strategy == "least_connections":
+            return min(self._engines, key=lambda engine: engine.pool.checkedout())
+        return next(self._cycle)
+
+
+replica_router: Optional[ReplicaRouter] = (
+    ReplicaRouter(replica_engines, settings.REPLICA_ROUTING)
+    if replica_engines else None
+)
+
+
+def primary_pin_until() -> int:
+    """Момент, до которого клиент после записи читает с primary."""
+    return int(time.time()) + settings.READ_YOUR_WRITES_SECONDS
+
+
+def is_pinned_to_primary(request: Request) -> bool:
+    value = (
+        request.headers.get(PRIMARY_PIN_HEADER)
+        or request.cookies.get(PRIMARY_PIN_COOKIE)
+    )
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
+
+
+# Зависимость для чтения: GET-запросы уходят на реплику
+async def get_read_db(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+) -> AsyncSession:
+    # Сессия primary берёт соединение только при первом запросе,
+    # поэтому для GET она ничего не стоит, а для записи — переиспользуется
+    if (
+        replica_router is None
+        or request.method not in ("GET", "HEAD")
+        or is_pinned_to_primary(request)
+    ):
+        yield db
+        return
+
+    async with AsyncSessionLocal(bind=replica_router.choose()) as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
 # Синхронная зависимость для синхронных операций
 def get_sync_db() -> Session:
     db = SyncSessionLocal()
@@ -42,4 +175,13 @@ def get_sync_db() -> Session:
         db.close()
 
 # Для совместимости оставим get_db как get_async_db
-get_db = get_async_db
\ No newline at end of file
+get_db = get_async_db
+
+async def dispose_engines() -> None:
+    """
+    Закрыть пулы всех движков при остановке. Во встроенном режиме
+    соединения aiosqlite держат потоки, без этого процесс не завершится.
+    """
+    for engine in {async_engine, *replica_engines, direct_engine}:
+        await engine.dispose()
+    sync_engine.dispose()
@@ -0,0 +1,72 @@
+"""
+Встроенный режим БД: SQLite-файл через aiosqlite вместо сервера Postgres.
+
+    DB_EMBEDDED=true DB_EMBEDDED_PATH=/tmp/metabalance.sqlite3 uvicorn app.main:app
+
+Предназначен для локальных бенчмарков API и тестов, не для продакшена.
+Миграции alembic написаны под Postgres, поэтому при старте схема
+создается из моделей (create_all), справочники заполняются как в
+начальной миграции, а БД помечается head-ревизией. После изменения
+моделей файл БД нужно удалить.
+
+Работает только с Postgres:
+
+- GET /calculations/calendar (generate_series, date_trunc, AT TIME ZONE) —
+  во встроенном режиме отвечает 501;
+- GET /calculations/events и публикация событий (LISTEN/NOTIFY) — поток
+  событий отключен, как при SSE_ENABLED=false;
+- выбор лидера планировщика (advisory lock) — процесс всегда лидер,
+  запускать нужно один воркер;
+- реплики (DATABASE_REPLICA_URLS), pgbouncer и DATABASE_DIRECT_URL —
+  игнорируются;
+- FOR UPDATE SKIP LOCKED при архивации и синхронизации скетчей — SQLite
+  блокирует запись во всю БД, так что результат тот же, но без
+  параллелизма;
+- удаление расчетов с отметками для синхронизации выполняется двумя
+  запросами вместо одного (CTE с DELETE ... RETURNING), регистрация —
+  тоже;
+- точность времени: now() БД в SQLite — до миллисекунды (см.
+  app.models.types), время приложения — до микросекунды.
+
+Цифры бенчмарков во встроенном режиме сравнимы только между собой:
+сетевого обмена с БД и подготовленных операторов asyncpg здесь нет.
+"""
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.health import ALEMBIC_INI
+from app.models import ActivityLevel
+from app.models.base import Base
+
+# Как в начальной миграции
+ACTIVITY_LEVELS = [
+    {"id": 1, "code": "sedentary", "name": "Сидячая", "factor": 1.20},
+    {"id": 2, "code": "light", "name": "Лёгкая", "factor": 1.375},
+    {"id": 3, "code": "moderate", "name": "Умеренная", "factor": 1.55},
+    {"id": 4, "code": "high", "name": "Высокая", "factor": 1.725},
+    {"id": 5, "code": "extreme", "name": "Экстремальная", "factor": 1.90},
+]
+
+
+def _create_schema(connection: Connection) -> None:
+    if inspect(connection).has_table("alembic_version"):
+        return
+    Base.metadata.create_all(connection)
+    connection.execute(
+        insert(ActivityLevel).values(ACTIVITY_LEVELS).on_conflict_do_nothing()
+    )
+    # Схема из моделей соответствует head: readiness и wait_for_db
+    # видят актуальную ревизию
+    script = ScriptDirectory.from_config(Config(str(ALEMBIC_INI)))
+    MigrationContext.configure(connection).stamp(script, "head")
+
+
+async def init_embedded_db(engine: AsyncEngine) -> None:
+    """Создать схему встроенной БД, если ее еще нет."""
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_schema)
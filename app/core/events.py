@@ -0,0 +1,207 @@
+"""
+События об изменении расчетов для открытых SSE-подключений пользователя.
+
+Запись публикует событие через pg_notify внутри своей транзакции: Postgres
+доставит его только после коммита и не доставит после отката. Каждый
+воркер держит одно соединение с LISTEN и раздает события в очереди
+своих подключений, так что событие с любого воркера доходит до всех
+устройств пользователя.
+"""
+import asyncio
+import json
+from typing import Dict, Iterable, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.core.database import direct_engine
+
+CHANNEL = "calculation_events"
+
+# Лимит payload у NOTIFY — 8000 байт, UUID в JSON занимает ~40
+IDS_PER_NOTIFICATION = 100
+
+# Событие «могли что-то пропустить, синхронизируйтесь» (переполнение
+# очереди, переподключение слушателя)
+RESYNC_EVENT = {"event": "resync", "ids": []}
+
+
+class TooManyConnections(Exception):
+    """Превышен лимит подключений к потоку событий."""
+
+
+async def publish_event(db: AsyncSession, user_id: UUID, event: str, ids: Iterable[UUID]) -> None:
+    """Опубликовать событие в транзакции db (уйдет подписчикам после коммита)."""
+    if settings.DB_EMBEDDED:
+        # NOTIFY есть только в Postgres; во встроенном режиме потока событий нет
+        return
+    ids = [str(calculation_id) for calculation_id in ids]
+    for start in range(0, len(ids), IDS_PER_NOTIFICATION):
+        payload = json.dumps({
+            "u": str(user_id),
+            "e": event,
+            "ids": ids[start:start + IDS_PER_NOTIFICATION],
+        }, separators=(",", ":"))
+        await db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": CHANNEL, "payload": payload},
+        )
+
+
+class EventBroker:
+    """LISTEN на одном соединении воркера и раздача событий по очередям подписчиков."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        max_connections: int,
+        max_per_user: int,
+        queue_size: int,
+        health_check_interval: float = 30.0,
+    ):
+        self._engine = engine
+        self._max_connections = max_connections
+        self._max_per_user = max_per_user
+        self._queue_size = queue_size
+        self._health_check_interval = health_check_interval
+        self._subscribers: Dict[UUID, Set[asyncio.Queue]] = {}
+        self._connections = 0
+        self._task: Optional[asyncio.Task] = None
+        self.listening = False
+        self.delivered = 0
+        self.overflows = 0
+        self.reconnects = 0
+
+    # =========================
+    # SUBSCRIBERS
+    # =========================
+
+    def subscribe(self, user_id: UUID) -> asyncio.Queue:
+        if self._connections >= self._max_connections:
+            raise TooManyConnections("Сервер не принимает новые подключения к потоку событий")
+        queues = self._subscribers.setdefault(user_id, set())
+        if len(queues) >= self._max_per_user:
+            raise TooManyConnections("Слишком много открытых подключений к потоку событий")
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue_size)
+        queues.add(queue)
+        self._connections += 1
+        return queue
+
+    def unsubscribe(self, user_id: UUID, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(user_id)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        self._connections -= 1
+        if not queues:
+            del self._subscribers[user_id]
+
+    def _offer(self, queue: asyncio.Queue, event: dict) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Медленный клиент: отдельные события уже не важны, пусть синхронизируется
+            self.overflows += 1
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC_EVENT)
+
+    def _dispatch(self, user_id: UUID, event: dict) -> None:
+        for queue in self._subscribers.get(user_id, ()):
+            self._offer(queue, event)
+            self.delivered += 1
+
+    def _broadcast(self, event: dict) -> None:
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, event)
+
+    def _on_notification(self, connection, pid, channel, payload: str) -> None:
+        try:
+            data = json.loads(payload)
+            user_id = UUID(data["u"])
+            event = {"event": data["e"], "ids": data["ids"]}
+        except (ValueError, KeyError, TypeError):
+            return
+        self._dispatch(user_id, event)
+
+    # =========================
+    # LISTENER
+    # =========================
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        delay = 0.1
+        first = True
+        while True:
+            conn: Optional[AsyncConnection] = None
+            try:
+                conn = await self._engine.connect()
+                raw = (await conn.get_raw_connection()).driver_connection
+                closed = asyncio.Event()
+                raw.add_termination_listener(lambda _: closed.set())
+                await raw.add_listener(CHANNEL, self._on_notification)
+                self.listening = True
+                delay = 0.1
+                if not first:
+                    # Пока слушателя не было, события могли потеряться
+                    self.reconnects += 1
+                    self._broadcast(RESYNC_EVENT)
+                first = False
+
+                while not closed.is_set():
+                    try:
+                        await asyncio.wait_for(closed.wait(), self._health_check_interval)
+                    except asyncio.TimeoutError:
+                        await asyncio.wait_for(raw.execute("SELECT 1"), 5)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            finally:
+                self.listening = False
+                if conn is not None:
+                    # Соединение с LISTEN не возвращаем в пул
+                    try:
+                        await conn.invalidate()
+                    except Exception:
+                        pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+    def stats(self) -> dict:
+        return {
+            "listening": self.listening,
+            "connections": self._connections,
+            "users": len(self._subscribers),
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "reconnects": self.reconnects,
+        }
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps({'ids': event['ids']})}\n\n"
+
+
+event_broker = EventBroker(
+    direct_engine,
+    max_connections=settings.SSE_MAX_CONNECTIONS,
+    max_per_user=settings.SSE_MAX_CONNECTIONS_PER_USER,
+    queue_size=settings.SSE_QUEUE_SIZE,
+)
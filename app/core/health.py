@@ -0,0 +1,57 @@
+import asyncio
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.circuit_breaker import breaker_bypass
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+READINESS_TIMEOUT_SECONDS = 2.0
+
+_VERSION_QUERY = text("SELECT version_num FROM alembic_version")
+
+
+@lru_cache(maxsize=1)
+def get_migration_head() -> Optional[str]:
+    """Head-ревизия из каталога миграций (читается один раз)."""
+    script = ScriptDirectory.from_config(Config(str(ALEMBIC_INI)))
+    return script.get_current_head()
+
+
+def read_schema_version(connection: Connection) -> Optional[str]:
+    """Текущая ревизия схемы; None, если миграции ещё не применялись."""
+    try:
+        return connection.execute(_VERSION_QUERY).scalar_one_or_none()
+    except ProgrammingError:
+        # Таблицы alembic_version ещё нет
+        connection.rollback()
+        return None
+
+
+async def check_readiness(engine: AsyncEngine) -> Tuple[bool, dict]:
+    """Проверка пула и ревизии схемы одним запросом."""
+    head = get_migration_head()
+    try:
+        # Готовность отражает саму БД, а не состояние предохранителя: иначе
+        # при медленной БД из балансировки выпадут все воркеры. Мимо
+        # предохранителя идет и открытие нового соединения пулом
+        with breaker_bypass():
+            async with asyncio.timeout(READINESS_TIMEOUT_SECONDS):
+                async with engine.connect() as conn:
+                    current = await conn.run_sync(read_schema_version)
+    except (DBAPIError, OSError, TimeoutError) as e:
+        return False, {"database": "unavailable", "error": type(e).__name__}
+
+    return current == head, {
+        "database": "ok",
+        "migration": current,
+        "migration_head": head,
+    }
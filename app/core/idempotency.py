@@ -0,0 +1,134 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.idempotency_key import IdempotencyKey
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: dict
+    stored_at: float  # time.time()
+
+
+def request_fingerprint(payload: dict) -> str:
+    """Хэш тела запроса, не зависящий от порядка ключей."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyCache:
+    """LRU-кэш сохранённых ответов перед таблицей idempotency_keys."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[tuple[UUID, str], StoredResponse]" = OrderedDict()
+
+    def get(self, user_id: UUID, key: str) -> Optional[StoredResponse]:
+        entry = self._entries.get((user_id, key))
+        if entry is None:
+            return None
+        if time.time() - entry.stored_at > self._ttl:
+            del self._entries[(user_id, key)]
+            return None
+        self._entries.move_to_end((user_id, key))
+        return entry
+
+    def put(self, user_id: UUID, key: str, entry: StoredResponse) -> None:
+        self._entries[(user_id, key)] = entry
+        self._entries.move_to_end((user_id, key))
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+idempotency_cache = IdempotencyCache(
+    ttl_seconds=settings.IDEMPOTENCY_TTL_HOURS * 3600,
+    max_entries=settings.IDEMPOTENCY_CACHE_SIZE,
+)
+
+
+async def load_response(db: AsyncSession, user_id: UUID, key: str) -> Optional[StoredResponse]:
+    """Ответ для ключа в пределах TTL: сначала из памяти, потом из БД."""
+    entry = idempotency_cache.get(user_id, key)
+    if entry is not None:
+        return entry
+
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+    result = await db.execute(
+        select(
+            IdempotencyKey.request_hash,
+            IdempotencyKey.status_code,
+            IdempotencyKey.response,
+            IdempotencyKey.created_at,
+        ).where(
+            (IdempotencyKey.user_id == user_id) &
+            (IdempotencyKey.key == key) &
+            (IdempotencyKey.created_at >= cutoff)
+        )
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+
+    entry = StoredResponse(
+        request_hash=row.request_hash,
+        status_code=row.status_code,
+        body=row.response,
+        stored_at=row.created_at.timestamp(),
+    )
+    idempotency_cache.put(user_id, key, entry)
+    return entry
+
+
+async def save_response(
+    db: AsyncSession,
+    user_id: UUID,
+    key: str,
+    entry: StoredResponse,
+) -> bool:
+    """
+    Сохранить ответ в той же транзакции, что и сама запись.
+
+    Возвращает False, если параллельный запрос с тем же ключом успел раньше.
+    Просроченная, но еще не удаленная очисткой строка перезаписывается:
+    ключ после TTL снова свободен.
+    Кэш в памяти заполняется только после коммита (см. remember_response).
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+    stmt = insert(IdempotencyKey).values(
+        user_id=user_id,
+        key=key,
+        request_hash=entry.request_hash,
+        status_code=entry.status_code,
+        response=entry.body,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": stmt.excluded.status_code,
+            "response": stmt.excluded.response,
+            "created_at": func.now(),
+        },
+        where=IdempotencyKey.created_at < cutoff,
+    ).returning(IdempotencyKey.key)
+
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none() is not None
+
+
+def remember_response(user_id: UUID, key: str, entry: StoredResponse) -> None:
+    idempotency_cache.put(user_id, key, entry)
@@ -0,0 +1,114 @@
+"""
+Фоновые задачи обслуживания, запускаемые планировщиком.
+
+Задачи, меняющие общие таблицы, выполняются только на лидере;
+задачи, обновляющие состояние в памяти воркера, — на каждом воркере.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+
+from app.core.archive import archive_batch, hot_window_start
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, direct_engine
+from app.core.scheduler import Scheduler
+from app.core.sketches import cohort_sketches
+from app.core.token_revocation import revocation_registry
+from app.models.calculation_tombstone import CalculationTombstone
+from app.models.idempotency_key import IdempotencyKey
+from app.models.revoked_token import RevokedToken, RevokedTokenFamily
+
+scheduler = Scheduler(direct_engine, settings.SCHEDULER_LOCK_KEY)
+
+
+async def purge_expired_tokens() -> None:
+    """Удалить записи об использованных токенах и отозванных семействах после их истечения."""
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        await db.execute(delete(RevokedTokenFamily).where(RevokedTokenFamily.expires_at <= now))
+        await db.commit()
+
+
+async def purge_idempotency_keys() -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff))
+        await db.commit()
+
+
+async def purge_tombstones() -> None:
+    """Отметки об удалении старше срока хранения: такие токены синхронизации получают 410."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(CalculationTombstone).where(CalculationTombstone.deleted_at < cutoff))
+        await db.commit()
+
+
+async def sync_revocations() -> None:
+    """Подтянуть отзывы других воркеров, даже если к этому воркеру не приходят /refresh."""
+    async with AsyncSessionLocal() as db:
+        await revocation_registry.sync(db)
+    revocation_registry.prune_expired()
+
+
+async def archive_calculations() -> None:
+    """Перенести старые расчеты в архив пачками, по транзакции на пачку."""
+    cutoff = hot_window_start()
+    while True:
+        async with AsyncSessionLocal() as db:
+            moved = await archive_batch(db, cutoff, settings.ARCHIVE_BATCH_SIZE)
+            await db.commit()
+        if moved < settings.ARCHIVE_BATCH_SIZE:
+            break
+
+
+async def sync_cohort_sketches() -> None:
+    """Записать накопленные наблюдения воркера и подтянуть чужие."""
+    async with AsyncSessionLocal() as db:
+        await cohort_sketches.sync(db)
+
+
+def register_jobs(scheduler: Scheduler) -> None:
+    jitter = settings.SCHEDULER_JITTER
+    scheduler.add_job(
+        "purge_expired_tokens",
+        purge_expired_tokens,
+        settings.TOKEN_PURGE_INTERVAL_SECONDS,
+        jitter=jitter,
+    )
+    scheduler.add_job(
+        "purge_idempotency_keys",
+        purge_idempotency_keys,
+        settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+        jitter=jitter,
+    )
+    scheduler.add_job(
+        "purge_tombstones",
+        purge_tombstones,
+        settings.TOMBSTONE_PURGE_INTERVAL_SECONDS,
+        jitter=jitter,
+    )
+    scheduler.add_job(
+        "sync_revocations",
+        sync_revocations,
+        settings.TOKEN_REVOCATION_SYNC_SECONDS,
+        initial_delay=0,
+        jitter=jitter,
+        leader_only=False,
+    )
+    scheduler.add_job(
+        "sync_cohort_sketches",
+        sync_cohort_sketches,
+        settings.SKETCH_SYNC_SECONDS,
+        initial_delay=0,
+        jitter=jitter,
+        leader_only=False,
+    )
+    if settings.ARCHIVE_ENABLED:
+        scheduler.add_job(
+            "archive_calculations",
+            archive_calculations,
+            settings.ARCHIVE_INTERVAL_SECONDS,
+            jitter=jitter,
+        )
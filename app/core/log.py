@@ -0,0 +1,248 @@
+"""
+Структурированные логи без блокировки event loop.
+
+Логгеры приложения — дочерние к "app" (logging.getLogger(__name__)).
+Запись в поток/файл делает фоновый поток QueueListener, обработчик
+запроса только кладет запись в ограниченную очередь через put_nowait:
+медленный приемник логов не добавляет задержки запросу. Если очередь
+переполнена, запись отбрасывается и учитывается в метрике dropped.
+
+Каждая запись — одна строка JSON: время, уровень, логгер, сообщение,
+request_id текущего запроса и поля из extra=.
+
+Частые события можно прореживать по логгерам (LOG_SAMPLING, доля
+записей, поиск по самому длинному префиксу имени). WARNING и выше
+не прореживаются никогда.
+
+Логгеры uvicorn и сторонних библиотек не трогаем.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# Чужой request id принимаем, только если он короткий и без мусора
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Атрибуты LogRecord, которые не являются полями extra=
+_RECORD_FIELDS = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", (), None)).keys()
+) | {"message", "asctime", "request_id"}
+
+access_logger = logging.getLogger("app.access")
+
+
+# ===== ФОРМАТ =====
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# ===== ПРОРЕЖИВАНИЕ =====
+
+class SamplingFilter(logging.Filter):
+    """Оставляет долю записей логгера; WARNING и выше проходят всегда."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self._rates = dict(rates)
+        self._resolved: Dict[str, float] = {}
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, value in self._rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = value, len(prefix)
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+# ===== ОЧЕРЕДЬ =====
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Кладет запись в ограниченную очередь, не дожидаясь места.
+    Сообщение и traceback форматируются здесь: объекты кадров
+    не должны уходить в другой поток.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_sampling: Optional[SamplingFilter] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Настроить логгер "app"; повторный вызов ничего не делает."""
+    global _queue_handler, _sampling, _listener
+    if _listener is not None:
+        return
+
+    if settings.LOG_FILE:
+        sink = logging.FileHandler(settings.LOG_FILE, encoding="utf-8")
+    else:
+        sink = logging.StreamHandler(sys.stderr)
+    sink.setFormatter(JsonFormatter())
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    _sampling = SamplingFilter(settings.LOG_SAMPLING)
+    _queue_handler.addFilter(_sampling)
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+    app_logger.addHandler(_queue_handler)
+    app_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, sink)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Дописать очередь и остановить фоновый поток."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    logging.getLogger("app").removeHandler(_queue_handler)
+
+
+def log_stats() -> dict:
+    if _queue_handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "sampled_out": _sampling.sampled_out,
+    }
+
+
+# ===== REQUEST ID И ЖУРНАЛ ЗАПРОСОВ =====
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware: request id для всех записей запроса (из заголовка
+    X-Request-ID или новый), тот же id в ответе и строка журнала
+    запросов в логгер app.access. 5xx пишется как ERROR и не прореживается.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _REQUEST_ID_RE.match(candidate):
+                    request_id = candidate
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (b"x-request-id", request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            if settings.LOG_ACCESS:
+                access_logger.log(
+                    logging.ERROR if status_code >= 500 else logging.INFO,
+                    "%s %s %s", scope["method"], scope["path"], status_code,
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": status_code,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    },
+                )
+            request_id_var.reset(token)
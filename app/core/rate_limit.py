@@ -0,0 +1,186 @@
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.security import verify_access_token
+from app.core.tracing import traced
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """'10/60' -> ёмкость 10 токенов, пополнение 10 токенов за 60 секунд."""
+    capacity, period = rate.split("/", 1)
+    capacity = int(capacity)
+    return capacity, capacity / float(period)
+
+
+class RateLimitBackend(ABC):
+    """Хранилище token-bucket'ов."""
+
+    @abstractmethod
+    async def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        """Списать токен. Возвращает 0, если можно, иначе сколько секунд ждать."""
+
+
+def _take(tokens: float, updated: float, now: float, capacity: int, refill_rate: float):
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / refill_rate
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Бакеты в памяти процесса (один воркер)."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._max_keys = max_keys
+
+    async def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (capacity, now))
+        tokens, retry_after = _take(tokens, updated, now, capacity, refill_rate)
+        self._buckets[key] = (tokens, now)
+
+        # Давно не использованные ключи вытесняются первыми
+        while len(self._buckets) > self._max_keys:
+            self._buckets.popitem(last=False)
+
+        return retry_after
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """
+    Бакеты в локальном файле SQLite, общие для всех воркеров хоста.
+
+    Каждое списание — одна короткая транзакция BEGIN IMMEDIATE, поэтому
+    процессы не перетирают бакеты друг друга.
+
+    Для каждого бакета хранится full_at — когда он снова наполнится.
+    Наполненный бакет ничем не отличается от отсутствующего, поэтому
+    такие строки раз в prune_interval секунд удаляются: иначе таблица
+    росла бы с каждым новым IP.
+    """
+
+    def __init__(self, path: str, prune_interval: float = 60.0):
+        self._conn = sqlite3.connect(
+            path,
+            timeout=5.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, "
+            "full_at REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(buckets)")}
+        if "full_at" not in columns:
+            # Файл от прошлой версии: старые бакеты считаются наполненными
+            self._conn.execute("ALTER TABLE buckets ADD COLUMN full_at REAL NOT NULL DEFAULT 0")
+        self._lock = threading.Lock()
+        self._prune_interval = prune_interval
+        self._pruned_at = time.monotonic()
+
+    def _consume_sync(self, key: str, capacity: int, refill_rate: float) -> float:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens, retry_after = _take(tokens, updated, now, capacity, refill_rate)
+                full_at = now + (capacity - tokens) / refill_rate
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, full_at),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if time.monotonic() - self._pruned_at >= self._prune_interval:
+                self._prune(now)
+        return retry_after
+
+    def _prune(self, now: float) -> None:
+        # Отдельная транзакция: списание не ждет удаления
+        self._pruned_at = time.monotonic()
+        self._conn.execute("DELETE FROM buckets WHERE full_at <= ?", (now,))
+
+    async def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        return await asyncio.to_thread(self._consume_sync, key, capacity, refill_rate)
+
+
+_backend: Optional[RateLimitBackend] = None
+
+
+def get_rate_limit_backend() -> RateLimitBackend:
+    global _backend
+    if _backend is None:
+        if settings.RATE_LIMIT_BACKEND == "sqlite":
+            _backend = SQLiteRateLimitBackend(settings.RATE_LIMIT_SQLITE_PATH)
+        else:
+            _backend = MemoryRateLimitBackend()
+    return _backend
+
+
+def set_rate_limit_backend(backend: RateLimitBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _client_key(request: Request) -> str:
+    """Пользователь из JWT (без запроса к БД), иначе IP клиента."""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            user_id = verify_access_token(token).get("sub")
+        except HTTPException:
+            user_id = None
+        if user_id:
+            return f"user:{user_id}"
+    return f"ip:{client_ip(request)}"
+
+
+def rate_limit(route: str) -> Callable:
+    """Зависимость FastAPI с бюджетом RATE_LIMITS[route]."""
+    rate = settings.RATE_LIMITS.get(route)
+    limit = parse_rate(rate) if rate else None
+
+    @traced(f"dependency rate_limit {route}")
+    async def dependency(request: Request) -> None:
+        if not settings.RATE_LIMIT_ENABLED or limit is None:
+            return
+
+        capacity, refill_rate = limit
+        key = f"{route}:{_client_key(request)}"
+        retry_after = await get_rate_limit_backend().consume(key, capacity, refill_rate)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    return dependency
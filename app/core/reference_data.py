@@ -0,0 +1,76 @@
+import asyncio
+import json
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import cache
+from app.models.activity_level import ActivityLevel
+
+ACTIVITY_LEVELS_KEY = "ref:activity_levels"
+
+
+@dataclass(frozen=True)
+class ActivityLevelInfo:
+    id: int
+    code: str
+    name: str
+    factor: float
+
+
+class ReferenceData:
+    """
+    Справочники, которые меняются только миграциями.
+
+    Загружаются один раз на процесс (из общего кэша, иначе из БД)
+    и дальше читаются из памяти.
+    """
+
+    def __init__(self):
+        self._by_code: Optional[Dict[str, ActivityLevelInfo]] = None
+        self._by_id: Dict[int, ActivityLevelInfo] = {}
+        self._lock = asyncio.Lock()
+
+    async def _load(self, db: AsyncSession) -> None:
+        async with self._lock:
+            if self._by_code is not None:
+                return
+            cached = await cache.get(ACTIVITY_LEVELS_KEY)
+            if cached is not None:
+                levels = [ActivityLevelInfo(**item) for item in json.loads(cached)]
+            else:
+                result = await db.execute(
+                    select(
+                        ActivityLevel.id,
+                        ActivityLevel.code,
+                        ActivityLevel.name,
+                        ActivityLevel.factor,
+                    )
+                )
+                levels = [
+                    ActivityLevelInfo(id=row.id, code=row.code, name=row.name, factor=float(row.factor))
+                    for row in result.all()
+                ]
+                await cache.set(
+                    ACTIVITY_LEVELS_KEY,
+                    json.dumps([asdict(level) for level in levels]).encode("utf-8"),
+                )
+            self._by_id = {level.id: level for level in levels}
+            self._by_code = {level.code: level for level in levels}
+
+    async def activity_level_by_code(self, db: AsyncSession, code: str) -> Optional[ActivityLevelInfo]:
+        if self._by_code is None:
+            await self._load(db)
+        return self._by_code.get(code)
+
+    async def activity_level_by_id(self, db: AsyncSession, level_id: Optional[int]) -> Optional[ActivityLevelInfo]:
+        if level_id is None:
+            return None
+        if self._by_code is None:
+            await self._load(db)
+        return self._by_id.get(level_id)
+
+
+reference_data = ReferenceData()
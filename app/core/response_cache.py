@@ -0,0 +1,139 @@
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from app.core.cache import CacheBackend, cache
+from app.core.config import settings
+
+# Заголовок устаревшего ответа (RFC 7234, 5.5.2)
+STALE_WARNING = '111 - "Revalidation Failed"'
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Кэш готовых JSON-ответов, привязанный к версии данных пользователя.
+
+    Ключ — (user_id, имя ответа, версия). Любая запись пользователя
+    увеличивает версию, поэтому старые ответы просто перестают находиться
+    и вытесняются LRU бэкенда. Для ответов, зависящих от текущего
+    времени, можно задать valid_until. Версии и ответы живут в общем
+    кэше, так что инвалидация видна всем воркерам — если бэкенд общий
+    (redis/tiered); с memory см. RESPONSE_CACHE_ENABLED.
+
+    Отдельно хранится последний удачный ответ без привязки к версии
+    (stale_ttl): его отдают, только когда БД недоступна.
+
+    Если увеличить версию не удалось (общий кэш недоступен), запись в БД
+    уже сделана, поэтому ошибка не пробрасывается: пользователь помечается
+    локально, и этот воркер не читает и не пишет его ответы в кэш до
+    следующей удачной инвалидации или истечения max_ttl.
+    """
+
+    def __init__(self, backend: CacheBackend, max_ttl: float, stale_ttl: float):
+        self._backend = backend
+        self._max_ttl = max_ttl
+        self._stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_served = 0
+        self.bump_failures = 0
+        self._unbumped: Dict[UUID, float] = {}  # user_id -> до какого времени не кэшировать
+
+    @staticmethod
+    def _version_key(user_id: UUID) -> str:
+        return f"ver:{user_id}"
+
+    async def version(self, user_id: UUID) -> int:
+        raw = await self._backend.get(self._version_key(user_id))
+        return int(raw) if raw is not None else 0
+
+    async def bump(self, user_id: UUID) -> None:
+        """Данные пользователя изменились — все его ответы устарели."""
+        try:
+            await self._backend.incr(self._version_key(user_id))
+        except Exception:
+            self.bump_failures += 1
+            self._unbumped[user_id] = time.monotonic() + self._max_ttl
+            logger.warning("Не удалось сбросить кэш ответов", exc_info=True, extra={"user_id": str(user_id)})
+            return
+        self._unbumped.pop(user_id, None)
+        self.invalidations += 1
+
+    def _bypassed(self, user_id: UUID) -> bool:
+        until = self._unbumped.get(user_id)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._unbumped[user_id]
+            return False
+        return True
+
+    async def get(self, user_id: UUID, name: str, version: int) -> Optional[bytes]:
+        if self._bypassed(user_id):
+            self.misses += 1
+            return None
+        body = await self._backend.get(f"resp:{user_id}:{name}:{version}")
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    async def put(
+        self,
+        user_id: UUID,
+        name: str,
+        body: bytes,
+        version: int,
+        valid_until: Optional[float] = None,
+    ) -> None:
+        """
+        Сохранить ответ. version — версия, прочитанная до запроса к БД:
+        если за это время была запись, ответ уже устарел и не сохраняется.
+        """
+        if self._bypassed(user_id) or version != await self.version(user_id):
+            return
+        ttl = self._max_ttl
+        if valid_until is not None:
+            ttl = min(ttl, valid_until - time.time())
+            if ttl <= 0:
+                return
+        await self._backend.set(f"resp:{user_id}:{name}:{version}", body, ttl)
+
+    async def put_stale(self, user_id: UUID, name: str, body: bytes) -> None:
+        """Запомнить последний удачный ответ на случай недоступности БД."""
+        if self._stale_ttl <= 0:
+            return
+        stored_at = f"{time.time():.3f}\n".encode("ascii")
+        await self._backend.set(f"stale:{user_id}:{name}", stored_at + body, self._stale_ttl)
+
+    async def get_stale(self, user_id: UUID, name: str) -> Optional[Tuple[bytes, float]]:
+        """Последний удачный ответ и его возраст в секундах."""
+        raw = await self._backend.get(f"stale:{user_id}:{name}")
+        if raw is None:
+            return None
+        stored_at, body = raw.split(b"\n", 1)
+        self.stale_served += 1
+        return body, max(0.0, time.time() - float(stored_at))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "stale_served": self.stale_served,
+            "bump_failures": self.bump_failures,
+        }
+
+
+response_cache = ResponseCache(
+    cache,
+    settings.RESPONSE_CACHE_MAX_TTL_SECONDS,
+    settings.STALE_RESPONSE_TTL_SECONDS,
+)
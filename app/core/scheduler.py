@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+JobFunc = Callable[[], Awaitable[None]]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobMetrics:
+    runs: int = 0
+    failures: int = 0
+    skipped: int = 0
+    last_started_at: Optional[float] = None
+    last_duration: Optional[float] = None
+    max_duration: float = 0.0
+    total_duration: float = 0.0
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started_at": self.last_started_at,
+            "last_duration": self.last_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else None,
+            "max_duration": self.max_duration,
+            "last_error": self.last_error,
+        }
+
+
+@dataclass
+class Job:
+    name: str
+    func: JobFunc
+    interval: Optional[float]  # None — разовая отложенная задача
+    initial_delay: float = 0.0
+    jitter: float = 0.1  # доля интервала
+    leader_only: bool = True
+    timeout: Optional[float] = None
+    metrics: JobMetrics = field(default_factory=JobMetrics)
+
+
+class Scheduler:
+    """
+    Планировщик фоновых задач на asyncio, живущий вместе с приложением.
+
+    Задачи с leader_only выполняются только в одном воркере на весь кластер:
+    лидер держит сессионный advisory lock Postgres на отдельном соединении.
+    Если соединение рвется, лидерство теряется и его забирает другой воркер.
+    Без Postgres (встроенная SQLite) блокировок нет: процесс единственный
+    и всегда лидер.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        lock_key: int,
+        leader_check_interval: float = 15.0,
+    ):
+        self._engine = engine
+        self._lock_key = lock_key
+        self._leader_check_interval = leader_check_interval
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._leader_conn: Optional[AsyncConnection] = None
+        self._standalone = engine.dialect.name != "postgresql"
+        self._running = False
+
+    @property
+    def is_leader(self) -> bool:
+        return self._standalone or self._leader_conn is not None
+
+    def add_job(
+        self,
+        name: str,
+        func: JobFunc,
+        interval: float,
+        *,
+        initial_delay: Optional[float] = None,
+        jitter: float = 0.1,
+        leader_only: bool = True,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Периодическая задача. Первый запуск — через initial_delay (по умолчанию случайный в пределах интервала)."""
+        if initial_delay is None:
+            initial_delay = random.uniform(0, interval)
+        job = Job(
+            name=name,
+            func=func,
+            interval=interval,
+            initial_delay=initial_delay,
+            jitter=jitter,
+            leader_only=leader_only,
+            timeout=timeout,
+        )
+        self._jobs[name] = job
+        if self._running:
+            self._spawn(self._run_periodic(job))
+
+    def defer(
+        self,
+        name: str,
+        func: JobFunc,
+        delay: float = 0.0,
+        *,
+        leader_only: bool = False,
+        timeout: Optional[float] = None,
+    ) -> None:
+        """Разовая задача через delay секунд (например, из обработчика запроса)."""
+        job = self._jobs.get(name)
+        if job is None:
+            job = Job(name=name, func=func, interval=None, leader_only=leader_only, timeout=timeout)
+            self._jobs[name] = job
+        self._spawn(self._run_deferred(job, func, delay))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        if not self._standalone:
+            self._spawn(self._elect_leader())
+        for job in self._jobs.values():
+            if job.interval is not None:
+                self._spawn(self._run_periodic(job))
+
+    async def stop(self) -> None:
+        self._running = False
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self._release_leadership()
+
+    # =========================
+    # LEADER ELECTION
+    # =========================
+
+    async def _elect_leader(self) -> None:
+        while self._running:
+            try:
+                if self._leader_conn is None:
+                    conn = await self._engine.connect()
+                    acquired = await conn.scalar(
+                        text("SELECT pg_try_advisory_lock(:key)"), {"key": self._lock_key}
+                    )
+                    # Соединение не должно висеть в транзакции
+                    await conn.commit()
+                    if acquired:
+                        self._leader_conn = conn
+                    else:
+                        await conn.close()
+                else:
+                    await self._leader_conn.scalar(text("SELECT 1"))
+                    await self._leader_conn.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await self._release_leadership()
+            await asyncio.sleep(self._leader_check_interval)
+
+    async def _release_leadership(self) -> None:
+        conn, self._leader_conn = self._leader_conn, None
+        if conn is None:
+            return
+        try:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self._lock_key})
+            await conn.commit()
+        except Exception:
+            pass
+        try:
+            await conn.close()
+        except Exception:
+            pass
+
+    # =========================
+    # RUNNING JOBS
+    # =========================
+
+    async def _run_periodic(self, job: Job) -> None:
+        await asyncio.sleep(job.initial_delay)
+        while self._running:
+            await self._run_once(job, job.func)
+            spread = job.interval * job.jitter
+            await asyncio.sleep(max(0.0, job.interval + random.uniform(-spread, spread)))
+
+    async def _run_deferred(self, job: Job, func: JobFunc, delay: float) -> None:
+        await asyncio.sleep(delay)
+        await self._run_once(job, func)
+
+    async def _run_once(self, job: Job, func: JobFunc) -> None:
+        metrics = job.metrics
+        if job.leader_only and not self.is_leader:
+            metrics.skipped += 1
+            return
+
+        metrics.last_started_at = time.time()
+        started = time.perf_counter()
+        try:
+            if job.timeout is not None:
+                await asyncio.wait_for(func(), job.timeout)
+            else:
+                await func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.failures += 1
+            metrics.last_error = f"{type(e).__name__}: {e}"
+            logger.warning("Фоновая задача завершилась ошибкой", exc_info=True, extra={"job": job.name})
+        finally:
+            duration = time.perf_counter() - started
+            metrics.runs += 1
+            metrics.last_duration = duration
+            metrics.total_duration += duration
+            metrics.max_duration = max(metrics.max_duration, duration)
+
+    def metrics(self) -> dict:
+        return {
+            "leader": self.is_leader,
+            "jobs": {name: job.metrics.as_dict() for name, job in self._jobs.items()},
+        }
@@ -1,3 +1,4 @@
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -36,6 +37,11 @@ def get_password_hash(password: str) -> str:
 # JWT HELPERS
 # =========================
 
+def new_token_id() -> str:
+    """Идентификатор для jti и семейства токенов."""
+    return uuid.uuid4().hex
+
+
 def _create_token(
     *,
     data: dict,
@@ -49,6 +55,7 @@ def _create_token(
         {
             "exp": int(expire.timestamp()),
             "type": token_type,
+            "jti": new_token_id(),
         }
     )
 
@@ -0,0 +1,280 @@
+"""
+Квантильные скетчи KLL по когортам (пол × возрастная группа) для TDEE и BMR.
+
+Каждый воркер держит в памяти полный скетч когорты (для ответов) и дельту —
+наблюдения, еще не записанные в БД. Периодическая синхронизация сливает
+дельты в таблицу cohort_sketches под блокировкой строки и перечитывает
+итог, так что в памяти оказываются наблюдения всех воркеров.
+"""
+import math
+import random
+from bisect import bisect_right
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.cohort_sketch import CohortSketch
+
+METRICS = ("tdee", "bmr")
+
+# (верхняя граница возраста, не включительно; название группы)
+AGE_BANDS = (
+    (18, "<18"),
+    (25, "18-24"),
+    (35, "25-34"),
+    (45, "35-44"),
+    (55, "45-54"),
+    (65, "55-64"),
+)
+OLDEST_AGE_BAND = "65+"
+
+GENDERS = ("male", "female")
+
+CohortKey = Tuple[str, str, str]  # (metric, gender, age_band)
+
+
+class KLLSketch:
+    """
+    Скетч KLL (Karnin, Lang, Liberty): поток чисел в O(k) памяти,
+    ранг любого значения с ошибкой порядка 1/k, скетчи сливаются.
+
+    Уровень h хранит элементы с весом 2**h. Переполненный уровень
+    сортируется, и каждый второй элемент (со случайным сдвигом)
+    поднимается на уровень выше.
+    """
+
+    C = 2 / 3
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+        self._size = 0
+        self._max_size = 0
+        self._cdf: Optional[Tuple[List[float], List[float]]] = None
+        self._update_max_size()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.C ** depth)) + 1
+
+    def _update_max_size(self) -> None:
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def update(self, value: float) -> None:
+        self.compactors[0].append(float(value))
+        self.n += 1
+        self._size += 1
+        self._cdf = None
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._size = sum(len(c) for c in self.compactors)
+        self._cdf = None
+        self._update_max_size()
+        while self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self) -> None:
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) < self._capacity(level):
+                continue
+            if level + 1 >= len(self.compactors):
+                self.compactors.append([])
+                self._update_max_size()
+
+            items = sorted(self.compactors[level])
+            leftover = [items.pop()] if len(items) % 2 else []
+            self.compactors[level + 1].extend(items[random.getrandbits(1)::2])
+            self.compactors[level] = leftover
+
+            self._size = sum(len(c) for c in self.compactors)
+            if self._size < self._max_size:
+                break
+
+    def _cumulative(self) -> Tuple[List[float], List[float]]:
+        """Отсортированные значения и накопленный вес (строится лениво)."""
+        if self._cdf is None:
+            weighted = sorted(
+                (value, 1 << level)
+                for level, items in enumerate(self.compactors)
+                for value in items
+            )
+            values, cumulative, total = [], [], 0
+            for value, weight in weighted:
+                total += weight
+                values.append(value)
+                cumulative.append(total)
+            self._cdf = (values, cumulative)
+        return self._cdf
+
+    def rank(self, value: float) -> float:
+        """Доля наблюдений, не превышающих value (0..1)."""
+        values, cumulative = self._cumulative()
+        if not values:
+            return 0.0
+        position = bisect_right(values, value)
+        return cumulative[position - 1] / cumulative[-1] if position else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        values, cumulative = self._cumulative()
+        if not values:
+            return None
+        target = q * cumulative[-1]
+        position = min(bisect_right(cumulative, target), len(values) - 1)
+        return values[position]
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "n": self.n, "compactors": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(data["k"])
+        sketch.n = data["n"]
+        sketch.compactors = [list(items) for items in data["compactors"]] or [[]]
+        sketch._size = sum(len(c) for c in sketch.compactors)
+        sketch._update_max_size()
+        return sketch
+
+
+def age_band(age: int) -> str:
+    for upper, name in AGE_BANDS:
+        if age < upper:
+            return name
+    return OLDEST_AGE_BAND
+
+
+class CohortSketches:
+    """Скетчи всех когорт воркера: ответы из памяти, синхронизация с БД."""
+
+    def __init__(self, k: int):
+        self._k = k
+        self._sketches: Dict[CohortKey, KLLSketch] = {}
+        self._deltas: Dict[CohortKey, KLLSketch] = {}
+        self.synced_at: Optional[datetime] = None
+
+    def _delta(self, key: CohortKey) -> KLLSketch:
+        sketch = self._deltas.get(key)
+        if sketch is None:
+            sketch = self._deltas[key] = KLLSketch(self._k)
+        return sketch
+
+    def _sketch(self, key: CohortKey) -> KLLSketch:
+        sketch = self._sketches.get(key)
+        if sketch is None:
+            sketch = self._sketches[key] = KLLSketch(self._k)
+        return sketch
+
+    def observe(self, input_data: dict, results: dict) -> None:
+        """Учесть новый расчет. Неполные данные пропускаются молча."""
+        try:
+            gender = str(input_data["gender"])
+            band = age_band(int(input_data["age"]))
+        except (KeyError, TypeError, ValueError):
+            return
+        if gender not in GENDERS:
+            return
+
+        for metric in METRICS:
+            try:
+                value = float(results[metric])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not math.isfinite(value):
+                continue
+            key = (metric, gender, band)
+            self._sketch(key).update(value)
+            self._delta(key).update(value)
+
+    def get(self, metric: str, gender: str, band: str) -> Optional[KLLSketch]:
+        return self._sketches.get((metric, gender, band))
+
+    def cohorts(self) -> Dict[CohortKey, KLLSketch]:
+        return dict(self._sketches)
+
+    async def sync(self, db: AsyncSession) -> None:
+        """
+        Слить накопленные дельты в cohort_sketches и перечитать все когорты.
+
+        Строки блокируются в порядке ключа, чтобы параллельные воркеры
+        не ждали друг друга по кругу.
+        """
+        pending, self._deltas = self._deltas, {}
+        try:
+            if pending:
+                keys = sorted(pending)
+                await db.execute(
+                    insert(CohortSketch).values([
+                        {
+                            "metric": metric,
+                            "gender": gender,
+                            "age_band": band,
+                            "n": 0,
+                            "sketch": KLLSketch(self._k).to_dict(),
+                        }
+                        for metric, gender, band in keys
+                    ]).on_conflict_do_nothing()
+                )
+                rows = await db.execute(
+                    select(CohortSketch)
+                    .where(tuple_(
+                        CohortSketch.metric, CohortSketch.gender, CohortSketch.age_band
+                    ).in_(keys))
+                    .order_by(CohortSketch.metric, CohortSketch.gender, CohortSketch.age_band)
+                    .with_for_update()
+                )
+                now = datetime.now(timezone.utc)
+                for row in rows.scalars().all():
+                    delta = pending.get((row.metric, row.gender, row.age_band))
+                    if delta is None:
+                        continue
+                    merged = KLLSketch.from_dict(row.sketch)
+                    merged.merge(delta)
+                    await db.execute(
+                        update(CohortSketch)
+                        .where(
+                            (CohortSketch.metric == row.metric) &
+                            (CohortSketch.gender == row.gender) &
+                            (CohortSketch.age_band == row.age_band)
+                        )
+                        .values(sketch=merged.to_dict(), n=merged.n, updated_at=now),
+                        execution_options={"synchronize_session": False}
+                    )
+                await db.commit()
+        except BaseException:
+            # Дельты не потеряны: вернем их к следующей попытке
+            for key, delta in pending.items():
+                self._delta(key).merge(delta)
+            raise
+
+        result = await db.execute(
+            select(CohortSketch.metric, CohortSketch.gender, CohortSketch.age_band, CohortSketch.sketch)
+        )
+        sketches = {}
+        for metric, gender, band, data in result.all():
+            sketches[(metric, gender, band)] = KLLSketch.from_dict(data)
+        # Наблюдения, пришедшие во время синхронизации, еще только в дельтах
+        for key, delta in self._deltas.items():
+            sketches.setdefault(key, KLLSketch(self._k)).merge(delta)
+        self._sketches = sketches
+        self.synced_at = datetime.now(timezone.utc)
+
+    def stats(self) -> dict:
+        return {
+            "cohorts": len(self._sketches),
+            "pending": sum(d.n for d in self._deltas.values()),
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+        }
+
+
+cohort_sketches = CohortSketches(settings.SKETCH_K)
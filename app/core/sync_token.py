@@ -0,0 +1,69 @@
+"""
+Токен дельта-синхронизации расчетов.
+
+Для клиента токен непрозрачен; внутри — base64url от JSON:
+
+- w — водяной знак: изменения до него (минус SYNC_OVERLAP_SECONDS) клиент
+  уже получил. Отсутствует при первой, полной синхронизации;
+- s — начало текущего прохода (now() БД), станет следующим водяным знаком;
+- c — курсор (updated_at, id) последней отданной строки при постраничной выдаче.
+
+Подделка токена ничего не дает: выборка всегда ограничена текущим пользователем.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+TOKEN_VERSION = 1
+
+
+@dataclass(frozen=True)
+class SyncToken:
+    watermark: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    cursor: Optional[Tuple[datetime, UUID]] = None
+
+
+def encode_sync_token(token: SyncToken) -> str:
+    data = {"v": TOKEN_VERSION}
+    if token.watermark is not None:
+        data["w"] = token.watermark.isoformat()
+    if token.started_at is not None:
+        data["s"] = token.started_at.isoformat()
+    if token.cursor is not None:
+        data["c"] = [token.cursor[0].isoformat(), str(token.cursor[1])]
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _parse_time(value: str) -> datetime:
+    # Токены выдаются только с часовым поясом; наивное время нельзя
+    # сравнить с timestamptz
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        raise ValueError("Время в токене без часового пояса")
+    return parsed
+
+
+def decode_sync_token(value: str) -> SyncToken:
+    """Разобрать токен; ValueError, если он поврежден или устарел по формату."""
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        data = json.loads(raw)
+        if data.get("v") != TOKEN_VERSION:
+            raise ValueError("Неподдерживаемая версия токена")
+        cursor = None
+        if "c" in data:
+            cursor = (_parse_time(data["c"][0]), UUID(data["c"][1]))
+        return SyncToken(
+            watermark=_parse_time(data["w"]) if "w" in data else None,
+            started_at=_parse_time(data["s"]) if "s" in data else None,
+            cursor=cursor,
+        )
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, AttributeError,
+            KeyError, IndexError, TypeError) as e:
+        raise ValueError("Некорректный токен синхронизации") from e
@@ -0,0 +1,169 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import event, select, exists, literal, String
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.revoked_token import RevokedToken, RevokedTokenFamily
+from app.models.types import GUID, UTCDateTime
+
+# Запас при инкрементальной синхронизации: строки, закоммиченные позже
+# чем записан их revoked_at, всё равно попадут в выборку
+SYNC_OVERLAP = timedelta(seconds=60)
+
+# Ключ session.info: семейства, отозванные в текущей транзакции
+_PENDING_FAMILIES = "revoked_families"
+
+
+class RevocationRegistry:
+    """
+    Зеркало таблицы revoked_token_families в памяти воркера.
+
+    Проверка отзыва — это поиск в set, без обращения к БД. Отзывы,
+    сделанные другими воркерами, подтягиваются инкрементально не чаще
+    одного раза в TOKEN_REVOCATION_SYNC_SECONDS.
+    """
+
+    def __init__(self, sync_interval: int):
+        self._sync_interval = sync_interval
+        self._families: Dict[str, datetime] = {}  # family_id -> expires_at
+        self._watermark: Optional[datetime] = None
+        self._synced_at: float = 0.0
+        self._lock = asyncio.Lock()
+
+    def is_family_revoked(self, family_id: Optional[str]) -> bool:
+        return family_id is not None and family_id in self._families
+
+    def add_family(self, family_id: str, expires_at: datetime) -> None:
+        self._families[family_id] = expires_at
+
+    def needs_sync(self) -> bool:
+        return time.monotonic() - self._synced_at >= self._sync_interval
+
+    async def sync(self, db: AsyncSession, force: bool = False) -> None:
+        """Подтянуть новые отзывы из БД (первый вызов загружает всё)."""
+        if not force and not self.needs_sync():
+            return
+
+        async with self._lock:
+            if not force and not self.needs_sync():
+                return
+
+            now = datetime.now(timezone.utc)
+            query = select(
+                RevokedTokenFamily.family_id,
+                RevokedTokenFamily.revoked_at,
+                RevokedTokenFamily.expires_at,
+            ).where(RevokedTokenFamily.expires_at > now)
+            if self._watermark is not None:
+                query = query.where(
+                    RevokedTokenFamily.revoked_at > self._watermark - SYNC_OVERLAP
+                )
+
+            result = await db.execute(query)
+            for family_id, revoked_at, expires_at in result.all():
+                self._families[family_id] = expires_at
+                if self._watermark is None or revoked_at > self._watermark:
+                    self._watermark = revoked_at
+
+            if self._watermark is None:
+                self._watermark = now
+            self._synced_at = time.monotonic()
+
+    def prune_expired(self) -> int:
+        """Убрать из памяти семейства, все токены которых уже истекли."""
+        now = datetime.now(timezone.utc)
+        expired = [family_id for family_id, expires_at in self._families.items() if expires_at <= now]
+        for family_id in expired:
+            del self._families[family_id]
+        return len(expired)
+
+
+revocation_registry = RevocationRegistry(settings.TOKEN_REVOCATION_SYNC_SECONDS)
+
+
+# Семейство попадает в реестр только после коммита: если транзакция
+# откатится, воркер не должен отклонять токены, которые в БД не отозваны
+def _register_committed_families(session: Session) -> None:
+    for family_id, expires_at in session.info.pop(_PENDING_FAMILIES, ()):
+        revocation_registry.add_family(family_id, expires_at)
+
+
+def _drop_pending_families(session: Session) -> None:
+    session.info.pop(_PENDING_FAMILIES, None)
+
+
+event.listen(Session, "after_commit", _register_committed_families)
+event.listen(Session, "after_rollback", _drop_pending_families)
+
+
+async def revoke_family(
+    db: AsyncSession,
+    *,
+    family_id: str,
+    user_id: UUID,
+    reason: str,
+) -> None:
+    """
+    Отозвать всё семейство refresh-токенов (коммит делает вызывающий;
+    в реестр воркера семейство попадет после коммита).
+    """
+    # Запись нужна, пока жив самый свежий токен семейства
+    expires_at = datetime.now(timezone.utc) + timedelta(
+        days=settings.REFRESH_TOKEN_EXPIRE_DAYS
+    )
+    stmt = insert(RevokedTokenFamily).values(
+        family_id=family_id,
+        user_id=user_id,
+        reason=reason,
+        expires_at=expires_at,
+    ).on_conflict_do_nothing(index_elements=[RevokedTokenFamily.family_id])
+
+    await db.execute(stmt)
+    db.info.setdefault(_PENDING_FAMILIES, []).append((family_id, expires_at))
+
+
+async def consume_refresh_token(db: AsyncSession, payload: dict) -> bool:
+    """
+    Пометить refresh-токен использованным (ротация).
+
+    Одна вставка с ON CONFLICT DO NOTHING атомарно проверяет, что токен
+    ещё не предъявлялся и что его семейство не отозвано. Возвращает False,
+    если токен уже использован или семейство отозвано: в этом случае
+    семейство отзывается целиком (reuse detection).
+    """
+    jti = payload["jti"]
+    family_id = payload["fam"]
+    user_id = UUID(payload["sub"])
+    expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+
+    family_revoked = exists().where(RevokedTokenFamily.family_id == family_id)
+    stmt = insert(RevokedToken).from_select(
+        ["jti", "family_id", "user_id", "expires_at"],
+        select(
+            literal(jti, String),
+            literal(family_id, String),
+            literal(user_id, GUID()),
+            literal(expires_at, UTCDateTime()),
+        ).where(~family_revoked),
+    ).on_conflict_do_nothing(
+        index_elements=[RevokedToken.jti]
+    ).returning(RevokedToken.jti)
+
+    result = await db.execute(stmt)
+    if result.scalar_one_or_none() is not None:
+        return True
+
+    await revoke_family(
+        db,
+        family_id=family_id,
+        user_id=user_id,
+        reason="reuse",
+    )
+    return False
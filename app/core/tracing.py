@@ -0,0 +1,431 @@
+"""
+Легкая трассировка запросов: из чего складывается время ответа.
+
+    TRACE_SAMPLE_RATE=0.05 TRACE_FILE=/tmp/traces.jsonl uvicorn app.main:app
+    python -m app.scripts.trace_report /tmp/traces.jsonl
+
+Спаны одного запроса:
+
+- корневой — TracingMiddleware, "GET /api/v1/calculations/latest";
+- зависимости, отмеченные @traced (get_current_user, rate_limit, ...),
+  и их внутренние шаги: jwt.decode, identity.cache, identity.load;
+- endpoint — тело обработчика;
+- каждый SQL-оператор (события cursor_execute движков SQLAlchemy);
+- response.encode — от возврата из обработчика до готового Response:
+  проверка response_model и сериализация JSON.
+
+Решение о записи принимается один раз на запрос (TRACE_SAMPLE_RATE);
+у невыбранных запросов спаны не создаются вовсе. Завершенный трейс
+кладется в ограниченную очередь без ожидания (как логи в app.core.log),
+фоновый поток дописывает в TRACE_FILE строки OTLP/JSON
+({"resourceSpans": [...]}) — тот же формат, что у file-экспортера
+OpenTelemetry Collector, внешние сервисы не нужны.
+"""
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.log import request_id_var
+
+# Виды спанов OTLP
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+STATUS_ERROR = 2
+
+MAX_STATEMENT_LENGTH = 2000
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "dropped")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List["Span"] = []
+        self.dropped = 0
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent: Optional["Span"], kind: int, start_ns: Optional[int] = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.kind = kind
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def end(self, end_ns: Optional[int] = None) -> None:
+        self.end_ns = end_ns if end_ns is not None else time.time_ns()
+        # Корневой спан завершается последним, место под него зарезервировано:
+        # иначе при переполнении записанные спаны остались бы без родителя
+        if self.parent_id is None or len(self.trace.spans) < settings.TRACE_MAX_SPANS - 1:
+            self.trace.spans.append(self)
+        else:
+            self.trace.dropped += 1
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+# ===== СПАНЫ =====
+
+class _SpanScope:
+    """Спан как контекстный менеджер: дочерние спаны внутри ссылаются на него."""
+
+    __slots__ = ("span", "token")
+
+    def __init__(self, span: Span):
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self.token)
+        self.span.end()
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NOOP = _NoopScope()
+
+
+def span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    """
+    with span("jwt.decode"): ...
+
+    Вне выбранного запроса — общий пустой менеджер, без аллокаций спанов.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    child = Span(parent.trace, name, parent, kind)
+    if attributes:
+        child.attributes.update(attributes)
+    return _SpanScope(child)
+
+
+def traced(name: str) -> Callable:
+    """
+    Спан на каждый вызов корутины. Сигнатура сохраняется (functools.wraps),
+    поэтому декоратор можно вешать на зависимости FastAPI.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ===== HTTP =====
+
+class TracingMiddleware:
+    """ASGI middleware: корневой спан запроса для выбранной доли запросов."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or settings.TRACE_SAMPLE_RATE <= 0
+            or random.random() >= settings.TRACE_SAMPLE_RATE
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        root = Span(Trace(), f"{scope['method']} {scope['path']}", None, KIND_SERVER)
+        root.attributes.update({
+            "http.request.method": scope["method"],
+            "url.path": scope["path"],
+        })
+        request_id = request_id_var.get()
+        if request_id:
+            root.attributes["request_id"] = request_id
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                root.attributes["http.response.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    root.error = f"HTTP {message['status']}"
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            if root.trace.dropped:
+                root.attributes["trace.dropped_spans"] = root.trace.dropped
+            root.end()
+            span_exporter.export(root.trace)
+
+
+class _EndpointTiming:
+    __slots__ = ("returned_ns",)
+
+    def __init__(self):
+        self.returned_ns: Optional[int] = None
+
+
+_endpoint_timing: ContextVar[Optional[_EndpointTiming]] = ContextVar("endpoint_timing", default=None)
+
+
+def _traced_endpoint(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        with span("endpoint"):
+            result = await endpoint(*args, **kwargs)
+        timing = _endpoint_timing.get()
+        if timing is not None:
+            timing.returned_ns = time.time_ns()
+        return result
+    wrapper.__traced_endpoint__ = True
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """
+    Маршрут с разметкой трейса: шаблон пути в корневом спане, спан
+    endpoint и response.encode. Подключается через
+    APIRouter(route_class=TracedRoute). Синхронные обработчики FastAPI
+    выполняет в пуле потоков — у них только корневой спан.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        # include_router пересоздает маршруты с уже обернутым endpoint
+        if inspect.iscoroutinefunction(endpoint) and not getattr(endpoint, "__traced_endpoint__", False):
+            endpoint = _traced_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route_path = self.path_format
+
+        async def traced_handler(request):
+            root = _current_span.get()
+            if root is None:
+                return await handler(request)
+
+            root.name = f"{request.method} {route_path}"
+            root.attributes["http.route"] = route_path
+            timing = _EndpointTiming()
+            token = _endpoint_timing.set(timing)
+            try:
+                response = await handler(request)
+            finally:
+                _endpoint_timing.reset(token)
+            if timing.returned_ns is not None:
+                Span(root.trace, "response.encode", root, KIND_INTERNAL, timing.returned_ns).end()
+            return response
+
+        return traced_handler
+
+
+# ===== SQL =====
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    sql_span = Span(parent.trace, "db.query", parent, KIND_CLIENT)
+    sql_span.attributes.update({
+        "db.system": conn.dialect.name,
+        "db.statement": statement[:MAX_STATEMENT_LENGTH],
+    })
+    if executemany:
+        sql_span.attributes["db.executemany"] = True
+    context._trace_span = sql_span
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    sql_span = getattr(context, "_trace_span", None)
+    if sql_span is not None:
+        context._trace_span = None
+        if cursor is not None and cursor.rowcount is not None and cursor.rowcount >= 0:
+            sql_span.attributes["db.rows"] = cursor.rowcount
+        sql_span.end()
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    sql_span = getattr(context, "_trace_span", None) if context is not None else None
+    if sql_span is not None:
+        context._trace_span = None
+        error = exception_context.original_exception
+        sql_span.error = f"{type(error).__name__}: {error}"
+        sql_span.end()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Спан на каждый SQL-оператор движка (для async — engine.sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+# ===== ЭКСПОРТ =====
+
+def _attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _encode_span(span_: Span) -> dict:
+    encoded = {
+        "traceId": span_.trace.trace_id,
+        "spanId": span_.span_id,
+        "name": span_.name,
+        "kind": span_.kind,
+        "startTimeUnixNano": str(span_.start_ns),
+        "endTimeUnixNano": str(span_.end_ns),
+        "attributes": [_attribute(key, value) for key, value in span_.attributes.items()],
+        "status": {},
+    }
+    if span_.parent_id is not None:
+        encoded["parentSpanId"] = span_.parent_id
+    if span_.error is not None:
+        encoded["status"] = {"code": STATUS_ERROR, "message": span_.error}
+    return encoded
+
+
+def encode_otlp(traces: List[Trace]) -> dict:
+    """Пачка трейсов в виде ExportTraceServiceRequest (OTLP/JSON)."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _attribute("service.name", settings.PROJECT_NAME),
+                _attribute("service.version", settings.VERSION),
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_encode_span(s) for trace in traces for s in trace.spans],
+            }],
+        }]
+    }
+
+
+class SpanExporter:
+    """
+    Очередь завершенных трейсов и поток, пишущий их в файл пачками.
+    export() не ждет: при переполнении трейс отбрасывается.
+    """
+
+    BATCH_SIZE = 256
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self):
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._queue = queue.Queue(maxsize=settings.TRACE_QUEUE_SIZE)
+            self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def export(self, trace: Trace) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch: List[Trace] = []
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Trace]) -> None:
+        line = json.dumps(encode_otlp(batch), ensure_ascii=False, separators=(",", ":"))
+        try:
+            with open(settings.TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.exported += len(batch)
+        except OSError:
+            self.dropped += len(batch)
+
+    def shutdown(self) -> None:
+        """Дописать очередь и остановить поток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": settings.TRACE_SAMPLE_RATE,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "exported": self.exported,
+            "dropped": self.dropped,
+        }
+
+
+span_exporter = SpanExporter()
@@ -1,12 +1,64 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.core.config import settings
+from app.core.cache import cache
+from app.core.circuit_breaker import db_breaker
+from app.core.embedded import init_embedded_db
+from app.core.events import event_broker
+from app.core.health import check_readiness
+from app.core.log import RequestContextMiddleware, log_stats, setup_logging, shutdown_logging
+from app.core.tracing import TracingMiddleware, span_exporter
+from app.core.jobs import scheduler, register_jobs, sync_cohort_sketches
+from app.core.sketches import cohort_sketches
+from app.core.response_cache import response_cache
+from app.core.database import (
+    async_engine,
+    dispose_engines,
+    replica_router,
+    primary_pin_until,
+    PRIMARY_PIN_COOKIE,
+    PRIMARY_PIN_HEADER,
+)
 from app.api.v1 import api_router
 
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    if settings.DB_EMBEDDED:
+        await init_embedded_db(async_engine)
+    # Подписка на инвалидацию общего кэша
+    await cache.start()
+    if settings.SSE_ENABLED and not settings.DB_EMBEDDED:
+        await event_broker.start()
+    if settings.SCHEDULER_ENABLED:
+        register_jobs(scheduler)
+        await scheduler.start()
+    yield
+    await event_broker.stop()
+    await scheduler.stop()
+    if settings.SCHEDULER_ENABLED:
+        # Не терять наблюдения, накопленные с последней синхронизации
+        try:
+            await sync_cohort_sketches()
+        except Exception:
+            pass
+    await cache.close()
+    await dispose_engines()
+    span_exporter.shutdown()
+    shutdown_logging()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Настройка CORS
@@ -19,6 +71,29 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Трассировка внутри RequestContextMiddleware: корневой спан видит request id
+app.add_middleware(TracingMiddleware)
+
+# Request id в логах и ответах; добавлен после CORS, поэтому внешний
+app.add_middleware(RequestContextMiddleware)
+
+# Read-your-writes: после успешной записи клиент какое-то время читает с primary
+if replica_router is not None:
+    @app.middleware("http")
+    async def pin_to_primary_after_write(request: Request, call_next):
+        response = await call_next(request)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            until = primary_pin_until()
+            response.headers[PRIMARY_PIN_HEADER] = str(until)
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                str(until),
+                max_age=settings.READ_YOUR_WRITES_SECONDS,
+                httponly=True,
+                samesite="lax",
+            )
+        return response
+
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/")
@@ -27,4 +102,27 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Готовность к трафику: БД доступна и схема на head-ревизии."""
+    ready, details = await check_readiness(async_engine)
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "ready" if ready else "not_ready", **details},
+    )
+
+@app.get("/metrics")
+def metrics():
+    """Внутренние метрики процесса (кэши и т.п.)."""
+    return {
+        "response_cache": response_cache.stats(),
+        "cache": cache.stats(),
+        "scheduler": scheduler.metrics(),
+        "cohort_sketches": cohort_sketches.stats(),
+        "events": event_broker.stats(),
+        "logging": log_stats(),
+        "tracing": span_exporter.stats(),
+        "db_breaker": db_breaker.stats(),
+    }
@@ -1,11 +1,22 @@
 from app.models.user import User
 from app.models.user_profile import UserProfile
 from app.models.calculation import Calculation
+from app.models.calculation_archive import CalculationArchive
+from app.models.calculation_tombstone import CalculationTombstone
 from app.models.activity_level import ActivityLevel
+from app.models.revoked_token import RevokedToken, RevokedTokenFamily
+from app.models.idempotency_key import IdempotencyKey
+from app.models.cohort_sketch import CohortSketch
 
 __all__ = (
     "User",
     "UserProfile",
     "Calculation",
+    "CalculationArchive",
+    "CalculationTombstone",
     "ActivityLevel",
+    "RevokedToken",
+    "RevokedTokenFamily",
+    "IdempotencyKey",
+    "CohortSketch",
 )
\ No newline at end of file
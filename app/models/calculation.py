@@ -1,30 +1,42 @@
 import uuid
 from sqlalchemy import (
-    SmallInteger, ForeignKey,
+    SmallInteger, ForeignKey, Index,
 )
-from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.sql import func
+from uuid import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 
 from app.models.base import Base
+from app.models.types import GUID, JSONDocument, UTCDateTime
 
 class Calculation(Base):
     __tablename__ = "calculations"
+    __table_args__ = (
+        Index("ix_calculations_user_id_created_at", "user_id", "created_at"),
+        Index("ix_calculations_user_id_updated_at", "user_id", "updated_at"),
+    )
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
+        GUID(),
         primary_key=True,
         default=uuid.uuid4  # Добавляем генератор по умолчанию
     )
     user_id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
+        GUID(),
         ForeignKey("users.id", ondelete="CASCADE"),
     )
     goal_id: Mapped[int] = mapped_column(SmallInteger)
     # formula_used: Mapped[str]
-    input_data: Mapped[dict] = mapped_column(JSONB)
-    results: Mapped[dict] = mapped_column(JSONB)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.utcnow)
+    input_data: Mapped[dict] = mapped_column(JSONDocument)
+    results: Mapped[dict] = mapped_column(JSONDocument)
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime(), default=datetime.utcnow)
+    # Часы БД, а не приложения: по этой колонке считается токен синхронизации
+    updated_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now(),
+        onupdate=func.now()
+    )
     
     # Добавляем обратную связь
     user: Mapped["User"] = relationship("User", back_populates="calculations")
\ No newline at end of file
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import SmallInteger, Float, LargeBinary, ForeignKey, Index
+from uuid import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.models.base import Base
+from app.models.types import GUID, UTCDateTime
+
+
+class CalculationArchive(Base):
+    """
+    Архивный расчет (старше ARCHIVE_AFTER_DAYS).
+
+    Поля, по которым фильтруют и агрегируют, лежат в типизированных
+    колонках, а input_data/results — сжатым блобом (см. app.core.archive).
+    """
+    __tablename__ = "calculations_archive"
+    __table_args__ = (
+        Index("ix_calculations_archive_user_id_created_at", "user_id", "created_at"),
+    )
+
+    id: Mapped[UUID] = mapped_column(GUID(), primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+    )
+    goal_id: Mapped[int] = mapped_column(SmallInteger)
+    calorie_target: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    payload: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime] = mapped_column(UTCDateTime())
+    archived_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now()
+    )
+
+    def __repr__(self):
+        return f"<CalculationArchive(id={self.id}, user_id={self.user_id})>"
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import ForeignKey, Index
+from uuid import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.models.base import Base
+from app.models.types import GUID, UTCDateTime
+
+
+class CalculationTombstone(Base):
+    """Отметка об удалении расчета для дельта-синхронизации клиентов."""
+    __tablename__ = "calculation_tombstones"
+    __table_args__ = (
+        Index("ix_calculation_tombstones_user_id_deleted_at", "user_id", "deleted_at"),
+    )
+
+    id: Mapped[UUID] = mapped_column(GUID(), primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+    )
+    deleted_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now()
+    )
+
+    def __repr__(self):
+        return f"<CalculationTombstone(id={self.id}, user_id={self.user_id})>"
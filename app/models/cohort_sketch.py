@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import String, BigInteger
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.models.base import Base
+from app.models.types import JSONDocument, UTCDateTime
+
+
+class CohortSketch(Base):
+    """Квантильный скетч метрики (tdee, bmr) для когорты пол × возрастная группа."""
+    __tablename__ = "cohort_sketches"
+
+    metric: Mapped[str] = mapped_column(String(16), primary_key=True)
+    gender: Mapped[str] = mapped_column(String(16), primary_key=True)
+    age_band: Mapped[str] = mapped_column(String(16), primary_key=True)
+    n: Mapped[int] = mapped_column(BigInteger, default=0)
+    sketch: Mapped[dict] = mapped_column(JSONDocument)
+    updated_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now()
+    )
+
+    def __repr__(self):
+        return f"<CohortSketch(metric='{self.metric}', gender='{self.gender}', age_band='{self.age_band}', n={self.n})>"
@@ -0,0 +1,48 @@
+from datetime import datetime
+from sqlalchemy import String, ForeignKey
+from uuid import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from app.models.base import Base
+from app.models.types import GUID, UTCDateTime
+
+
+class RevokedToken(Base):
+    """Использованный (ротированный) refresh-токен."""
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True)
+    family_id: Mapped[str] = mapped_column(String(32), index=True)
+    user_id: Mapped[UUID] = mapped_column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+    )
+    expires_at: Mapped[datetime] = mapped_column(UTCDateTime(), index=True)
+    revoked_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now()
+    )
+
+    def __repr__(self):
+        return f"<RevokedToken(jti='{self.jti}', family_id='{self.family_id}')>"
+
+
+class RevokedTokenFamily(Base):
+    """Отозванное семейство refresh-токенов (logout или повторное использование)."""
+    __tablename__ = "revoked_token_families"
+
+    family_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    user_id: Mapped[UUID] = mapped_column(
+        GUID(),
+        ForeignKey("users.id", ondelete="CASCADE"),
+    )
+    reason: Mapped[str] = mapped_column(String(16))
+    expires_at: Mapped[datetime] = mapped_column(UTCDateTime(), index=True)
+    revoked_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        server_default=func.now(),
+        index=True
+    )
+
+    def __repr__(self):
+        return f"<RevokedTokenFamily(family_id='{self.family_id}', reason='{self.reason}')>"
@@ -0,0 +1,75 @@
+"""
+Типы колонок, одинаково работающие в Postgres и во встроенной SQLite.
+
+В Postgres они разворачиваются в те же типы, что и в миграциях
+(UUID, JSONB, timestamptz), поэтому схема и запросы там не меняются.
+"""
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import CHAR, JSON, DateTime
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import now
+from sqlalchemy.types import TypeDecorator
+
+
+class GUID(TypeDecorator):
+    """UUID: нативный тип в Postgres, 32 hex-символа в остальных БД."""
+
+    impl = CHAR(32)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(PG_UUID(as_uuid=True))
+        return dialect.type_descriptor(CHAR(32))
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value.hex
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(value)
+
+
+class UTCDateTime(TypeDecorator):
+    """
+    Время с зоной: timestamptz в Postgres. SQLite зону не хранит —
+    пишем UTC и возвращаем aware-значения, как asyncpg.
+    """
+
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        if isinstance(value, str):
+            # Результат func.now() и server_default в SQLite
+            value = datetime.fromisoformat(value)
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+# JSONB в Postgres, JSON в остальных БД
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+@compiles(now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    # CURRENT_TIMESTAMP в SQLite — строка с точностью до секунды, а DateTime
+    # пишет микросекунды. Время хранится строкой, и значения одной секунды
+    # в разных форматах сравнивались бы неверно (курсор /sync терял строки)
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
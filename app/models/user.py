@@ -1,22 +1,23 @@
 import uuid
 from sqlalchemy import String, DateTime
-from sqlalchemy.dialects.postgresql import UUID
+from uuid import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 from app.models.base import Base
+from app.models.types import GUID, UTCDateTime
 
 class User(Base):
     __tablename__ = "users"
 
     id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
+        GUID(),
         primary_key=True,
         default=uuid.uuid4
     )
     email: Mapped[str] = mapped_column(String, unique=True, nullable=False, index=True)
     password_hash: Mapped[str] = mapped_column(String, nullable=False)
     created_at: Mapped[DateTime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(),
         server_default=func.now()
     )
     
@@ -1,15 +1,16 @@
 from sqlalchemy import Date, ForeignKey, SmallInteger
 from datetime import date
-from sqlalchemy.dialects.postgresql import UUID
+from uuid import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import Optional
 from app.models.base import Base
+from app.models.types import GUID
 
 class UserProfile(Base):
     __tablename__ = "user_profiles"
 
     user_id: Mapped[UUID] = mapped_column(
-        UUID(as_uuid=True),
+        GUID(),
         ForeignKey("users.id", ondelete="CASCADE"),
         primary_key=True
     )
@@ -2,7 +2,7 @@
 from app.schemas.user import (
     UserBase, UserRegister, UserLogin, 
     UserResponse, UserProfileBase, 
-    UserProfileCreate, UserProfileResponse,
+    UserProfileCreate, UserProfileUpdate, UserProfileResponse,
     UserWithProfileResponse
 )
 from app.schemas.token import Token, TokenData
@@ -12,13 +12,17 @@ from app.schemas.activity_level import (
 )
 from app.schemas.calculation import (
     CalculationBase, CalculationCreate, 
-    CalculationResponse, CalculationHistoryResponse, CalculationStatsResponse
+    CalculationResponse, CalculationHistoryResponse, CalculationStatsResponse,
+    CalculationBulkDelete, CalculationBulkDeleteResponse,
+    CalendarBucketEnum, CalendarBucket, CalculationCalendarResponse,
+    CohortBenchmark, CohortBenchmarkResponse,
+    CalculationSyncResponse
 )
 __all__ = [
     # User schemas
     "UserBase", "UserRegister", "UserLogin", 
     "UserResponse", "UserProfileBase", 
-    "UserProfileCreate", "UserProfileResponse",
+    "UserProfileCreate", "UserProfileUpdate", "UserProfileResponse",
     "UserWithProfileResponse",
     
     # Token schemas
@@ -31,5 +35,9 @@ __all__ = [
     # Calculation schemas
     "CalculationBase", "CalculationCreate", 
     "CalculationResponse", "CalculationHistoryResponse", 
-    "CalculationStatsResponse"
+    "CalculationStatsResponse",
+    "CalculationBulkDelete", "CalculationBulkDeleteResponse",
+    "CalendarBucketEnum", "CalendarBucket", "CalculationCalendarResponse",
+    "CohortBenchmark", "CohortBenchmarkResponse",
+    "CalculationSyncResponse"
 ]
\ No newline at end of file
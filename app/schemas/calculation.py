@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional, Dict, Any, List
 from uuid import UUID
-from pydantic import BaseModel, Field, validator, model_validator
+from pydantic import BaseModel, ConfigDict, Field, validator, model_validator
 from enum import Enum
 
 
@@ -27,24 +27,41 @@ class ActivityLevelEnum(str, Enum):
     EXTREME = "extreme"
 
 
+class CalendarBucketEnum(str, Enum):
+    """Enum для размера интервала календаря"""
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+# Строгие схемы тела запроса: без приведения типов ("30" не станет 30)
+# и без лишних ключей — в JSONB попадает только то, что описано здесь.
+# Перечисления приходят строками/числами, поэтому для них strict=False.
+STRICT_PAYLOAD = ConfigDict(extra="forbid", strict=True)
+
+
 class CalculationInputData(BaseModel):
     """Схема для входных данных расчета"""
+    model_config = STRICT_PAYLOAD
+
     weight: float = Field(..., gt=0, le=500, description="Вес в кг")
     height: float = Field(..., gt=0, le=300, description="Рост в см")
     age: int = Field(..., gt=0, le=120, description="Возраст")
-    gender: GenderEnum = Field(..., description="Пол")
-    activity_level: ActivityLevelEnum = Field(..., description="Уровень активности")
+    gender: GenderEnum = Field(..., strict=False, description="Пол")
+    activity_level: ActivityLevelEnum = Field(..., strict=False, description="Уровень активности")
     activity_level_id: int = Field(..., ge=1, le=5, description="ID уровня активности")
-    goal: str = Field(..., description="Цель (loss/maintain/gain)")
+    goal: str = Field(..., max_length=16, description="Цель (loss/maintain/gain)")
 
 
 class CalculationResults(BaseModel):
     """Схема для результатов расчета"""
-    bmr: int = Field(..., ge=0, description="Основной обмен веществ (ккал)")
-    tdee: int = Field(..., ge=0, description="Суточный расход энергии (ккал)")
-    calorie_target: int = Field(..., ge=0, description="Целевые калории")
+    model_config = STRICT_PAYLOAD
+
+    bmr: int = Field(..., ge=0, le=20000, description="Основной обмен веществ (ккал)")
+    tdee: int = Field(..., ge=0, le=20000, description="Суточный расход энергии (ккал)")
+    calorie_target: int = Field(..., ge=0, le=20000, description="Целевые калории")
     coefficient: float = Field(..., ge=1.0, le=2.0, description="Коэффициент активности")
-    formula_used: str = Field(default="mifflin_st_jeor", description="Используемая формула")
+    formula_used: str = Field(default="mifflin_st_jeor", max_length=32, description="Используемая формула")
 
 
 class CalculationBase(BaseModel):
@@ -62,8 +79,18 @@ class CalculationBase(BaseModel):
 
 
 class CalculationCreate(CalculationBase):
-    """Схема для создания нового вычисления"""
-    pass
+    """
+    Схема для создания нового вычисления
+
+    Тело проверяется целиком за один проход pydantic-core: обязательные
+    поля, типы, диапазоны и goal_id. Ответы по-прежнему отдают словари —
+    в старых расчетах могут быть ключи, которых уже нет в схемах.
+    """
+    model_config = STRICT_PAYLOAD
+
+    goal_id: GoalEnum = Field(..., strict=False, description="ID цели расчета (1-3)")
+    input_data: CalculationInputData = Field(..., description="Входные данные для расчета")
+    results: CalculationResults = Field(..., description="Результаты расчета")
 
 
 class CalculationResponse(CalculationBase):
@@ -95,4 +122,68 @@ class CalculationStats(BaseModel):
 class CalculationStatsResponse(BaseModel):
     """Схема для ответа со статистикой"""
     stats: CalculationStats
-    last_calculation: Optional[CalculationResponse] = Field(None, description="Последний расчет")
\ No newline at end of file
+    last_calculation: Optional[CalculationResponse] = Field(None, description="Последний расчет")
+
+class CalculationBulkDelete(BaseModel):
+    """Схема для массового удаления: список ID и/или диапазон дат"""
+    ids: Optional[List[UUID]] = Field(None, max_length=1000, description="ID расчетов")
+    created_from: Optional[datetime] = Field(None, description="Начало диапазона (включительно)")
+    created_to: Optional[datetime] = Field(None, description="Конец диапазона (не включительно)")
+
+    @model_validator(mode='after')
+    def validate_filter(self):
+        """Без фильтра удалить всё нельзя"""
+        if not self.ids and self.created_from is None and self.created_to is None:
+            raise ValueError("Нужно указать ids или диапазон created_from/created_to")
+        if (
+            self.created_from is not None and self.created_to is not None
+            and self.created_from >= self.created_to
+        ):
+            raise ValueError("created_from должен быть раньше created_to")
+        return self
+
+
+class CalculationBulkDeleteResponse(BaseModel):
+    """Схема для ответа на массовое удаление"""
+    deleted: int = Field(..., description="Количество удаленных расчетов")
+    ids: List[UUID] = Field(default_factory=list, description="ID удаленных расчетов")
+
+
+class CalendarBucket(BaseModel):
+    """Один интервал календаря"""
+    start: date = Field(..., description="Начало интервала (локальная дата)")
+    count: int = Field(0, description="Количество расчетов")
+    avg_calorie_target: Optional[float] = Field(None, description="Средние целевые калории")
+
+
+class CalculationCalendarResponse(BaseModel):
+    """Схема для ответа с календарем расчетов"""
+    bucket: CalendarBucketEnum
+    tz: str
+    buckets: List[CalendarBucket]
+
+
+class CohortBenchmark(BaseModel):
+    """Положение значения метрики внутри когорты"""
+    metric: str = Field(..., description="Метрика: tdee или bmr")
+    value: float = Field(..., description="Значение пользователя")
+    percentile: Optional[float] = Field(None, description="Доля когорты с таким же или меньшим значением, %")
+    cohort_size: int = Field(0, description="Размер когорты")
+    p25: Optional[float] = None
+    median: Optional[float] = None
+    p75: Optional[float] = None
+
+
+class CohortBenchmarkResponse(BaseModel):
+    """Схема для ответа с перцентилями по когорте"""
+    gender: GenderEnum
+    age_band: str
+    benchmarks: List[CohortBenchmark]
+
+
+class CalculationSyncResponse(BaseModel):
+    """Схема для ответа дельта-синхронизации"""
+    changes: List[CalculationResponse] = Field(default_factory=list, description="Новые и измененные расчеты")
+    deleted: List[UUID] = Field(default_factory=list, description="ID удаленных расчетов")
+    next_token: str = Field(..., description="Токен для следующего запроса (since)")
+    has_more: bool = Field(False, description="Есть еще страницы — запросить сразу с next_token")
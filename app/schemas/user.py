@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator
 from uuid import UUID
 from datetime import datetime, date
 from typing import Optional
@@ -7,6 +7,20 @@ import datetime as dt
 class UserBase(BaseModel):
     email: EmailStr
 
+def _check_gender(v):
+    if v not in ['male', 'female']:
+        raise ValueError('Gender must be either "male" or "female"')
+    return v
+
+
+def _check_birth_date(v):
+    if v > dt.date.today():
+        raise ValueError('Birth date cannot be in the future')
+    if v < dt.date(1900, 1, 1):
+        raise ValueError('Birth date cannot be before 1900')
+    return v
+
+
 class UserRegister(UserBase):
     password: str
     name: str
@@ -15,17 +29,11 @@ class UserRegister(UserBase):
 
     @field_validator('gender')
     def validate_gender(cls, v):
-        if v not in ['male', 'female']:
-            raise ValueError('Gender must be either "male" or "female"')
-        return v
+        return _check_gender(v)
 
     @field_validator('birth_date')
     def validate_birth_date(cls, v):
-        if v > dt.date.today():
-            raise ValueError('Birth date cannot be in the future')
-        if v < dt.date(1900, 1, 1):
-            raise ValueError('Birth date cannot be before 1900')
-        return v
+        return _check_birth_date(v)
 
 
 class UserLogin(BaseModel):
@@ -51,6 +59,33 @@ class UserProfileBase(BaseModel):
 class UserProfileCreate(UserProfileBase):
     pass
 
+class UserProfileUpdate(BaseModel):
+    """Частичное обновление профиля: меняются только переданные поля."""
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    gender: Optional[str] = None
+    birth_date: Optional[date] = None
+    height_cm: Optional[int] = Field(None, gt=0, le=300)
+    weight_kg: Optional[int] = Field(None, gt=0, le=500)
+    activity_level_code: Optional[str] = None
+
+    model_config = ConfigDict(extra='forbid')
+
+    @field_validator('gender')
+    def validate_gender(cls, v):
+        return _check_gender(v) if v is not None else v
+
+    @field_validator('birth_date')
+    def validate_birth_date(cls, v):
+        return _check_birth_date(v) if v is not None else v
+
+    @model_validator(mode='after')
+    def validate_required_not_null(self):
+        # Эти колонки нельзя очистить, только заменить
+        for field in ('name', 'gender', 'birth_date'):
+            if field in self.model_fields_set and getattr(self, field) is None:
+                raise ValueError(f'{field} cannot be null')
+        return self
+
 class UserProfileResponse(UserProfileBase):
     user_id: UUID
     
@@ -0,0 +1,119 @@
+"""
+Пропускная способность проверки тела POST /calculations/.
+
+    python -m app.scripts.bench_calculation_validation [--iterations N]
+
+Сравнивает «как было» — CalculationCreate со словарями input_data/results
+и ручной проверкой ключей и goal_id в обработчике (json.loads, как
+делает FastAPI) — со строгой схемой. Эндпоинт теперь разбирает и
+проверяет тело за один проход pydantic-core (model_validate_json);
+json.loads + model_validate строгой схемы приведен для сравнения.
+
+Дополнительно печатается, какие «плохие» тела отклоняет каждая схема.
+"""
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict
+
+from pydantic import BaseModel, ValidationError
+
+from app.schemas.calculation import CalculationCreate, GoalEnum
+
+BODY = {
+    "goal_id": 1,
+    "input_data": {
+        "weight": 70.5,
+        "height": 175.0,
+        "age": 30,
+        "gender": "male",
+        "activity_level": "moderate",
+        "activity_level_id": 3,
+        "goal": "loss",
+    },
+    "results": {
+        "bmr": 1665,
+        "tdee": 2581,
+        "calorie_target": 2065,
+        "coefficient": 1.55,
+        "formula_used": "mifflin_st_jeor",
+    },
+}
+
+# Тела, которые должны отклоняться
+BAD_BODIES = {
+    "лишнее поле": {**BODY, "input_data": {**BODY["input_data"], "notes": "x" * 10_000}},
+    "строка вместо числа": {**BODY, "input_data": {**BODY["input_data"], "age": "30"}},
+    "нет поля": {**BODY, "results": {k: v for k, v in BODY["results"].items() if k != "bmr"}},
+    "goal_id": {**BODY, "goal_id": 7},
+}
+
+
+# ===== КАК БЫЛО =====
+
+class LegacyCalculationCreate(BaseModel):
+    goal_id: GoalEnum
+    input_data: Dict[str, Any]
+    results: Dict[str, Any]
+
+
+def _legacy_validate(payload: Dict[str, Any]) -> LegacyCalculationCreate:
+    calculation_in = LegacyCalculationCreate.model_validate(payload)
+    for field in ['weight', 'height', 'age', 'gender', 'activity_level']:
+        if field not in calculation_in.input_data:
+            raise ValueError(field)
+    for field in ['bmr', 'tdee', 'calorie_target']:
+        if field not in calculation_in.results:
+            raise ValueError(field)
+    if calculation_in.goal_id not in [1, 2, 3]:
+        raise ValueError("goal_id")
+    return calculation_in
+
+
+def _per_second(func: Callable[[], None], iterations: int) -> float:
+    func()  # прогрев
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return iterations / (time.perf_counter() - started)
+
+
+def _rejects(validate: Callable[[Dict[str, Any]], Any], payload: Dict[str, Any]) -> bool:
+    try:
+        validate(payload)
+    except (ValidationError, ValueError):
+        return True
+    return False
+
+
+def bench_calculation_validation(iterations: int) -> None:
+    raw = json.dumps(BODY).encode()
+    cases = {
+        "словари + ручные проверки": lambda: _legacy_validate(json.loads(raw)),
+        "строгая схема, json.loads": lambda: CalculationCreate.model_validate(json.loads(raw)),
+        "строгая схема, один проход": lambda: CalculationCreate.model_validate_json(raw),
+    }
+
+    print(f"Проверка тела ({len(raw)} байт), {iterations} итераций:")
+    for label, func in cases.items():
+        rate = _per_second(func, iterations)
+        print(f"  {label:<28} {rate:10.0f} тел/с   {1e6 / rate:6.1f} мкс")
+
+    print("Отклоняет:")
+    for label, payload in BAD_BODIES.items():
+        legacy = "да" if _rejects(_legacy_validate, payload) else "нет"
+        strict = "да" if _rejects(
+            lambda body: CalculationCreate.model_validate_json(json.dumps(body)), payload
+        ) else "нет"
+        print(f"  {label:<22} было {legacy:<4} стало {strict}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50_000)
+    args = parser.parse_args()
+    bench_calculation_validation(args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Бенчмарк страницы истории: ORM + Pydantic против JSON, собранного в Postgres.
+
+    python -m app.scripts.bench_history_json [--rows 1000] [--repeat 20]
+
+Создает временного пользователя с --rows расчетами, запрашивает
+GET /calculations/?limit=rows в обоих режимах (HISTORY_JSON_IN_DB
+выключен/включен) и печатает на одну страницу:
+
+- CPU процесса (time.process_time, без tracemalloc);
+- время ответа;
+- пик памяти Python во время запроса (tracemalloc, отдельный проход);
+- размер тела ответа.
+
+Нужен Postgres (DATABASE_URL); пользователь удаляется в конце.
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, insert
+
+from app.core.config import settings
+from app.core.security import create_access_token, new_token_id
+from app.main import app
+from app.models.calculation import Calculation
+from app.models.user import User
+
+INPUT_DATA = {
+    "weight": 70.5,
+    "height": 175.0,
+    "age": 30,
+    "gender": "male",
+    "activity_level": "moderate",
+    "activity_level_id": 3,
+    "goal": "loss",
+}
+RESULTS = {
+    "bmr": 1665,
+    "tdee": 2581,
+    "calorie_target": 2065,
+    "coefficient": 1.55,
+    "formula_used": "mifflin_st_jeor",
+}
+
+
+def _seed(engine, rows: int) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(
+            id=user_id,
+            email=f"bench-{user_id.hex[:12]}@example.com",
+            password_hash="-",
+        ))
+        conn.execute(insert(Calculation), [
+            {
+                "id": uuid.uuid4(),
+                "user_id": user_id,
+                "goal_id": 1,
+                "input_data": INPUT_DATA,
+                "results": RESULTS,
+                "created_at": now - timedelta(minutes=i),
+            }
+            for i in range(rows)
+        ])
+    return user_id
+
+
+def _measure(client: TestClient, url: str, headers: dict, repeat: int) -> Dict[str, float]:
+    client.get(url, headers=headers)  # прогрев: кэш компиляции, identity
+
+    cpu_started, started = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers)
+        response.raise_for_status()
+    cpu = (time.process_time() - cpu_started) / repeat
+    wall = (time.perf_counter() - started) / repeat
+
+    tracemalloc.start()
+    peaks = []
+    for _ in range(max(1, repeat // 4)):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        client.get(url, headers=headers)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return {
+        "cpu_ms": cpu * 1000,
+        "wall_ms": wall * 1000,
+        "peak_kb": max(peaks) / 1024,
+        "body_kb": len(response.content) / 1024,
+    }
+
+
+def bench_history_json(rows: int, repeat: int) -> None:
+    engine = create_engine(settings.sync_database_url)
+    user_id = _seed(engine, rows)
+    token = create_access_token(
+        {"sub": str(user_id), "email": None, "fam": new_token_id()},
+        timedelta(minutes=30),
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    url = f"/api/v1/calculations/?limit={rows}"
+    original = settings.HISTORY_JSON_IN_DB
+
+    try:
+        with TestClient(app) as client:
+            results = {}
+            for label, enabled in (("ORM + Pydantic", False), ("json_agg в Postgres", True)):
+                settings.HISTORY_JSON_IN_DB = enabled
+                results[label] = _measure(client, url, headers, repeat)
+    finally:
+        settings.HISTORY_JSON_IN_DB = original
+        with engine.begin() as conn:
+            conn.execute(delete(User).where(User.id == user_id))
+        engine.dispose()
+
+    print(f"Страница из {rows} расчетов, среднее по {repeat} запросам:")
+    for label, m in results.items():
+        print(
+            f"  {label:<20} CPU {m['cpu_ms']:7.1f} мс   ответ {m['wall_ms']:7.1f} мс   "
+            f"пик памяти {m['peak_kb']:8.0f} КБ   тело {m['body_kb']:6.0f} КБ"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    bench_history_json(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Микробенчмарк накладных расходов Python на горячие запросы.
+
+    python -m app.scripts.bench_query_overhead [--iterations N] [--db]
+
+Для каждого запроса сравнивается «как было» — сборка select() на каждый
+вызов и вычисление ключа кэша компиляции — с готовой конструкцией
+уровня модуля, у которой ключ уже запомнен. Полная компиляция в SQL
+приводится для сравнения: столько стоил бы вызов без кэша компиляции.
+
+С --db дополнительно замеряется полный вызов через AsyncSession к
+DATABASE_URL (случайный user_id, пустой результат) — сюда входят
+подготовленные операторы asyncpg и сетевой обмен.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import select, func, desc, true
+from sqlalchemy.dialects import postgresql
+
+from app.api.deps import _IDENTITY_QUERY
+from app.api.v1.calculations import (
+    _CALCULATION_BY_ID,
+    _LATEST_HOT,
+    _STATS_QUERY,
+    _history_statements,
+)
+from app.models.activity_level import ActivityLevel
+from app.models.calculation import Calculation
+from app.models.calculation_archive import CalculationArchive
+from app.models.user import User
+from app.models.user_profile import UserProfile
+
+DIALECT = postgresql.asyncpg.dialect()
+
+
+# ===== ЗАПРОСЫ «КАК БЫЛО» =====
+
+def _inline_identity(user_id):
+    return (
+        select(
+            User.id,
+            User.email,
+            User.created_at,
+            UserProfile.user_id.label("profile_user_id"),
+            UserProfile.name,
+            UserProfile.gender,
+            UserProfile.birth_date,
+            UserProfile.height_cm,
+            UserProfile.weight_kg,
+            UserProfile.activity_level_id,
+            ActivityLevel.code.label("activity_level_code"),
+        )
+        .select_from(User)
+        .outerjoin(UserProfile, UserProfile.user_id == User.id)
+        .outerjoin(ActivityLevel, ActivityLevel.id == UserProfile.activity_level_id)
+        .where(User.id == user_id)
+    )
+
+
+def _inline_latest(user_id):
+    return select(Calculation).where(
+        Calculation.user_id == user_id
+    ).order_by(desc(Calculation.created_at)).limit(1)
+
+
+def _inline_by_id(user_id):
+    return select(Calculation).where(
+        (Calculation.id == user_id) &
+        (Calculation.user_id == user_id)
+    )
+
+
+def _inline_history(user_id):
+    query = select(Calculation).where(Calculation.user_id == user_id)
+    query = query.where(Calculation.created_at >= datetime.utcnow() - timedelta(days=30))
+    count_query = select(func.count()).select_from(
+        query.with_only_columns(Calculation.id).subquery()
+    )
+    page = query.order_by(desc(Calculation.created_at)).offset(0).limit(100)
+    return count_query, page
+
+
+def _inline_stats(user_id):
+    now = datetime.utcnow()
+    in_week = Calculation.created_at >= now - timedelta(days=7)
+    in_month = Calculation.created_at >= now - timedelta(days=30)
+    calorie_target = Calculation.results['calorie_target'].as_float()
+    hot = select(
+        func.count().label("total"),
+        func.count().filter(in_week).label("last_7_days"),
+        func.count().filter(in_month).label("last_30_days"),
+        func.sum(calorie_target).label("calories_sum"),
+        func.count(calorie_target).label("calories_count"),
+        func.min(Calculation.created_at).filter(in_week).label("oldest_in_week"),
+        func.min(Calculation.created_at).filter(in_month).label("oldest_in_month"),
+    ).where(Calculation.user_id == user_id).subquery()
+    archive = select(
+        func.count().label("total"),
+        func.sum(CalculationArchive.calorie_target).label("calories_sum"),
+        func.count(CalculationArchive.calorie_target).label("calories_count"),
+    ).where(CalculationArchive.user_id == user_id).subquery()
+    # Оба агрегата дают ровно одну строку: явный JOIN ON true вместо
+    # перечисления через запятую (иначе SAWarning о декартовом произведении)
+    return select(hot, archive).select_from(hot.join(archive, true()))
+
+
+def _prebuilt_history(user_id):
+    statements = _history_statements(None, True)
+    return statements.count, statements.page
+
+
+# (название, как было, как стало)
+CASES: List[Tuple[str, Callable, Callable]] = [
+    ("identity", _inline_identity, lambda user_id: _IDENTITY_QUERY),
+    ("latest", _inline_latest, lambda user_id: _LATEST_HOT),
+    ("by_id", _inline_by_id, lambda user_id: _CALCULATION_BY_ID),
+    ("history", _inline_history, _prebuilt_history),
+    ("stats", _inline_stats, lambda user_id: _STATS_QUERY),
+]
+
+
+def _statements(built) -> tuple:
+    return built if isinstance(built, tuple) else (built,)
+
+
+def _per_call_us(func: Callable[[], None], iterations: int) -> float:
+    func()  # прогрев: импорты, кэши ORM
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def bench_python(iterations: int) -> Dict[str, Dict[str, float]]:
+    user_id = uuid.uuid4()
+    results = {}
+    for name, inline, prebuilt in CASES:
+        def before():
+            # Ровно то, что делает execute() до обращения к кэшу компиляции
+            for statement in _statements(inline(user_id)):
+                statement._generate_cache_key()
+
+        def after():
+            for statement in _statements(prebuilt(user_id)):
+                statement._generate_cache_key()
+
+        def uncached():
+            for statement in _statements(inline(user_id)):
+                statement.compile(dialect=DIALECT)
+
+        results[name] = {
+            "before_us": _per_call_us(before, iterations),
+            "after_us": _per_call_us(after, iterations),
+            "compile_us": _per_call_us(uncached, max(1, iterations // 10)),
+        }
+    return results
+
+
+async def bench_db(iterations: int) -> Dict[str, Dict[str, float]]:
+    from app.core.database import AsyncSessionLocal, async_engine
+
+    user_id = uuid.uuid4()
+    now = datetime.utcnow()
+    params = {
+        "user_id": user_id,
+        "calculation_id": user_id,
+        "cutoff": now - timedelta(days=30),
+        "week_ago": now - timedelta(days=7),
+        "month_ago": now - timedelta(days=30),
+        "offset": 0,
+        "limit": 100,
+    }
+    results = {}
+    try:
+        async with AsyncSessionLocal() as db:
+            for name, inline, prebuilt in CASES:
+                timings = {}
+                for label, build, values in (
+                    ("before_us", inline, {}),
+                    ("after_us", prebuilt, params),
+                ):
+                    async def call():
+                        for statement in _statements(build(user_id)):
+                            # Лишние ключи bindparam SQLAlchemy игнорирует
+                            (await db.execute(statement, values)).all()
+
+                    await call()
+                    started = time.perf_counter()
+                    for _ in range(iterations):
+                        await call()
+                    timings[label] = (time.perf_counter() - started) / iterations * 1e6
+                results[name] = timings
+            await db.rollback()
+    finally:
+        await async_engine.dispose()
+    return results
+
+
+def _report(title: str, results: Dict[str, Dict[str, float]]) -> None:
+    print(title)
+    for name, timings in results.items():
+        line = f"  {name:<10} было {timings['before_us']:9.1f} мкс   стало {timings['after_us']:9.1f} мкс"
+        if "compile_us" in timings:
+            line += f"   без кэша {timings['compile_us']:9.1f} мкс"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--db", action="store_true", help="замерить и вызовы к БД")
+    args = parser.parse_args()
+
+    _report("Сборка запроса и ключ кэша компиляции, на вызов:", bench_python(args.iterations))
+    if args.db:
+        db_results = asyncio.run(bench_db(max(1, args.iterations // 10)))
+        _report("Полный вызов через AsyncSession, на вызов:", db_results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Массовый импорт пользователей из CSV (онбординг B2B-клиентов).
+
+Колонки: email,password,name,gender,birth_date[,height_cm,weight_kg,activity_level_code]
+
+    python -m app.scripts.import_users users.csv --workers 8 --rejected rejected.csv
+
+Пароли хэшируются параллельно в нескольких процессах (bcrypt упирается
+в CPU), строки загружаются во временную таблицу через COPY и переносятся
+в users/user_profiles одним INSERT ... ON CONFLICT DO NOTHING на пачку.
+Уже зарегистрированные email пропускаются.
+
+Строки проверяются теми же схемами, что и API (UserRegister,
+UserProfileUpdate), код уровня активности — по справочнику
+activity_levels. Некорректные строки не импортируются: они выводятся
+в stderr и, с --rejected rejected.csv, сохраняются с причиной отказа.
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.schemas.user import UserProfileUpdate, UserRegister
+
+STAGING_COLUMNS = (
+    "id", "email", "password_hash", "name", "gender", "birth_date",
+    "height_cm", "weight_kg", "activity_level_code",
+)
+
+CREATE_STAGING = """
+CREATE TEMP TABLE import_users_staging (
+    id uuid PRIMARY KEY,
+    email text NOT NULL,
+    password_hash text NOT NULL,
+    name text,
+    gender text NOT NULL,
+    birth_date date NOT NULL,
+    height_cm integer,
+    weight_kg integer,
+    activity_level_code text
+) ON COMMIT DROP
+"""
+
+COPY_STAGING = (
+    f"COPY import_users_staging ({', '.join(STAGING_COLUMNS)}) "
+    "FROM STDIN WITH (FORMAT csv, NULL '')"
+)
+
+MOVE_STAGING = """
+WITH new_users AS (
+    INSERT INTO users (id, email, password_hash)
+    SELECT id, email, password_hash FROM import_users_staging
+    ON CONFLICT (email) DO NOTHING
+    RETURNING id
+)
+INSERT INTO user_profiles (
+    user_id, name, gender, birth_date, height_cm, weight_kg, activity_level_id
+)
+SELECT s.id, s.name, s.gender, s.birth_date, s.height_cm, s.weight_kg, al.id
+FROM import_users_staging s
+JOIN new_users nu ON nu.id = s.id
+LEFT JOIN activity_levels al ON al.code = s.activity_level_code
+"""
+
+
+def _optional(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip()
+    return value or None
+
+
+def _describe_error(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+            for err in error.errors()
+        )
+    if isinstance(error, KeyError):
+        return f"нет колонки {error}"
+    return str(error)
+
+
+def load_activity_codes(engine) -> Set[str]:
+    with engine.connect() as conn:
+        return set(conn.execute(text("SELECT code FROM activity_levels")).scalars())
+
+
+def read_rows(
+    path: str,
+    activity_codes: Set[str],
+    rejected: List[Tuple[int, dict, str]],
+) -> Iterator[dict]:
+    """
+    Прочитать и проверить строки CSV. Некорректные строки не отдаются,
+    а добавляются в rejected как (номер строки, строка, причина).
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for line_no, raw in enumerate(csv.DictReader(f), start=2):
+            try:
+                user = UserRegister(
+                    email=raw["email"].strip(),
+                    password=raw["password"],
+                    name=raw["name"].strip(),
+                    gender=raw["gender"].strip(),
+                    birth_date=raw["birth_date"].strip(),
+                )
+                profile = UserProfileUpdate(
+                    height_cm=_optional(raw.get("height_cm")),
+                    weight_kg=_optional(raw.get("weight_kg")),
+                    activity_level_code=_optional(raw.get("activity_level_code")),
+                )
+                code = profile.activity_level_code
+                if code is not None and code not in activity_codes:
+                    raise ValueError(f"неизвестный код уровня активности {code!r}")
+            except (KeyError, ValueError, ValidationError) as e:
+                reason = _describe_error(e)
+                rejected.append((line_no, raw, reason))
+                print(f"Строка {line_no} отклонена: {reason}", file=sys.stderr)
+                continue
+            yield {
+                "email": user.email,
+                "password": user.password,
+                "name": user.name,
+                "gender": user.gender,
+                "birth_date": user.birth_date.isoformat(),
+                "height_cm": profile.height_cm,
+                "weight_kg": profile.weight_kg,
+                "activity_level_code": code,
+            }
+
+
+def write_rejected(path: str, rejected: List[Tuple[int, dict, str]]) -> None:
+    """Сохранить отклоненные строки с номером и причиной для исправления."""
+    fieldnames = ["line", "error"]
+    for _, raw, _ in rejected:
+        fieldnames.extend(key for key in raw if key not in fieldnames)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval="")
+        writer.writeheader()
+        for line_no, raw, reason in rejected:
+            writer.writerow({**raw, "line": line_no, "error": reason})
+
+
+def batched(rows: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _staging_csv(batch: List[dict], hashes: List[str]) -> io.StringIO:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row, password_hash in zip(batch, hashes):
+        writer.writerow([
+            uuid.uuid4(),
+            row["email"],
+            password_hash,
+            row["name"],
+            row["gender"],
+            row["birth_date"],
+            row["height_cm"],
+            row["weight_kg"],
+            row["activity_level_code"],
+        ])
+    buffer.seek(0)
+    return buffer
+
+
+def import_users(
+    path: str,
+    workers: int,
+    batch_size: int,
+    rejected_path: Optional[str] = None,
+) -> None:
+    engine = create_engine(settings.sync_database_url)
+    total_read = total_inserted = 0
+    rejected: List[Tuple[int, dict, str]] = []
+
+    try:
+        activity_codes = load_activity_codes(engine)
+        rows = read_rows(path, activity_codes, rejected)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for batch in batched(rows, batch_size):
+                hashes = list(pool.map(
+                    get_password_hash,
+                    [row["password"] for row in batch],
+                    chunksize=max(1, len(batch) // (workers * 4)),
+                ))
+
+                connection = engine.raw_connection()
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(CREATE_STAGING)
+                        cursor.copy_expert(COPY_STAGING, _staging_csv(batch, hashes))
+                        cursor.execute(MOVE_STAGING)
+                        inserted = cursor.rowcount
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    raise
+                finally:
+                    connection.close()
+
+                total_read += len(batch)
+                total_inserted += inserted
+                print(f"Обработано {total_read}, добавлено {total_inserted}")
+    finally:
+        engine.dispose()
+
+    print(
+        f"Импорт завершен: добавлено {total_inserted}, "
+        f"пропущено существующих {total_read - total_inserted}, "
+        f"отклонено {len(rejected)}"
+    )
+    if rejected and rejected_path:
+        write_rejected(rejected_path, rejected)
+        print(f"Отклоненные строки сохранены в {rejected_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовый импорт пользователей из CSV")
+    parser.add_argument("path", help="CSV-файл с пользователями")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Число процессов для хэширования паролей")
+    parser.add_argument("--batch-size", type=int, default=5000,
+                        help="Строк на одну транзакцию")
+    parser.add_argument("--rejected", metavar="PATH",
+                        help="CSV для отклоненных строк с причиной отказа")
+    args = parser.parse_args()
+    import_users(args.path, args.workers, args.batch_size, args.rejected)
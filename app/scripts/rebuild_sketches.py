@@ -0,0 +1,67 @@
+"""
+Пересобрать скетчи когорт (cohort_sketches) по всем расчетам, включая архив.
+
+    python -m app.scripts.rebuild_sketches
+
+Нужен один раз при включении перцентилей и после смены SKETCH_K.
+Таблица перезаписывается целиком; наблюдения, которые воркеры сольют
+позже, добавятся поверх.
+"""
+from sqlalchemy import create_engine, select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.archive import unpack_payload
+from app.core.config import settings
+from app.core.sketches import CohortSketches
+from app.models.calculation import Calculation
+from app.models.calculation_archive import CalculationArchive
+from app.models.cohort_sketch import CohortSketch
+
+
+def rebuild_sketches(batch_size: int = 5000) -> None:
+    engine = create_engine(settings.sync_database_url)
+    sketches = CohortSketches(settings.SKETCH_K)
+    total = 0
+
+    try:
+        with Session(engine) as session:
+            rows = session.execute(
+                select(Calculation.input_data, Calculation.results),
+                execution_options={"yield_per": batch_size},
+            )
+            for input_data, results in rows:
+                sketches.observe(input_data, results)
+                total += 1
+
+            payloads = session.execute(
+                select(CalculationArchive.payload),
+                execution_options={"yield_per": batch_size},
+            )
+            for (payload,) in payloads:
+                data = unpack_payload(payload)
+                sketches.observe(data["input_data"], data["results"])
+                total += 1
+
+            session.execute(delete(CohortSketch))
+            values = [
+                {
+                    "metric": metric,
+                    "gender": gender,
+                    "age_band": band,
+                    "n": sketch.n,
+                    "sketch": sketch.to_dict(),
+                }
+                for (metric, gender, band), sketch in sketches.cohorts().items()
+            ]
+            if values:
+                session.execute(insert(CohortSketch).values(values))
+            session.commit()
+    finally:
+        engine.dispose()
+
+    print(f"Обработано расчетов: {total}, когорт: {len(values)}")
+
+
+if __name__ == "__main__":
+    rebuild_sketches()
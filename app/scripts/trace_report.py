@@ -0,0 +1,74 @@
+"""
+Разбор файла трейсов (OTLP/JSON от app.core.tracing): куда уходит время.
+
+    python -m app.scripts.trace_report traces.jsonl [--route "GET /api/v1/users/me"] [--top 10]
+
+Для каждого маршрута печатает число запросов, p50/p95 полного ответа
+и разбивку по видам спанов: сколько в среднем на запрос занимают
+зависимости, JWT, SQL, тело обработчика и кодирование ответа.
+Собственное время спана (без дочерних) не считается — вложенные
+спаны видны отдельными строками.
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, Iterator, List
+
+
+def _spans(path: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            for resource in json.loads(line).get("resourceSpans", []):
+                for scope in resource.get("scopeSpans", []):
+                    yield from scope.get("spans", [])
+
+
+def _duration_ms(span: dict) -> float:
+    return (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def trace_report(path: str, route: str = None, top: int = 10) -> None:
+    traces: Dict[str, List[dict]] = defaultdict(list)
+    for span in _spans(path):
+        traces[span["traceId"]].append(span)
+
+    # маршрут -> длительности корня и суммы по спанам
+    totals: Dict[str, List[float]] = defaultdict(list)
+    parts: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for spans in traces.values():
+        root = next((s for s in spans if "parentSpanId" not in s), None)
+        if root is None or (route and root["name"] != route):
+            continue
+        totals[root["name"]].append(_duration_ms(root))
+        for span in spans:
+            if span is not root:
+                parts[root["name"]][span["name"]] += _duration_ms(span)
+
+    for name, durations in sorted(totals.items(), key=lambda item: -len(item[1]))[:top]:
+        count = len(durations)
+        print(
+            f"{name}: {count} запросов, p50 {_percentile(durations, 0.5):.1f} мс, "
+            f"p95 {_percentile(durations, 0.95):.1f} мс"
+        )
+        for part, total in sorted(parts[name].items(), key=lambda item: -item[1]):
+            print(f"    {part:<40} {total / count:8.2f} мс/запрос")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--route", help="только этот корневой спан, например 'GET /api/v1/users/me'")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    trace_report(args.path, args.route, args.top)
+
+
+if __name__ == "__main__":
+    main()
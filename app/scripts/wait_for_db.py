@@ -0,0 +1,62 @@
+import argparse
+import sys
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.health import get_migration_head, read_schema_version
+
+# Коды выхода для startup.sh
+EXIT_READY = 0
+EXIT_TIMEOUT = 1
+EXIT_NEEDS_MIGRATION = 3
+
+
+def wait_for_db(timeout: float, initial_delay: float = 0.05, max_delay: float = 2.0) -> int:
+    """
+    Ждать БД с экспоненциальной задержкой и сравнить ревизию схемы с head.
+
+    Если БД уже поднята, возвращает результат за один запрос.
+    """
+    if settings.DB_EMBEDDED:
+        # Схему встроенной БД создает само приложение при старте
+        print("Встроенная БД: миграции не применяются")
+        return EXIT_READY
+
+    engine = create_engine(settings.sync_database_url, poolclass=NullPool)
+    head = get_migration_head()
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+
+    try:
+        while True:
+            try:
+                with engine.connect() as conn:
+                    current = read_schema_version(conn)
+                break
+            except OperationalError:
+                if time.monotonic() + delay > deadline:
+                    print(f"База данных недоступна дольше {timeout} с")
+                    return EXIT_TIMEOUT
+                print(f"База данных ещё не готова, повтор через {delay:.2f} с")
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+    finally:
+        engine.dispose()
+
+    if current == head:
+        print(f"Схема на head-ревизии {head}, миграции не нужны")
+        return EXIT_READY
+
+    print(f"Ревизия схемы {current}, head {head}: нужны миграции")
+    return EXIT_NEEDS_MIGRATION
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ожидание БД перед запуском API")
+    parser.add_argument("--timeout", type=float, default=settings.DB_STARTUP_TIMEOUT_SECONDS)
+    args = parser.parse_args()
+    sys.exit(wait_for_db(args.timeout))
@@ -2,17 +2,19 @@
 set -e  # остановить скрипт при любой ошибке
 
 echo "Waiting for database connection..."
-sleep 5
+# Опрос БД с экспоненциальной задержкой; код 3 — схема отстаёт от head
+set +e
+python -m app.scripts.wait_for_db
+db_status=$?
+set -e
 
-# Опционально: добавить проверку подключения к БД перед миграциями
-# while ! pg_isready -h $(echo $DATABASE_URL | sed -E 's/.*@([^:]+):.*/\1/') -p $(echo $DATABASE_URL | sed -E 's/.*:([0-9]+)\/.*/\1/') >/dev/null 2>&1; do
-#   echo "Database not ready yet, waiting..."
-#   echo $DATABASE_URL
-#   sleep 2
-# done
-
-echo "Database is ready. Running migrations..."
-alembic upgrade head
+if [ $db_status -eq 3 ]; then
+  echo "Database is ready. Running migrations..."
+  alembic upgrade head
+elif [ $db_status -ne 0 ]; then
+  echo "Database is not available, aborting."
+  exit $db_status
+fi
 
 echo "Starting FastAPI server..."
-uvicorn app.main:app --host 0.0.0.0 --port 8000
\ No newline at end of file
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000
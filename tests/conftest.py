@@ -0,0 +1,48 @@
+"""
+Тесты работают на встроенной SQLite (DB_EMBEDDED): сервер Postgres не нужен.
+
+Настройки читаются при импорте app.core.config, поэтому окружение
+задается здесь, до импорта модулей приложения.
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="metabalance-tests-")
+
+os.environ.update({
+    "DB_EMBEDDED": "true",
+    "DB_EMBEDDED_PATH": os.path.join(_DB_DIR, "metabalance.sqlite3"),
+    "CACHE_BACKEND": "memory",
+    "SCHEDULER_ENABLED": "false",
+    "SSE_ENABLED": "false",
+    "TRACE_SAMPLE_RATE": "0",
+})
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def embedded_db(anyio_backend):
+    """Схема встроенной БД, одна на прогон."""
+    from app.core.database import async_engine, dispose_engines
+    from app.core.embedded import init_embedded_db
+
+    await init_embedded_db(async_engine)
+    yield async_engine
+    await dispose_engines()
+
+
+@pytest.fixture
+async def db(embedded_db):
+    from app.core.database import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        yield session
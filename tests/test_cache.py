@@ -0,0 +1,181 @@
+"""
+RedisCacheBackend и TieredCache против локальной заглушки Redis
+(fakeredis.TcpFakeServer): настоящий TCP и RESP, без сервера Redis.
+"""
+import asyncio
+import threading
+
+import pytest
+from fakeredis import TcpFakeServer
+
+from app.core.cache import CacheBackend, MemoryCacheBackend, RedisCacheBackend, TieredCache
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRedis:
+    """Заглушка Redis в фоновом потоке; stop/start — обрыв и возврат сервера."""
+
+    def __init__(self):
+        self.port = None
+        self._server = None
+
+    def start(self) -> None:
+        self._server = TcpFakeServer(("127.0.0.1", self.port or 0))
+        self._server.daemon_threads = True
+        self._server.block_on_close = False
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        # shutdown завершает и обработчики открытых соединений
+        self._server.shutdown()
+        self._server.server_close()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeRedis()
+    server.start()
+    yield server
+    server.stop()
+
+
+async def _eventually(check, timeout: float = 2.0) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if await check():
+            return True
+        await asyncio.sleep(0.02)
+    return False
+
+
+async def test_get_set_delete_incr(fake_redis):
+    backend = RedisCacheBackend(fake_redis.url)
+    try:
+        assert await backend.get("missing") is None
+
+        # Бинарные значения с \r\n не ломают разбор RESP
+        await backend.set("key", b"a\r\nb\x00")
+        assert await backend.get("key") == b"a\r\nb\x00"
+
+        assert await backend.incr("counter") == 1
+        assert await backend.incr("counter") == 2
+        assert await backend.get("counter") == b"2"
+
+        await backend.delete("key")
+        assert await backend.get("key") is None
+        assert backend.errors == 0
+    finally:
+        await backend.close()
+
+
+async def test_set_with_ttl_expires(fake_redis):
+    backend = RedisCacheBackend(fake_redis.url)
+    try:
+        await backend.set("short", b"1", ttl=0.05)
+        assert await backend.get("short") == b"1"
+        await asyncio.sleep(0.1)
+        assert await backend.get("short") is None
+    finally:
+        await backend.close()
+
+
+async def test_connection_loss_is_a_miss_and_recovers(fake_redis):
+    backend = RedisCacheBackend(fake_redis.url, timeout=0.5)
+    try:
+        await backend.set("key", b"value")
+        fake_redis.stop()
+
+        # Чтение и запись при недоступном сервере — промах, а не исключение
+        assert await backend.get("key") is None
+        await backend.set("key", b"other")
+        assert backend.errors >= 2
+        # Потерянный инкремент версии пробрасывается
+        with pytest.raises(OSError):
+            await backend.incr("counter")
+
+        fake_redis.start()
+        await backend.set("key", b"again")
+        assert await backend.get("key") == b"again"
+    finally:
+        await backend.close()
+
+
+def _tiered(url: str) -> TieredCache:
+    return TieredCache(
+        near=MemoryCacheBackend(1024 * 1024),
+        far=RedisCacheBackend(url),
+        near_ttl=60,
+    )
+
+
+async def test_tiered_invalidates_other_instances(fake_redis):
+    first, second = _tiered(fake_redis.url), _tiered(fake_redis.url)
+    await first.start()
+    await second.start()
+    try:
+        def second_sees(value):
+            async def check():
+                return await second.get("key") == value
+            return check
+
+        await first.set("key", b"v1")
+        # Ждем подписку второго экземпляра и кладем значение в его ближний кэш
+        assert await _eventually(second_sees(b"v1"))
+
+        await first.set("key", b"v2")
+        assert await _eventually(second_sees(b"v2"))
+
+        await first.delete("key")
+        assert await _eventually(second_sees(None))
+
+        await first.incr("ver")
+        assert await _eventually(second_sees(None))
+        assert await second.get("ver") == b"1"
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_tiered_subscriber_reconnects(fake_redis):
+    first, second = _tiered(fake_redis.url), _tiered(fake_redis.url)
+    await first.start()
+    await second.start()
+    try:
+        fake_redis.stop()
+        await asyncio.sleep(0.2)
+        fake_redis.start()
+
+        async def invalidated():
+            # Сервер новый и пустой: каждая попытка заново заполняет
+            # ближний кэш второго и проверяет, что запись первого его сбросила
+            await first.set("key", b"old")
+            await second.get("key")
+            await first.set("key", b"new")
+            await asyncio.sleep(0.05)
+            return await second.get("key") == b"new"
+
+        assert await _eventually(invalidated, timeout=5.0)
+    finally:
+        await first.close()
+        await second.close()
+
+
+def test_incomplete_backend_fails_on_construction():
+    class NoIncr(CacheBackend):
+        async def get(self, key):
+            return None
+
+        async def set(self, key, value, ttl=None):
+            pass
+
+        async def delete(self, key):
+            pass
+
+    with pytest.raises(TypeError):
+        NoIncr()
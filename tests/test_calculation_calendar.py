@@ -0,0 +1,30 @@
+from datetime import date
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.core.calculation_calendar import calendar_period
+from app.schemas.calculation import CalendarBucketEnum
+
+UTC = ZoneInfo("UTC")
+
+
+def test_period_aligns_to_bucket_starts():
+    # 2026-10-21 — среда, неделя начинается с понедельника
+    assert calendar_period(CalendarBucketEnum.WEEK, UTC, date(2026, 10, 7), date(2026, 10, 21)) == (
+        date(2026, 10, 5), date(2026, 10, 19),
+    )
+    assert calendar_period(CalendarBucketEnum.MONTH, UTC, None, date(2026, 3, 15)) == (
+        date(2025, 4, 1), date(2026, 3, 1),
+    )
+    first, last = calendar_period(CalendarBucketEnum.DAY, UTC, None, date(2026, 3, 15))
+    assert (last - first).days == 29
+
+
+@pytest.mark.parametrize("date_from, date_to", [
+    (date(2026, 3, 2), date(2026, 3, 1)),
+    (date(2025, 1, 1), date(2026, 3, 1)),
+])
+def test_empty_or_too_long_period_is_rejected(date_from, date_to):
+    with pytest.raises(ValueError):
+        calendar_period(CalendarBucketEnum.DAY, UTC, date_from, date_to)
@@ -0,0 +1,43 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.calculation_stats import load_stats_counters
+from app.models.calculation import Calculation
+from app.models.calculation_archive import CalculationArchive
+from app.models.user import User
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_counters_combine_hot_rows_and_archive(db):
+    user = User(id=uuid.uuid4(), email=f"{uuid.uuid4().hex}@example.com", password_hash="x")
+    db.add(user)
+    await db.flush()
+    now = datetime.utcnow()
+    for days, calorie_target in ((1, 2000), (10, 2100), (20, None)):
+        db.add(Calculation(
+            user_id=user.id, goal_id=1, input_data={},
+            results={"calorie_target": calorie_target} if calorie_target else {},
+            created_at=now - timedelta(days=days),
+        ))
+    db.add(CalculationArchive(
+        id=uuid.uuid4(), user_id=user.id, goal_id=1, calorie_target=1900.0,
+        payload=b"", created_at=now - timedelta(days=400),
+    ))
+    await db.commit()
+
+    counters = await load_stats_counters(db, user.id)
+
+    assert counters.total == 4
+    assert (counters.last_7_days, counters.last_30_days) == (1, 3)
+    assert counters.average_calories == 2000.0
+    # Первым изменится счетчик за 7 дней: расчет суточной давности выйдет из окна через 6 дней
+    assert counters.valid_until == pytest.approx(time.time() + 6 * 86400, abs=60)
+
+
+async def test_counters_for_user_without_calculations(db):
+    counters = await load_stats_counters(db, uuid.uuid4())
+    assert counters == (0, 0, 0, None, None)
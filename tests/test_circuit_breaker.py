@@ -0,0 +1,159 @@
+import pytest
+
+from app.core import circuit_breaker
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, DatabaseUnavailable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+def make_breaker(**overrides):
+    params = dict(
+        window=10,
+        min_calls=4,
+        failure_rate=0.5,
+        slow_call_seconds=2.0,
+        slow_call_rate=0.8,
+        open_seconds=5.0,
+        half_open_calls=2,
+    )
+    params.update(overrides)
+    return CircuitBreaker(**params)
+
+
+def call(breaker, failed=False, duration=0.01):
+    breaker.before_call()
+    breaker.record(duration, failed=failed)
+
+
+def trip(breaker):
+    for _ in range(4):
+        call(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        call(breaker, failed=True)
+    assert breaker.state == CLOSED
+
+
+def test_opens_on_failure_rate_and_rejects_with_retry_after(clock):
+    breaker = make_breaker()
+    call(breaker)
+    call(breaker)
+    call(breaker, failed=True)
+    assert breaker.state == CLOSED
+    call(breaker, failed=True)
+    assert breaker.state == OPEN
+    assert breaker.opened == 1
+
+    clock.now += 1.5
+    with pytest.raises(DatabaseUnavailable) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "4"
+    assert breaker.rejected == 1
+
+
+def test_opens_on_slow_call_rate(clock):
+    breaker = make_breaker()
+    call(breaker)
+    for _ in range(3):
+        call(breaker, duration=2.5)
+    assert breaker.state == CLOSED  # 3 из 4 < 0.8
+    call(breaker, duration=2.5)
+    assert breaker.state == OPEN
+    assert breaker.last_opened_reason.startswith("медленные")
+
+
+def test_failures_leave_the_window(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        call(breaker, failed=True)
+    clock.now += 11
+    for _ in range(3):
+        call(breaker)
+    call(breaker, failed=True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_calls"] == 4
+
+
+def test_half_open_closes_after_successful_trials(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 5
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Пробных вызовов не больше half_open_calls
+    with pytest.raises(DatabaseUnavailable):
+        breaker.before_call()
+    breaker.record(0.01, failed=False)
+    assert breaker.state == HALF_OPEN
+    breaker.record(0.01, failed=False)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["window_calls"] == 0
+    call(breaker)
+
+
+@pytest.mark.parametrize("failed, duration", [(True, 0.01), (False, 2.5)])
+def test_half_open_reopens_on_bad_trial(clock, failed, duration):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.now += 5
+    breaker.before_call()
+    breaker.record(duration, failed=failed)
+    assert breaker.state == OPEN
+    assert breaker.opened == 2
+    with pytest.raises(DatabaseUnavailable):
+        breaker.before_call()
+    clock.now += 5
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+
+
+def test_calls_started_before_opening_are_ignored(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    breaker.record(0.01, failed=False)
+    assert breaker.state == OPEN
+    assert breaker.stats()["window_calls"] == 0
+
+
+def test_bypass_skips_open_breaker_for_new_connections(clock, monkeypatch):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.pool import NullPool
+
+    breaker = make_breaker()
+    trip(breaker)
+    monkeypatch.setattr(circuit_breaker, "db_breaker", breaker)
+    monkeypatch.setattr(circuit_breaker.settings, "DB_BREAKER_ENABLED", True)
+    engine = create_engine("sqlite://", poolclass=NullPool)
+    circuit_breaker.guard_engine(engine)
+
+    with pytest.raises(DatabaseUnavailable):
+        engine.connect()
+    rejected = breaker.rejected
+
+    with circuit_breaker.breaker_bypass():
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+    assert breaker.rejected == rejected
+    assert breaker.state == OPEN
+    engine.dispose()
@@ -0,0 +1,50 @@
+import uuid
+
+import pytest
+
+from app.api import deps
+from app.core.config import settings
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingCache:
+    def __init__(self):
+        self.writes = []
+
+    async def set(self, key, value, ttl=None):
+        self.writes.append((key, value, ttl))
+
+
+@pytest.fixture
+def recording_cache(monkeypatch):
+    recording = RecordingCache()
+    monkeypatch.setattr(deps, "cache", recording)
+    monkeypatch.setattr(deps, "_stale_identity_written", deps.OrderedDict())
+    return recording
+
+
+async def test_stale_identity_is_written_once_per_interval(recording_cache, monkeypatch):
+    user_id = uuid.uuid4()
+    for _ in range(5):
+        await deps._store_stale_identity(user_id, b"v1")
+    assert len(recording_cache.writes) == 1
+    key, value, ttl = recording_cache.writes[0]
+    assert (key, value, ttl) == (deps.stale_identity_key(user_id), b"v1", settings.STALE_RESPONSE_TTL_SECONDS)
+
+    # Изменившийся профиль записывается сразу
+    await deps._store_stale_identity(user_id, b"v2")
+    assert len(recording_cache.writes) == 2
+
+    # Неизменный — после STALE_IDENTITY_REFRESH_SECONDS, чтобы копия не истекла
+    monkeypatch.setattr(settings, "STALE_IDENTITY_REFRESH_SECONDS", 0)
+    await deps._store_stale_identity(user_id, b"v2")
+    assert len(recording_cache.writes) == 3
+
+
+async def test_stale_identity_tracking_is_bounded(recording_cache, monkeypatch):
+    monkeypatch.setattr(deps, "_STALE_IDENTITY_TRACKED", 3)
+    users = [uuid.uuid4() for _ in range(4)]
+    for user_id in users:
+        await deps._store_stale_identity(user_id, b"v")
+    assert list(deps._stale_identity_written) == users[1:]
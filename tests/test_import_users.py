@@ -0,0 +1,46 @@
+import csv
+
+from app.scripts.import_users import read_rows, write_rejected
+
+HEADER = "email,password,name,gender,birth_date,height_cm,weight_kg,activity_level_code\n"
+
+
+def write_csv(tmp_path, *lines):
+    path = tmp_path / "users.csv"
+    path.write_text(HEADER + "".join(line + "\n" for line in lines), encoding="utf-8")
+    return str(path)
+
+
+def test_invalid_rows_are_rejected_not_imported(tmp_path):
+    path = write_csv(
+        tmp_path,
+        "ok@example.com,secret,Анна,female,1990-01-01,170,60,moderate",
+        "bare@example.com,secret,Иван,male,1985-05-05,,,",
+        "code@example.com,secret,Петр,male,1985-05-05,180,80,couch",
+        "height@example.com,secret,Олег,male,1985-05-05,abc,80,light",
+        "weight@example.com,secret,Ира,female,1985-05-05,165,900,light",
+        "gender@example.com,secret,Кто,other,1985-05-05,165,60,light",
+    )
+    rejected = []
+    rows = list(read_rows(path, {"light", "moderate"}, rejected))
+
+    assert [row["email"] for row in rows] == ["ok@example.com", "bare@example.com"]
+    assert rows[0]["height_cm"] == 170
+    assert rows[0]["activity_level_code"] == "moderate"
+    assert rows[1]["height_cm"] is None and rows[1]["activity_level_code"] is None
+
+    assert [line for line, _, _ in rejected] == [4, 5, 6, 7]
+    reasons = [reason for _, _, reason in rejected]
+    assert "couch" in reasons[0]
+    assert reasons[1].startswith("height_cm")
+    assert reasons[2].startswith("weight_kg")
+    assert reasons[3].startswith("gender")
+
+    out = tmp_path / "rejected.csv"
+    write_rejected(str(out), rejected)
+    with open(out, newline="", encoding="utf-8") as f:
+        saved = list(csv.DictReader(f))
+    assert [row["email"] for row in saved] == [
+        "code@example.com", "height@example.com", "weight@example.com", "gender@example.com",
+    ]
+    assert saved[0]["line"] == "4" and saved[0]["error"] == reasons[0]
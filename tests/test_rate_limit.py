@@ -0,0 +1,145 @@
+import sqlite3
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rate_limit
+from app.core.config import settings
+from app.core.rate_limit import (
+    MemoryRateLimitBackend,
+    SQLiteRateLimitBackend,
+    parse_rate,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    """Подменяет модуль time в rate_limit: время двигает только тест."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", fake)
+    return fake
+
+
+def test_parse_rate():
+    assert parse_rate("10/60") == (10, 10 / 60)
+
+
+async def test_memory_bucket_drains_and_refills(clock):
+    backend = MemoryRateLimitBackend()
+    capacity, refill_rate = parse_rate("3/30")  # токен раз в 10 с
+
+    assert [await backend.consume("k", capacity, refill_rate) for _ in range(3)] == [0, 0, 0]
+    assert await backend.consume("k", capacity, refill_rate) == pytest.approx(10)
+
+    clock.advance(10)
+    assert await backend.consume("k", capacity, refill_rate) == 0
+    assert await backend.consume("k", capacity, refill_rate) == pytest.approx(10)
+
+    # Долгий простой не копит больше capacity токенов
+    clock.advance(1000)
+    assert [await backend.consume("k", capacity, refill_rate) for _ in range(3)] == [0, 0, 0]
+    assert await backend.consume("k", capacity, refill_rate) > 0
+
+
+async def test_memory_keys_are_independent_and_bounded(clock):
+    backend = MemoryRateLimitBackend(max_keys=2)
+    await backend.consume("a", 1, 1 / 60)
+    assert await backend.consume("a", 1, 1 / 60) > 0
+    assert await backend.consume("b", 1, 1 / 60) == 0
+
+    # Третий ключ вытесняет самый давний: "a" начинает с полного бакета
+    await backend.consume("c", 1, 1 / 60)
+    assert await backend.consume("a", 1, 1 / 60) == 0
+
+
+async def test_sqlite_buckets_are_shared_between_workers(clock, tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    first, second = SQLiteRateLimitBackend(path), SQLiteRateLimitBackend(path)
+
+    assert await first.consume("k", 2, 2 / 60) == 0
+    assert await second.consume("k", 2, 2 / 60) == 0
+    assert await first.consume("k", 2, 2 / 60) == pytest.approx(30)
+
+    clock.advance(30)
+    assert await second.consume("k", 2, 2 / 60) == 0
+
+
+def _keys(path: str) -> set:
+    with sqlite3.connect(path) as conn:
+        return {key for (key,) in conn.execute("SELECT key FROM buckets")}
+
+
+async def test_sqlite_prunes_refilled_buckets(clock, tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    backend = SQLiteRateLimitBackend(path, prune_interval=60)
+
+    for i in range(20):
+        await backend.consume(f"ip:{i}", 10, 10 / 60)  # полный снова через 6 с
+    for _ in range(5):
+        await backend.consume("busy", 5, 5 / 600)  # опустошен, полный через 600 с
+    assert len(_keys(path)) == 21
+
+    # До интервала очистки строки остаются
+    clock.advance(30)
+    await backend.consume("new", 10, 10 / 60)
+    assert len(_keys(path)) == 22
+
+    clock.advance(30)
+    await backend.consume("new", 10, 10 / 60)
+    assert _keys(path) == {"busy", "new"}
+
+    # Очистка не сбрасывает лимит неполного бакета
+    assert await backend.consume("busy", 5, 5 / 600) > 0
+
+
+async def test_sqlite_upgrades_old_schema(clock, tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO buckets VALUES ('old', 0, ?)", (clock.now,))
+
+    backend = SQLiteRateLimitBackend(path, prune_interval=0)
+    await backend.consume("k", 1, 1 / 60)
+    # Строки старого формата считаются наполненными и удаляются
+    assert _keys(path) == {"k"}
+
+
+def test_dependency_returns_429_with_retry_after(clock, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setitem(settings.RATE_LIMITS, "test", "2/60")
+    monkeypatch.setattr(rate_limit, "_backend", MemoryRateLimitBackend())
+
+    app = FastAPI()
+
+    @app.get("/limited", dependencies=[Depends(rate_limit.rate_limit("test"))])
+    async def limited():
+        return {}
+
+    with TestClient(app) as client:
+        assert [client.get("/limited").status_code for _ in range(2)] == [200, 200]
+        response = client.get("/limited")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "30"
+        # Невалидный токен не обходит лимит: ключом остается IP
+        other = client.get("/limited", headers={"Authorization": "Bearer garbage"})
+        assert other.status_code == 429
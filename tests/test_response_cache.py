@@ -0,0 +1,53 @@
+import uuid
+
+import pytest
+
+from app.core.cache import MemoryCacheBackend
+from app.core.response_cache import ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+class BrokenIncrBackend(MemoryCacheBackend):
+    """Общий кэш, у которого не проходит INCR (как Redis при обрыве)."""
+
+    def __init__(self):
+        super().__init__(max_bytes=1024 * 1024)
+        self.fail_incr = True
+
+    async def incr(self, key: str) -> int:
+        if self.fail_incr:
+            raise ConnectionError("redis down")
+        return await super().incr(key)
+
+
+async def test_put_and_get_by_version():
+    cache = ResponseCache(MemoryCacheBackend(1024 * 1024), max_ttl=60, stale_ttl=60)
+    user_id = uuid.uuid4()
+
+    await cache.put(user_id, "stats", b"{}", version=0)
+    assert await cache.get(user_id, "stats", 0) == b"{}"
+
+    await cache.bump(user_id)
+    assert await cache.version(user_id) == 1
+    assert await cache.get(user_id, "stats", 1) is None
+
+
+async def test_failed_bump_does_not_raise_and_bypasses_cache():
+    backend = BrokenIncrBackend()
+    cache = ResponseCache(backend, max_ttl=60, stale_ttl=60)
+    user_id = uuid.uuid4()
+    await cache.put(user_id, "stats", b"old", version=0)
+
+    await cache.bump(user_id)
+
+    assert cache.stats()["bump_failures"] == 1
+    # Версия не изменилась, но старый ответ этот воркер больше не отдает
+    assert await cache.get(user_id, "stats", 0) is None
+    await cache.put(user_id, "stats", b"new", version=0)
+    assert await backend.get(f"resp:{user_id}:stats:0") == b"old"
+
+    backend.fail_incr = False
+    await cache.bump(user_id)
+    await cache.put(user_id, "stats", b"fresh", version=1)
+    assert await cache.get(user_id, "stats", 1) == b"fresh"
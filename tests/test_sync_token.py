@@ -0,0 +1,33 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core.sync_token import SyncToken, decode_sync_token, encode_sync_token
+
+
+def raw_token(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+def test_round_trip():
+    at = datetime(2026, 10, 19, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    token = SyncToken(watermark=at, started_at=at, cursor=(at, uuid.uuid4()))
+    assert decode_sync_token(encode_sync_token(token)) == token
+    assert decode_sync_token(encode_sync_token(SyncToken())) == SyncToken()
+
+
+@pytest.mark.parametrize("value", [
+    raw_token({"v": 1, "w": "2026-10-19T12:30:15"}),
+    raw_token({"v": 1, "c": ["2026-10-19T12:30:15", str(uuid.uuid4())]}),
+    raw_token({"v": 2}),
+    raw_token({"v": 1, "c": ["2026-10-19T12:30:15+00:00"]}),
+    raw_token([1]),
+    "не base64",
+    "",
+])
+def test_invalid_tokens_are_rejected(value):
+    with pytest.raises(ValueError):
+        decode_sync_token(value)
@@ -0,0 +1,59 @@
+import time
+import uuid
+
+import pytest
+
+from app.core.token_revocation import consume_refresh_token, revocation_registry, revoke_family
+from app.models.revoked_token import RevokedTokenFamily
+from app.models.user import User
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def user_id(db):
+    user_id = uuid.uuid4()
+    db.add(User(id=user_id, email=f"{user_id.hex}@example.com", password_hash="x"))
+    await db.commit()
+    return user_id
+
+
+def refresh_payload(user_id, family_id):
+    return {
+        "jti": uuid.uuid4().hex,
+        "fam": family_id,
+        "sub": str(user_id),
+        "exp": int(time.time()) + 3600,
+    }
+
+
+async def test_reused_token_revokes_its_family(db, user_id):
+    family_id = uuid.uuid4().hex
+    first = refresh_payload(user_id, family_id)
+
+    assert await consume_refresh_token(db, first) is True
+    await db.commit()
+    assert not revocation_registry.is_family_revoked(family_id)
+
+    # Повторное предъявление того же токена — кража: отзывается все семейство
+    assert await consume_refresh_token(db, first) is False
+    assert not revocation_registry.is_family_revoked(family_id)
+    await db.commit()
+    assert revocation_registry.is_family_revoked(family_id)
+    family = await db.get(RevokedTokenFamily, family_id)
+    assert family.reason == "reuse"
+
+    # Следующий токен отозванного семейства тоже не принимается
+    assert await consume_refresh_token(db, refresh_payload(user_id, family_id)) is False
+    await db.commit()
+
+
+async def test_rolled_back_revocation_is_not_registered(db, user_id):
+    family_id = uuid.uuid4().hex
+    await revoke_family(db, family_id=family_id, user_id=user_id, reason="logout")
+    await db.rollback()
+
+    assert not revocation_registry.is_family_revoked(family_id)
+    assert await db.get(RevokedTokenFamily, family_id) is None
+    assert await consume_refresh_token(db, refresh_payload(user_id, family_id)) is True
+    await db.commit()
@@ -0,0 +1,34 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import tracing
+from app.core.config import settings
+from app.core.tracing import TracingMiddleware, span
+
+
+def test_root_span_survives_span_limit(monkeypatch):
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(settings, "TRACE_MAX_SPANS", 3)
+    exported = []
+    monkeypatch.setattr(tracing.span_exporter, "export", exported.append)
+
+    app = FastAPI()
+
+    @app.get("/busy")
+    async def busy():
+        for i in range(5):
+            with span(f"step {i}"):
+                pass
+        return {}
+
+    app.add_middleware(TracingMiddleware)
+    with TestClient(app) as client:
+        assert client.get("/busy").status_code == 200
+
+    [trace] = exported
+    assert len(trace.spans) == 3
+    root = trace.spans[-1]
+    assert root.parent_id is None
+    assert root.attributes["trace.dropped_spans"] == 3
+    # Все записанные дочерние спаны ссылаются на записанный корень
+    assert {child.parent_id for child in trace.spans[:-1]} == {root.span_id}